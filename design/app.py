@@ -0,0 +1,177 @@
+import argparse
+import io
+import json
+import logging
+import os
+import sys
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+from flask import Flask, jsonify, request, send_file
+
+# 各模块之间使用顶层导入，作为安装后的命令运行时需要将本目录加入Python路径
+design_dir = os.path.dirname(os.path.abspath(__file__))
+if design_dir not in sys.path:
+    sys.path.insert(0, design_dir)
+
+import brb_drawing
+import csv_to_dxf
+import diagnostics
+import dxf_output
+import vfd_drawing
+from csv_template import load_template
+from csv_to_dxf import new_document
+
+
+app = Flask(__name__)
+
+# 常驻的工作进程池，由 start_workers 创建
+executor = None
+worker_count = 0
+
+
+# 工作进程初始化：关闭对话框，并预先编译所有模板、建好文档骨架，之后的请求不再有导入、解析和建表开销
+def init_worker():
+    os.chdir(design_dir)
+    brb_drawing.init_worker()
+    vfd_drawing.show_dialogs = False
+    for config in brb_drawing.template_configs.values():
+        try:
+            new_document(load_template(config['csv_file']))
+            brb_drawing.load_template_rules(config)
+        except OSError as e:
+            logging.warning(f"预加载模板 {config['csv_file']} 失败: {str(e)}")
+
+
+# 空任务，用于启动时让每个工作进程完成初始化
+def warm_up():
+    return os.getpid()
+
+
+# 创建并预热工作进程池
+def start_workers(workers=None):
+    global executor, worker_count
+    worker_count = workers or os.cpu_count() or 1
+    executor = ProcessPoolExecutor(max_workers=worker_count, initializer=init_worker)
+    pids = {future.result() for future in [executor.submit(warm_up) for _ in range(worker_count)]}
+    logging.info(f"图纸生成服务已启动 {len(pids)} 个工作进程")
+    return executor
+
+
+# 在工作进程中生成图纸，build(row, dimensions) 返回文档和默认文件名；选项只作为参数传递，不修改工作进程的全局设置
+# 返回结果：文件名、指定格式的图纸数据、错误、HTTP状态码和转换警告
+def render_drawing(build, row, fmt, dimensions):
+    result = {"filename": "", "data": b"", "error": "", "status": 200, "warnings": []}
+    with diagnostics.collecting() as collector:
+        try:
+            doc, filename = build(row, dimensions)
+            result["filename"] = dxf_output.output_path(filename, fmt)
+            result["data"] = dxf_output.document_bytes(doc, fmt, filename)
+        except Exception as e:
+            result["error"] = f"{type(e).__name__}: {str(e)}"
+            # 参数错误返回400，其他错误返回500
+            result["status"] = 400 if isinstance(e, (ValueError, TypeError)) else 500
+        result["warnings"] = collector.entries
+    return result
+
+
+# 根据数据行生成BRB图纸文档
+def build_brb(row, dimensions):
+    params, config = brb_drawing.prepare_table(row)
+    return brb_drawing.build_drawing(params, config, dimensions)
+
+
+# 在工作进程中生成BRB图纸；dimensions 为是否生成尺寸图形块
+def render_brb(row, fmt="asc", dimensions=True):
+    return render_drawing(build_brb, row, fmt, dimensions)
+
+
+# 在工作进程中生成VFD图纸；dimensions 为是否生成尺寸图形块
+def render_vfd(row, fmt="asc", dimensions=True):
+    return render_drawing(vfd_drawing.build_vfd_document, row, fmt, dimensions)
+
+
+# 处理绘图请求：请求体为一个数据行或数据行列表，单个图纸返回DXF文件，多个图纸返回zip压缩包
+# 查询参数 format 选择图纸格式：asc（默认）、bin 或 zip；dimensions=0 时不生成尺寸图形块，由CAD软件重新生成
+# 转换警告在失败时随错误一起返回，成功时以JSON写入响应头 X-Drawing-Warnings：[{"index", "warnings"}]
+def handle_drawing_request(render):
+    payload = request.get_json(silent=True)
+    rows = payload if isinstance(payload, list) else [payload]
+    if not rows or not all(isinstance(row, dict) for row in rows):
+        return jsonify({"errors": [{"index": 0, "error": "请求体必须是JSON对象或对象列表"}]}), 400
+    try:
+        fmt = dxf_output.check_format(request.args.get("format", "asc"))
+    except ValueError as e:
+        return jsonify({"errors": [{"index": 0, "error": str(e)}]}), 400
+    # 未指定时使用服务启动时的设置（环境变量 CAD_CHANGE_RENDER_DIMENSIONS）
+    dimensions = request.args.get("dimensions", "1" if csv_to_dxf.render_dimensions else "0") != "0"
+    # 多个图纸本身就打包为zip，其中的图纸不再单独压缩
+    if fmt == "zip" and len(rows) > 1:
+        fmt = "asc"
+
+    results = [future.result() for future in [executor.submit(render, row, fmt, dimensions) for row in rows]]
+    warnings = [{"index": index, "warnings": result["warnings"]}
+                for index, result in enumerate(results) if result["warnings"]]
+    errors = [{"index": index, "error": result["error"]} for index, result in enumerate(results) if result["error"]]
+    if errors:
+        logging.error(f"图纸生成请求失败: {errors}")
+        status = max(result["status"] for result in results)
+        return jsonify({"errors": errors, "warnings": warnings}), status
+
+    if len(results) == 1:
+        mimetype = "application/zip" if fmt == "zip" else "application/dxf"
+        response = send_file(io.BytesIO(results[0]["data"]), mimetype=mimetype, as_attachment=True,
+                             download_name=results[0]["filename"])
+    else:
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zf:
+            names = set()
+            for index, result in enumerate(results):
+                filename = result["filename"]
+                # 同名图纸加序号区分
+                if filename in names:
+                    filename = f"{index + 1}-{filename}"
+                names.add(filename)
+                zf.writestr(filename, result["data"])
+        archive.seek(0)
+        response = send_file(archive, mimetype="application/zip", as_attachment=True, download_name="drawings.zip")
+    if warnings:
+        # 响应头只能使用ASCII字符，中文按JSON转义
+        response.headers["X-Drawing-Warnings"] = json.dumps(warnings)
+    return response
+
+
+@app.route("/health", methods=["GET"])
+def health():
+    return jsonify({"status": "ok", "workers": worker_count})
+
+
+# BRB图纸，请求体与 brb_drawing.brb_drawing 的 data_table 数据项相同
+@app.route("/brb", methods=["POST"])
+def brb():
+    return handle_drawing_request(render_brb)
+
+
+# VFD图纸，请求体与 vfd_drawing.vfd_drawing 的 data_table 数据项相同
+@app.route("/vfd", methods=["POST"])
+def vfd():
+    return handle_drawing_request(render_vfd)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="cad-change-web", description="本地图纸生成HTTP服务")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址，默认 127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000, help="监听端口，默认 5000")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="工作进程数，默认为CPU核数")
+    args = parser.parse_args(argv)
+
+    start_workers(args.jobs)
+    try:
+        app.run(host=args.host, port=args.port, threaded=True)
+    finally:
+        executor.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+import argparse
+import glob
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import dxf_to_csv
+
+
+# 汇总文件名
+SUMMARY_FILE = "batch_summary.json"
+
+
+# 子进程初始化：关闭对话框，所有警告只写入日志
+def init_worker():
+    dxf_to_csv.show_dialogs = False
+
+
+# 收集待转换的DXF文件，source 可以是目录或通配符
+def collect_dxf_files(source, recursive=True):
+    if os.path.isdir(source):
+        pattern = os.path.join(source, "**", "*.dxf") if recursive else os.path.join(source, "*.dxf")
+        files = glob.glob(pattern, recursive=recursive)
+    else:
+        files = glob.glob(source, recursive=True)
+    return sorted(f for f in files if f.lower().endswith(".dxf") and os.path.isfile(f))
+
+
+# 计算输出CSV路径，保留输入文件相对于根目录的子目录结构
+def output_path_for(input_file, root_dir, output_dir):
+    if output_dir is None:
+        return os.path.splitext(input_file)[0] + ".csv"
+    relative = os.path.relpath(input_file, root_dir)
+    return os.path.join(output_dir, os.path.splitext(relative)[0] + ".csv")
+
+
+# 转换单个文件（在子进程中执行），异常转换为结果中的错误信息
+def convert_file(input_file, output_file, streaming=None):
+    result = {
+        "input": input_file,
+        "output": output_file,
+        "entities": 0,
+        "seconds": 0.0,
+        "error": "",
+    }
+    start = time.perf_counter()
+    try:
+        if streaming is None:
+            streaming = os.path.getsize(input_file) > dxf_to_csv.STREAMING_SIZE_THRESHOLD
+        output_folder = os.path.dirname(output_file)
+        if output_folder:
+            os.makedirs(output_folder, exist_ok=True)
+        result["entities"] = dxf_to_csv.export_csv(input_file, output_file, streaming)
+        logging.info(f"{input_file} 已成功转换为 {output_file} (批量 DXF to CSV)")
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {str(e)}"
+        logging.error(f"批量转换 {input_file} 失败: {result['error']}")
+    result["seconds"] = round(time.perf_counter() - start, 3)
+    return result
+
+
+# 批量转换主函数，不弹出任何对话框，返回汇总信息并写入汇总文件
+def batch_dxf_to_csv(source, output_dir=None, workers=None, streaming=None, recursive=True):
+    files = collect_dxf_files(source, recursive)
+    if os.path.isdir(source):
+        root_dir = source
+    elif files:
+        root_dir = os.path.commonpath([os.path.dirname(os.path.abspath(f)) for f in files])
+    else:
+        root_dir = os.getcwd()
+    workers = workers or os.cpu_count() or 1
+
+    start = time.perf_counter()
+    results = []
+    if files:
+        with ProcessPoolExecutor(max_workers=min(workers, len(files)), initializer=init_worker) as executor:
+            futures = [
+                executor.submit(convert_file, f, output_path_for(os.path.abspath(f), os.path.abspath(root_dir), output_dir), streaming)
+                for f in files
+            ]
+            for future in as_completed(futures):
+                result = future.result()
+                status = "失败" if result["error"] else "完成"
+                print(f"[{len(results) + 1}/{len(files)}] {status}: {result['input']} ({result['seconds']}s)")
+                results.append(result)
+    results.sort(key=lambda r: r["input"])
+
+    failures = [r for r in results if r["error"]]
+    summary = {
+        "source": source,
+        "workers": workers,
+        "files": len(results),
+        "succeeded": len(results) - len(failures),
+        "failed": len(failures),
+        "entities": sum(r["entities"] for r in results),
+        "seconds": round(time.perf_counter() - start, 3),
+        "results": results,
+    }
+
+    summary_dir = output_dir if output_dir else root_dir
+    os.makedirs(summary_dir, exist_ok=True)
+    summary_file = os.path.join(summary_dir, SUMMARY_FILE)
+    with open(summary_file, "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=4)
+    summary["summary_file"] = summary_file
+
+    logging.info(f"批量转换完成: {summary['succeeded']}/{summary['files']} 成功，用时 {summary['seconds']}s")
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批量将DXF文件转换为CSV模板格式")
+    parser.add_argument("source", help="DXF文件所在目录或通配符，如 data/**/*.dxf")
+    parser.add_argument("-o", "--output-dir", help="CSV输出目录，默认与DXF文件相同目录")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="并行进程数，默认为CPU核数")
+    parser.add_argument("--streaming", action="store_true", default=None, help="强制使用流式转换")
+    parser.add_argument("--no-recursive", action="store_true", help="目录模式下不搜索子目录")
+    args = parser.parse_args(argv)
+
+    summary = batch_dxf_to_csv(args.source, args.output_dir, args.jobs, args.streaming, not args.no_recursive)
+    print(f"共 {summary['files']} 个文件，成功 {summary['succeeded']} 个，失败 {summary['failed']} 个，"
+          f"实体 {summary['entities']} 个，用时 {summary['seconds']}s")
+    print(f"汇总已写入: {summary['summary_file']}")
+    for result in summary["results"]:
+        if result["error"]:
+            print(f"失败: {result['input']}: {result['error']}")
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
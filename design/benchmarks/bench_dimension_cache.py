@@ -0,0 +1,69 @@
+"""尺寸标注渲染基准测试：对比每次渲染尺寸块、复用缓存的尺寸块和不生成尺寸块的耗时
+
+用法: python benchmarks/bench_dimension_cache.py [模板CSV ...] [重复次数]
+"""
+import os
+import sys
+import time
+
+# 将 design 目录加入Python路径，并以其为工作目录
+design_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, design_dir)
+os.chdir(design_dir)
+
+import ezdxf
+
+import csv_to_dxf
+import dimension_cache
+from csv_template import load_template
+
+
+# 将模板绘制到新文档中，返回文档
+def draw(template):
+    doc = ezdxf.new("R2018")
+    csv_to_dxf.draw_template(doc, doc.modelspace(), template)
+    return doc
+
+
+def best_of(template, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        draw(template)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    args = sys.argv[1:]
+    repeat = int(args.pop()) if args and args[-1].isdigit() else 5
+    input_files = args or [os.path.join("data", name) for name in ["王工.csv", "十一.csv", "王一.csv"]]
+    csv_to_dxf.show_dialogs = False
+
+    print(f"{'模板':<12}{'标注数':>8}{'每次渲染(ms)':>14}{'缓存尺寸块(ms)':>16}{'不生成尺寸块(ms)':>18}{'缓存加速比':>10}")
+    for input_file in input_files:
+        template = load_template(input_file)
+        dimensions = sum(1 for record in template.records if record and record.get("type") == "DIMENSION")
+
+        # 每次都渲染：关闭缓存
+        dimension_cache.enabled = False
+        render_time = best_of(template, repeat)
+        # 复用缓存：先绘制一次填充缓存，之后的图纸全部命中
+        dimension_cache.enabled = True
+        dimension_cache.clear()
+        draw(template)
+        cached_time = best_of(template, repeat)
+        # 不生成尺寸块
+        csv_to_dxf.render_dimensions = False
+        discard_time = best_of(template, repeat)
+        csv_to_dxf.render_dimensions = True
+
+        print(f"{os.path.basename(input_file):<12}{dimensions:>8}{render_time * 1000:>14.1f}{cached_time * 1000:>16.1f}"
+              f"{discard_time * 1000:>18.1f}{render_time / cached_time:>10.1f}x")
+    print(f"缓存统计: {dimension_cache.cache_info()}")
+    dimension_cache.clear()
+
+
+if __name__ == "__main__":
+    main()
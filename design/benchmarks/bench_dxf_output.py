@@ -0,0 +1,54 @@
+"""图纸输出格式基准测试：对比文本DXF、二进制DXF和zip压缩的文本DXF的写出耗时、文件大小和重新打开耗时
+
+用法: python benchmarks/bench_dxf_output.py [重复次数]
+"""
+import os
+import sys
+import tempfile
+import time
+
+# 将 design 目录加入Python路径，并以其为工作目录
+design_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, design_dir)
+os.chdir(design_dir)
+
+import brb_drawing
+import dxf_output
+
+# 示例参数表，与设计界面的默认参数相同
+SAMPLE_ROW = {
+    "project_name": "基准测试", "width": 160, "height": 160, "thickness": 12, "force": 2000,
+    "tube_width": 250, "tube_thickness": 6, "weld": 10, "core_material": "Q235",
+    "length_quantity": [(5000, 2), (6000, 3)],
+}
+
+
+def best_of(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    brb_drawing.init_worker()
+
+    print(f"{'模板':<8}{'格式':<6}{'写出(ms)':>10}{'大小(KB)':>10}{'打开(ms)':>10}")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for template in brb_drawing.template_configs:
+            params, config = brb_drawing.prepare_table(dict(SAMPLE_ROW, template=template))
+            doc, filename = brb_drawing.build_drawing(params, config)
+            for fmt in dxf_output.FORMATS:
+                output_file = dxf_output.output_path(os.path.join(temp_dir, filename), fmt)
+                write_time = best_of(lambda: dxf_output.save_document(doc, output_file, fmt), repeat)
+                size = os.path.getsize(output_file)
+                read_time = best_of(lambda: dxf_output.read_document(output_file), repeat)
+                print(f"{template:<8}{fmt:<6}{write_time * 1000:>10.1f}{size / 1024:>10.1f}{read_time * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""快速写出基准测试：对比只含简单图元的模板通过完整文档对象保存与直接写出组码的耗时，并检查两种方式的结果一致
+
+用法: python benchmarks/bench_fast_writer.py [模板CSV] [放大倍数]
+"""
+import csv
+import os
+import sys
+import tempfile
+import time
+
+# 将 design 目录加入Python路径，并以其为工作目录
+design_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, design_dir)
+os.chdir(design_dir)
+
+import ezdxf
+
+import csv_to_dxf
+from csv_template import clear_memory_cache
+
+# 平移复制时需要移动的坐标列
+X_COLUMNS = ["位置 X", "起点 X", "终点 X", "圆心 X"]
+
+
+# 取出模板中的简单图元（包括块内的图元，放到模型空间），并平移复制 copies 份，模拟只含简单图元的大模板
+def plain_template(data, copies):
+    resources = [row for row in data if row["实体类型"] in ("图层", "dimstyle")]
+    plain = [dict(row, 块名="") for row in data if row["实体类型"] in csv_to_dxf.dxf_writer.WRITERS]
+    scaled = list(resources)
+    for i in range(copies):
+        offset = i * 10000
+        for row in plain:
+            new_row = dict(row)
+            for column in X_COLUMNS:
+                if new_row.get(column):
+                    new_row[column] = str(float(new_row[column]) + offset)
+            if new_row["实体类型"] == "LWPOLYLINE":
+                vertices = []
+                for point in new_row["顶点数据"].split("; "):
+                    x, rest = point.strip("()").split(", ", 1)
+                    vertices.append(f"({float(x) + offset}, {rest})")
+                new_row["顶点数据"] = "; ".join(vertices)
+            scaled.append(new_row)
+    return scaled
+
+
+# 实体的比较签名，不含句柄
+def signature(path):
+    doc = ezdxf.readfile(path)
+    result = []
+    for entity in doc.modelspace():
+        attribs = entity.dxfattribs(drop={"handle", "owner"})
+        if entity.dxftype() == "LWPOLYLINE":
+            attribs["points"] = list(entity.get_points())
+        result.append((entity.dxftype(), sorted((key, str(value)) for key, value in attribs.items())))
+    return result
+
+
+def best_of(input_file, output_file, fast, repeat=5):
+    csv_to_dxf.fast_writer = fast
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        csv_to_dxf.csv_to_dxf(input_file, output_file)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    input_file = sys.argv[1] if len(sys.argv) > 1 else os.path.join("data", "王工.csv")
+    copies = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    csv_to_dxf.show_dialogs = False
+
+    with open(input_file, 'r', encoding='utf-8') as csvfile:
+        reader = csv.DictReader(csvfile)
+        fieldnames = reader.fieldnames
+        data = list(reader)
+
+    print(f"模板: {input_file}")
+    print(f"{'数据集':<12}{'实体数':>8}{'完整文档(ms)':>14}{'快速写出(ms)':>14}{'加速比':>8}")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for label, count in [("简单图元", 1), (f"放大x{copies}", copies)]:
+            plain_file = os.path.join(temp_dir, f"plain_{count}.csv")
+            with open(plain_file, 'w', encoding='utf-8', newline='') as csvfile:
+                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+                writer.writeheader()
+                writer.writerows(plain_template(data, count))
+            clear_memory_cache()
+
+            full_output = os.path.join(temp_dir, "full.dxf")
+            fast_output = os.path.join(temp_dir, "fast.dxf")
+            full_time = best_of(plain_file, full_output, False)
+            fast_time = best_of(plain_file, fast_output, True)
+            full_entities = signature(full_output)
+            assert full_entities == signature(fast_output), "快速写出的实体与完整文档不一致"
+            assert not ezdxf.readfile(fast_output).audit().has_errors, "快速写出的文件未通过检查"
+            print(f"{label:<12}{len(full_entities):>8}{full_time * 1000:>14.1f}{fast_time * 1000:>14.1f}"
+                  f"{full_time / fast_time:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,290 +2,66 @@ import csv
 import tkinter as tk
 from tkinter import messagebox, filedialog
 import logging
-from csv_to_dxf import csv_to_dxf
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import csv_to_dxf
+import diagnostics
+import dxf_output
+import output_cache
+from csv_to_dxf import render_rows, save_drawing
+from csv_template import load_template, verify_anchors, AnchorError, TemplateOverlay
+from update_rules import discover_templates, load_rules, RuleError
 import os  # 新增：导入os模块用于设置工作目录
 
 
-"""更新数据"""
-# 王工
-def update_data1(csv_data, input_param, width, height, thick, force, tube_width, tube_thickness, weld, core_material, table):
-    """通用的CSV数据更新函数"""
-    try:
-        # 获取列名
-        header = csv_data[0]
-
-        # 生成列名和索引的映射字典
-        column_index_map = {col_name: header.index(col_name) for col_name in header}
-
-        # 主视图，长度数量说明
-        result_str = ''
-        product_quantity = 0
-        count = 0
-        total_count = len(table)
-        for index, (length, quantity) in enumerate(table):
-            result_str += f'L={length}-{quantity}件, '
-            product_quantity += quantity
-            count += 1
-            if count % 4 == 0 and index < total_count - 1:
-                result_str += '\P'
-        result_str = result_str.rstrip(' ， ')
-        csv_data[81][column_index_map['值']] = f'\W0.7;\T1.1;{result_str}\P共计{product_quantity}件'
-
-        # 端面
-        update_cell_value(csv_data, 149, column_index_map, '覆盖值', thick)
-        update_cell_value(csv_data, 150, column_index_map, '覆盖值', width)
-        update_cell_value(csv_data, 151, column_index_map, '覆盖值', thick)
-        update_cell_value(csv_data, 152, column_index_map, '覆盖值', height - thick - thick)
-        update_cell_value(csv_data, 153, column_index_map, '覆盖值', thick)
-        update_cell_value(csv_data, 154, column_index_map, '覆盖值', thick)
-        update_cell_value(csv_data, 155, column_index_map, '覆盖值', tube_width)
-        update_cell_value(csv_data, 156, column_index_map, '覆盖值', tube_width)
-        
-        # 方管厚度
-        update_cell_value(csv_data, 111, column_index_map, '覆盖值', tube_thickness)
-
-        # 端面焊缝
-        update_cell_value(csv_data, 110, column_index_map, '值', f'\T1.1;{format_number(weld)}')
-
-        # 耗能面设置
-       
-        update_cell_value(csv_data, 185, column_index_map, '覆盖值', thick)
-        update_cell_value(csv_data, 186, column_index_map, '覆盖值', thick)
-        update_cell_value(csv_data, 187, column_index_map, '覆盖值', thick)
-        update_cell_value(csv_data, 188, column_index_map, '覆盖值', height)
-        update_cell_value(csv_data, 189, column_index_map, '覆盖值', width)
-
-        # 连接板尺寸
-        update_cell_value(csv_data, 201, column_index_map, '覆盖值', (width - thick) / 2)
-
-        # 连接板数量
-        update_cell_value(csv_data, 199, column_index_map, '值', f'\W0.7;\T1.1;连接板 H={format_number(thick)}-{format_number(product_quantity * 4)}件')
-
-        # 挡板尺寸
-        update_cell_value(csv_data, 216, column_index_map, '覆盖值', width + 5)
-        update_cell_value(csv_data, 217, column_index_map, '覆盖值', thick + 5)
-        update_cell_value(csv_data, 218, column_index_map, '覆盖值', thick + 5)
-        update_cell_value(csv_data, 219, column_index_map, '覆盖值', thick + 5)
-        update_cell_value(csv_data, 222, column_index_map, '覆盖值', thick + 5)
-        update_cell_value(csv_data, 223, column_index_map, '覆盖值', height - thick - thick - 5)
-        update_cell_value(csv_data, 206, column_index_map, '覆盖值', tube_width + 20)
-        update_cell_value(csv_data, 209, column_index_map, '覆盖值', tube_width + 20)
-
-        # 挡板焊缝
-        update_cell_value(csv_data, 245, column_index_map, '值', f'\T1.1;C{format_number(weld)}')
-        # 挡板数量
-        update_cell_value(csv_data, 207, column_index_map, '值', f'\W0.7;\T1.1;挡板H=6-{format_number(product_quantity * 2)}件')
-
-        # 标题栏，项目名称
-        cell_with = 540 # 单元格宽度
-        max_width = cell_with-20 # 字符串最大限制宽度
-        dynamic_multiplier, true_length = calculate_dynamic_width(input_param, max_width) # 对项目名称字符串进行缩放，并返回倍率和实际宽度
-        update_cell_value(csv_data, 292, column_index_map, '值', f'\W{dynamic_multiplier:.2f};\T1.1;{input_param}') # 更新值单元格值
-        # 标题栏，项目名称，位置置中
-        update_cell_value(csv_data, 292, column_index_map, '位置 X', - cell_with / 2 - true_length / 2) # 更新位置X单元格值
-        
-        # 标题栏，产品型号
-        update_cell_value(csv_data, 294, column_index_map, '值', f'\W0.7;\T1.1;YSX-BRB-{force}-L')
+# 是否弹出对话框，并行生成的子进程中设为 False，错误只写入日志和结果
+show_dialogs = True
 
-        # 芯板材料
-        update_cell_value(csv_data, 297, column_index_map, '值', f'芯板材料：{core_material}')
+# 模板文件所在目录，与工作目录无关
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
 
-    except (IndexError, ValueError) as e:
-        logging.error(f"修改 CSV 数据时出现错误: {str(e)}")
-        messagebox.showerror("错误", "修改CSV数据时出现错误，请检查数据格式。")
-        raise  # 重新抛出异常，让上层调用者处理
 
-    return csv_data
-# 十一
-def update_data2(csv_data, input_param, width, height, thick, force, tube_width, tube_thickness, weld, core_material, table):
-    """通用的CSV数据更新函数"""
-    try:
-        # 获取列名
-        header = csv_data[0]
-
-        # 生成列名和索引的映射字典
-        column_index_map = {col_name: header.index(col_name) for col_name in header}
-
-        # 主视图，长度数量说明
-        result_str = ''
-        product_quantity = 0
-        count = 0
-        total_count = len(table)
-        for index, (length, quantity) in enumerate(table):
-            result_str += f'L={length}-{quantity}件, '
-            product_quantity += quantity
-            count += 1
-            if count % 4 == 0 and index < total_count - 1:
-                result_str += '\P'
-        result_str = result_str.rstrip(' ， ')
-        csv_data[75][column_index_map['值']] = f'\W0.7;\T1.1;{result_str}\P共计{product_quantity}件'
-
-        # 端面
-        update_cell_value(csv_data, 129, column_index_map, '覆盖值', thick)
-        update_cell_value(csv_data, 130, column_index_map, '覆盖值', width)
-        update_cell_value(csv_data, 131, column_index_map, '覆盖值', height)
-        update_cell_value(csv_data, 132, column_index_map, '覆盖值', thick)
-        update_cell_value(csv_data, 133, column_index_map, '覆盖值', tube_width)
-        update_cell_value(csv_data, 134, column_index_map, '覆盖值', tube_width)
-
-        # 方管厚度
-        update_cell_value(csv_data, 104, column_index_map, '覆盖值', tube_thickness)
-
-        # 端面焊缝
-        update_cell_value(csv_data, 103, column_index_map, '值', f'\T1.1;{format_number(weld)}')
-
-        # 耗能面设置
-       
-        update_cell_value(csv_data, 157, column_index_map, '覆盖值', thick)
-        update_cell_value(csv_data, 158, column_index_map, '覆盖值', height)
-
-        # 连接板尺寸
-        update_cell_value(csv_data, 170, column_index_map, '覆盖值', (width - thick) / 2)
-
-        # 连接板数量
-        update_cell_value(csv_data, 168, column_index_map, '值', f'\W0.7;\T1.1;连接板 H={format_number(thick)}-{format_number(product_quantity * 4)}件')
-
-        # 挡板尺寸
-        update_cell_value(csv_data, 181, column_index_map, '覆盖值', width + 5)
-        update_cell_value(csv_data, 182, column_index_map, '覆盖值', thick + 5)
-        update_cell_value(csv_data, 185, column_index_map, '覆盖值', thick + 5)
-        update_cell_value(csv_data, 186, column_index_map, '覆盖值', height + 5)
-        update_cell_value(csv_data, 175, column_index_map, '覆盖值', tube_width + 20)
-        update_cell_value(csv_data, 178, column_index_map, '覆盖值', tube_width + 20)
-
-        # 挡板焊缝
-        update_cell_value(csv_data, 200, column_index_map, '值', f'\T1.1;C{format_number(weld)}')
-        # 挡板数量
-        update_cell_value(csv_data, 176, column_index_map, '值', f'\W0.7;\T1.1;挡板H=6-{format_number(product_quantity * 2)}件')
-
-
-        # 标题栏，项目名称
-        cell_with = 540 # 单元格宽度
-        max_width = cell_with-20 # 字符串最大限制宽度
-        dynamic_multiplier, true_length = calculate_dynamic_width(input_param, max_width) # 对项目名称字符串进行缩放，并返回倍率和实际宽度
-        update_cell_value(csv_data, 247, column_index_map, '值', f'\W{dynamic_multiplier:.2f};\T1.1;{input_param}') # 更新值单元格值
-        # 标题栏，项目名称，位置置中
-        update_cell_value(csv_data, 247, column_index_map, '位置 X', - cell_with / 2 - true_length / 2) # 更新位置X单元格值
-
-        # 标题栏，产品型号
-        update_cell_value(csv_data, 249, column_index_map, '值', f'\W0.7;\T1.1;YSX-BRB-{force}-L')
-
-        # 芯板材料
-        update_cell_value(csv_data, 252, column_index_map, '值', f'芯板材料：{core_material}')
-        
+# 数据更新规则中可以使用的参数
+RULE_VARIABLES = ("project_name", "width", "height", "thickness", "force", "tube_width", "tube_thickness", "weld",
+                  "core_material", "product_quantity", "length_text")
 
-    except (IndexError, ValueError) as e:
-        logging.error(f"修改 CSV 数据时出现错误: {str(e)}")
-        messagebox.showerror("错误", "修改CSV数据时出现错误，请检查数据格式。")
-        raise  # 重新抛出异常，让上层调用者处理
+# 模板配置：data 目录中每个 "<模板>-规则.csv" 与同名的模板 "<模板>.csv" 组成一个模板类型，新增模板不需要修改代码
+template_configs = discover_templates(TEMPLATE_DIR)
 
-    return csv_data
-# 王一
-def update_data3(csv_data, input_param, width, height, thick, force, tube_width, tube_thickness, weld, core_material, table):
-    """通用的CSV数据更新函数"""
-    try:
-        # 获取列名
-        header = csv_data[0]
-
-        # 生成列名和索引的映射字典
-        column_index_map = {col_name: header.index(col_name) for col_name in header}
-
-        # 主视图，长度数量说明
-        result_str = ''
-        product_quantity = 0
-        count = 0
-        total_count = len(table)
-        for index, (length, quantity) in enumerate(table):
-            result_str += f'L={length}-{quantity}件, '
-            product_quantity += quantity
-            count += 1
-            if count % 4 == 0 and index < total_count - 1:
-                result_str += '\P'
-        result_str = result_str.rstrip(' ， ')
-        csv_data[77][column_index_map['值']] = f'\W0.7;\T1.1;{result_str}\P共计{product_quantity}件'
-
-        # 端面
-        update_cell_value(csv_data, 155, column_index_map, '覆盖值', width)
-        update_cell_value(csv_data, 156, column_index_map, '覆盖值', thick)
-        update_cell_value(csv_data, 157, column_index_map, '覆盖值', height - thick - thick)
-        update_cell_value(csv_data, 158, column_index_map, '覆盖值', thick)
-        update_cell_value(csv_data, 159, column_index_map, '覆盖值', thick)
-        update_cell_value(csv_data, 160, column_index_map, '覆盖值', tube_width)
-        update_cell_value(csv_data, 161, column_index_map, '覆盖值', tube_width)
-        update_cell_value(csv_data, 162, column_index_map, '覆盖值', thick)
-
-        # 方管厚度
-        update_cell_value(csv_data, 125, column_index_map, '覆盖值', tube_thickness)
-
-        # 端面焊缝
-        update_cell_value(csv_data, 124, column_index_map, '值', f'\T1.1;{format_number(weld)}')
-
-        # 耗能面设置
-       
-        update_cell_value(csv_data, 193, column_index_map, '覆盖值', thick)
-        update_cell_value(csv_data, 194, column_index_map, '覆盖值', height-thick-thick)
-
-        # 连接板1尺寸
-        update_cell_value(csv_data, 309, column_index_map, '覆盖值', width)
-        # 连接板1数量
-        update_cell_value(csv_data, 307, column_index_map, '值', f'\W0.7;\T1.1;连接板 H={format_number(thick)}-{format_number(product_quantity * 4)}件')
-
-        # 连接板2尺寸
-        update_cell_value(csv_data, 206, column_index_map, '覆盖值', (width - thick) / 2)
-        # 连接板2数量
-        update_cell_value(csv_data, 204, column_index_map, '值', f'\W0.7;\T1.1;连接板2 H={format_number(thick)}-{format_number(product_quantity * 4)}件')
-
-        # 挡板尺寸
-        update_cell_value(csv_data, 221, column_index_map, '覆盖值', width + 5)
-        update_cell_value(csv_data, 222, column_index_map, '覆盖值', thick + 5)
-        update_cell_value(csv_data, 223, column_index_map, '覆盖值', thick + 5)
-        update_cell_value(csv_data, 224, column_index_map, '覆盖值', thick + 5)
-        update_cell_value(csv_data, 227, column_index_map, '覆盖值', thick + 5)
-        update_cell_value(csv_data, 228, column_index_map, '覆盖值', height - thick - thick - 5)
-        update_cell_value(csv_data, 211, column_index_map, '覆盖值', tube_width + 20)
-        update_cell_value(csv_data, 214, column_index_map, '覆盖值', tube_width + 20)
-
-        # 挡板焊缝
-        update_cell_value(csv_data, 250, column_index_map, '值', f'\T1.1;C{format_number(weld)}')
-        # 挡板数量
-        update_cell_value(csv_data, 212, column_index_map, '值', f'\W0.7;\T1.1;挡板H=6-{format_number(product_quantity * 2)}件')
-
-         # 标题栏，项目名称
-        cell_with = 540 # 单元格宽度
-        max_width = cell_with-20 # 字符串最大限制宽度
-        dynamic_multiplier, true_length = calculate_dynamic_width(input_param, max_width) # 对项目名称字符串进行缩放，并返回倍率和实际宽度
-        update_cell_value(csv_data, 297, column_index_map, '值', f'\W{dynamic_multiplier:.2f};\T1.1;{input_param}') # 更新值单元格值
-        # 标题栏，项目名称，位置置中
-        update_cell_value(csv_data, 297, column_index_map, '位置 X', - cell_with / 2 - true_length / 2) # 更新位置X单元格值
-
-        # 标题栏，产品型号
-        update_cell_value(csv_data, 299, column_index_map, '值', f'\W0.7;\T1.1;YSX-BRB-{force}-L')
-        
-        # 芯板材料
-        update_cell_value(csv_data, 310, column_index_map, '值', f'芯板材料：{core_material}')
+"""主视图的长度数量说明，每4种长度换行，返回说明文字和总数量"""
+def length_quantity_text(table):
+    result_str = ''
+    product_quantity = 0
+    count = 0
+    total_count = len(table)
+    for index, (length, quantity) in enumerate(table):
+        result_str += f'L={length}-{quantity}件, '
+        product_quantity += quantity
+        count += 1
+        if count % 4 == 0 and index < total_count - 1:
+            result_str += '\P'
+    result_str = result_str.rstrip(' ， ')
+    return result_str, product_quantity
 
-    except (IndexError, ValueError) as e:
-        logging.error(f"修改 CSV 数据时出现错误: {str(e)}")
-        messagebox.showerror("错误", "修改CSV数据时出现错误，请检查数据格式。")
-        raise  # 重新抛出异常，让上层调用者处理
+"""数据更新规则中各参数的值"""
+def rule_variables(params):
+    length_text, product_quantity = length_quantity_text(params["table"])
+    variables = {name: params[name] for name in RULE_VARIABLES if name in params}
+    variables.update(length_text=length_text, product_quantity=product_quantity)
+    return variables
 
-    return csv_data
-
-# 预加载模板配置，避免每次循环都重新创建
-template_configs = {
-    '王工': {
-        'csv_file': 'data\\王工.csv',
-        'update_function': update_data1
-    },
-    '十一': {
-        'csv_file': 'data\\十一.csv',
-        'update_function': update_data2
-    },
-    '王一': {
-        'csv_file': 'data\\王一.csv',
-        'update_function': update_data3
-    }
-}
+"""规则函数：文字按最大宽度缩放的倍率"""
+def title_scale(text, max_width):
+    return calculate_dynamic_width(text, max_width)[0]
+
+"""规则函数：文字缩放后的实际宽度"""
+def title_length(text, max_width):
+    return calculate_dynamic_width(text, max_width)[1]
+
+"""读取模板的数据更新规则（已编译并缓存）"""
+def load_template_rules(config):
+    functions = {"format_number": format_number, "title_scale": title_scale, "title_length": title_length}
+    return load_rules(config['rules_file'], RULE_VARIABLES, functions)
 
 """处理参数"""
 def brb_drawing(data_table, project_folder=None):
@@ -293,103 +69,95 @@ def brb_drawing(data_table, project_folder=None):
     if not isinstance(data_table, list):
         data_table = [data_table]
 
-    for row in data_table:
-        try:
-            # 从数据行中获取各参数值，使用get方法并设置默认值
-            parameters = {
-                "template": row.get("template"),  # 模版类型
-                "project_name": row.get("project_name", ""),  # 项目名称
-                "width": row.get("width"),  # 截面宽度
-                "height": row.get("height"),  # 截面高度
-                "thickness": row.get("thickness"),  # 板厚
-                "force": row.get("force"),  # 力
-                "tube_width": row.get("tube_width"),  # 方管宽度
-                "tube_thickness": row.get("tube_thickness"),  # 方管厚度
-                "weld": row.get("weld"),  # 焊缝
-                "core_material": row.get("core_material", "Q235"),  # 芯板材料，默认值Q235
-                "table": row.get("length_quantity", [])  # 长度-数量表格
-            }
-            print(parameters["core_material"])
-
-            # 验证必要参数是否存在
-            if not validate_required_parameters(parameters):
-                continue
-
-            # 转换数值类型
-            parameters = convert_to_numeric(parameters)
-            if parameters is None:
-                continue
-
-            # 直接使用预加载的模板配置
-            config = template_configs.get(parameters["template"])
-            if config is None:
-                messagebox.showerror("错误", f"未知的模板类型: {parameters['template']}")
-                continue
-
-            # 处理并生成图纸
-            process_and_generate_drawing(parameters, config, project_folder)
+    # 所有参数表的转换警告汇总后统一提示
+    with diagnostics.collecting() as collector:
+        for row in data_table:
+            brb_drawing_row(row, project_folder)
+    if show_dialogs:
+        diagnostics.show_summary(collector, "图纸生成问题")
 
-        except Exception as e:
-            logging.error(f"处理数据行时出错: {str(e)}")
-            messagebox.showerror("错误", f"处理数据行时出错: {str(e)}")
+"""处理单个参数表"""
+def brb_drawing_row(row, project_folder=None):
+    try:
+        parameters = read_parameters(row)
+        print(parameters["core_material"])
 
-"""验证必要参数是否存在"""
-def validate_required_parameters(params):
+        # 验证必要参数是否存在
+        if not validate_required_parameters(parameters):
+            return
 
+        # 转换数值类型
+        parameters = convert_to_numeric(parameters)
+        if parameters is None:
+            return
+
+        # 直接使用预加载的模板配置
+        config = template_configs.get(parameters["template"])
+        if config is None:
+            messagebox.showerror("错误", f"未知的模板类型: {parameters['template']}")
+            return
+
+        # 处理并生成图纸
+        process_and_generate_drawing(parameters, config, project_folder)
+
+    except Exception as e:
+        logging.error(f"处理数据行时出错: {str(e)}")
+        messagebox.showerror("错误", f"处理数据行时出错: {str(e)}")
+
+"""从数据行中获取各参数值"""
+def read_parameters(row):
+    # 使用get方法并设置默认值
+    return {
+        "template": row.get("template"),  # 模版类型
+        "project_name": row.get("project_name", ""),  # 项目名称
+        "width": row.get("width"),  # 截面宽度
+        "height": row.get("height"),  # 截面高度
+        "thickness": row.get("thickness"),  # 板厚
+        "force": row.get("force"),  # 力
+        "tube_width": row.get("tube_width"),  # 方管宽度
+        "tube_thickness": row.get("tube_thickness"),  # 方管厚度
+        "weld": row.get("weld"),  # 焊缝
+        "core_material": row.get("core_material", "Q235"),  # 芯板材料，默认值Q235
+        "table": row.get("length_quantity", [])  # 长度-数量表格
+    }
+
+"""返回缺失的必要参数"""
+def find_missing_parameters(params):
     required_params = ["template", "project_name", "width", "height", "thickness", "force", "tube_width", "tube_thickness", "weld"]
-    missing_params = []
+    return [param for param in required_params if params[param] is None]
 
-    for param in required_params:
-        if params[param] is None:
-            missing_params.append(param)
+"""验证必要参数是否存在"""
+def validate_required_parameters(params):
+
+    missing_params = find_missing_parameters(params)
 
     if missing_params:
         messagebox.showwarning("参数缺失", f"缺少必要参数: {', '.join(missing_params)}")
         return False
     return True
 
-"""将参数转换为数值类型"""
-def convert_to_numeric(params):
+"""将参数转换为数值类型，无效时抛出 ValueError"""
+def parse_numeric(params):
     numeric_params = ["width", "height", "thickness", "force", "tube_width", "tube_thickness", "weld"]
     for param in numeric_params:
         try:
             params[param] = int(params[param])
         except ValueError:
-            messagebox.showwarning("输入错误", f"'{param}' 必须为有效整数（如 123 ）！")
-            return None
+            raise ValueError(f"'{param}' 必须为有效整数（如 123 ）！")
     return params
 
+"""将参数转换为数值类型"""
+def convert_to_numeric(params):
+    try:
+        return parse_numeric(params)
+    except ValueError as e:
+        messagebox.showwarning("输入错误", str(e))
+        return None
+
 """生成图纸"""
 def process_and_generate_drawing(params, config, project_folder=None):
     try:
-        # 读取CSV文件
-        with open(config['csv_file'], 'r', encoding='utf-8') as file:
-            csv_reader = csv.reader(file)
-            csv_data = list(csv_reader)
-
-        # 输入参数并更新数据
-            csv_data = config['update_function'](csv_data, params["project_name"], params["width"],
-                                                 params["height"], params["thickness"], params["force"],
-                                                 params["tube_width"], params["tube_thickness"], params["weld"], params["core_material"], params["table"])
-
-        # 将修改后的数据写回到 CSV 文件
-        with open(config['csv_file'], 'w', newline='', encoding='utf-8') as file:
-            writer = csv.writer(file)
-            writer.writerows(csv_data)
-
-        # 直接保存到项目文件夹，不弹出选择对话框
-        default_filename = f'{params["project_name"]} BRB-{format_number(params["force"])}-L 方管宽{format_number(params["tube_width"])}.dxf'
-        # 设置保存目录为项目文件夹或当前目录
-        save_dir = project_folder if project_folder else os.getcwd()
-        
-        # 确保保存目录存在
-        if not os.path.exists(save_dir):
-            os.makedirs(save_dir)
-            
-        # 构建完整的保存路径
-        output_dxf_file = os.path.join(save_dir, default_filename)
-        # 执行保存操作
-        csv_to_dxf(config['csv_file'], output_dxf_file)
+        output_dxf_file, _ = generate_drawing_file(params, config, project_folder)
         logging.info(f"图纸生成成功: {output_dxf_file}")
         # messagebox.showinfo("成功", f"图纸生成成功！文件已保存为: {os.path.basename(output_dxf_file)}")
         # messagebox.showinfo("成功", f"图纸生成成功！文件已保存为: {output_dxf_file}")
@@ -402,19 +170,164 @@ def process_and_generate_drawing(params, config, project_folder=None):
         messagebox.showerror("错误", f"处理文件时出错: {str(e)}")
 
 
+"""根据参数生成图纸文档，返回文档和默认文件名，出错时抛出异常；dimensions 为是否生成尺寸图形块，为 None 时使用默认设置"""
+def build_drawing(params, config, dimensions=None):
+    # 读取共享的模板（已编译并缓存），本次的修改只记录在覆盖层中，模板文件和缓存保持不变
+    template = load_template(config['csv_file'])
+    rules = load_template_rules(config)
+    # 锚点缺失时不生成图纸，避免参数写入错误的位置
+    problems = rules.verify(template)
+    if problems:
+        raise AnchorError("；".join(problems))
+    csv_data = TemplateOverlay(template)
+
+    # 输入参数，按规则一次更新全部单元格
+    try:
+        rules.apply(csv_data, rule_variables(params), format_number)
+    except (IndexError, ValueError) as e:
+        logging.error(f"修改 CSV 数据时出现错误: {str(e)}")
+        if show_dialogs:
+            messagebox.showerror("错误", "修改CSV数据时出现错误，请检查数据格式。")
+        raise  # 重新抛出异常，让上层调用者处理
+
+    # 修改后的数据直接在内存中绘制，不再写回模板文件
+    return render_rows(csv_data, dimensions=dimensions), drawing_filename(params)
+
+"""检查各模板的锚点和数据更新规则，只读取模板不绘制，返回 {模板类型: [问题说明]}"""
+def check_anchors():
+    problems = {}
+    for name, config in template_configs.items():
+        template = load_template(config['csv_file'])
+        problems[name] = verify_anchors(template.anchors, [], template.duplicate_anchors, template.source)
+        try:
+            problems[name] += load_template_rules(config).verify(template)
+        except (OSError, RuleError) as e:
+            problems[name].append(str(e))
+    return problems
+
+"""图纸的默认文件名"""
+def drawing_filename(params):
+    return f'{params["project_name"]} BRB-{format_number(params["force"])}-L 方管宽{format_number(params["tube_width"])}.dxf'
+
+"""生成图纸文件，返回保存路径和是否使用了缓存，出错时抛出异常"""
+def generate_drawing_file(params, config, project_folder=None):
+    default_filename = drawing_filename(params)
+
+    # 直接保存到项目文件夹，不弹出选择对话框
+    # 设置保存目录为项目文件夹或当前目录
+    save_dir = project_folder if project_folder else os.getcwd()
+    
+    # 确保保存目录存在，并行生成时多个进程可能同时创建
+    os.makedirs(save_dir, exist_ok=True)
+        
+    # 构建完整的保存路径，zip 输出格式的扩展名为 .zip
+    output_dxf_file = dxf_output.output_path(os.path.join(save_dir, default_filename))
+
+    # 模板、规则、参数和代码都未变化时直接复制缓存的图纸
+    key = output_cache.cache_key("brb", [config['csv_file'], config['rules_file']], params)
+    if output_cache.fetch(key, output_dxf_file):
+        logging.info(f"使用缓存图纸: {output_dxf_file}")
+        return output_dxf_file, True
+
+    # 执行保存操作
+    with diagnostics.collecting() as collector:
+        issues = len(collector)
+        doc, _ = build_drawing(params, config)
+        save_drawing(doc, config['csv_file'], output_dxf_file)
+    # 生成时有转换警告的图纸不缓存，保证每次生成都能看到警告
+    if len(collector) == issues:
+        output_cache.store(key, output_dxf_file)
+    return output_dxf_file, False
+
+
+"""子进程初始化：关闭对话框，所有警告只写入日志"""
+def init_worker():
+    global show_dialogs
+    show_dialogs = False
+    csv_to_dxf.show_dialogs = False
+
+"""读取并检查数据行的参数，返回参数和模板配置，无效时抛出 ValueError"""
+def prepare_table(row):
+    parameters = read_parameters(row)
+    missing_params = find_missing_parameters(parameters)
+    if missing_params:
+        raise ValueError(f"缺少必要参数: {', '.join(missing_params)}")
+    parameters = parse_numeric(parameters)
+    config = template_configs.get(parameters["template"])
+    if config is None:
+        raise ValueError(f"未知的模板类型: {parameters['template']}")
+    return parameters, config
+
+"""生成单个参数表的图纸（在子进程中执行），错误记录在结果中，不弹出对话框"""
+def generate_table(index, row, project_folder=None):
+    result = {
+        "index": index,
+        "template": row.get("template"),
+        "project_name": row.get("project_name", ""),
+        "output": "",
+        "cached": False,
+        "seconds": 0.0,
+        "error": "",
+        "warnings": [],  # 转换警告，每项为 {"level", "file", "line", "entity_type", "field", "reason"}
+    }
+    start = time.perf_counter()
+    with diagnostics.collecting() as collector:
+        issues = len(collector)
+        try:
+            parameters, config = prepare_table(row)
+            result["output"], result["cached"] = generate_drawing_file(parameters, config, project_folder)
+            logging.info(f"图纸生成成功: {result['output']}")
+        except Exception as e:
+            result["error"] = f"{type(e).__name__}: {str(e)}"
+            logging.error(f"第 {index + 1} 个参数表生成失败: {result['error']}")
+        # 嵌套在外层收集器中时只取本参数表的问题
+        result["warnings"] = collector.entries[issues:]
+    result["seconds"] = round(time.perf_counter() - start, 3)
+    return result
+
+"""并行生成所有参数表的图纸，每个参数表在独立进程中使用各自的DXF文档，返回汇总信息"""
+def brb_drawing_parallel(data_table, project_folder=None, workers=None):
+    # 确保数据表格是列表类型
+    if not isinstance(data_table, list):
+        data_table = [data_table]
+    workers = workers or os.cpu_count() or 1
+
+    start = time.perf_counter()
+    results = []
+    if data_table:
+        with ProcessPoolExecutor(max_workers=min(workers, len(data_table)), initializer=init_worker) as executor:
+            futures = [executor.submit(generate_table, index, row, project_folder)
+                       for index, row in enumerate(data_table)]
+            for future in as_completed(futures):
+                result = future.result()
+                status = "失败" if result["error"] else "完成"
+                print(f"[{len(results) + 1}/{len(data_table)}] {status}: {result['project_name']} {result['template']} ({result['seconds']}s)")
+                results.append(result)
+    results.sort(key=lambda r: r["index"])
+
+    failures = [r for r in results if r["error"]]
+    summary = {
+        "tables": len(results),
+        "workers": workers,
+        "succeeded": len(results) - len(failures),
+        "failed": len(failures),
+        "cached": sum(1 for r in results if r["cached"]),  # 使用缓存的参数表数量
+        "warnings": sum(len(r["warnings"]) for r in results),  # 转换警告总数
+        "seconds": round(time.perf_counter() - start, 3),  # 总耗时
+        "slowest": max((r["seconds"] for r in results), default=0.0),  # 最慢的单个参数表耗时
+        "results": results,
+    }
+    logging.info(f"并行生成完成: {summary['succeeded']}/{summary['tables']} 成功，"
+                 f"用时 {summary['seconds']}s，最慢参数表 {summary['slowest']}s")
+    return summary
+
+
 """格式化数字，去除多余的零和小数点"""
 def format_number(num):   
     formatted = "{:.3f}".format(num).rstrip('0').rstrip('.') if isinstance(num, (int, float)) else str(num)
     return formatted
 
 
-"""安全地更新单元格值"""
-def update_cell_value(csv_data, row_index, column_map, column_name, value):
-    if row_index < len(csv_data) and column_name in column_map:
-        csv_data[row_index][column_map[column_name]] = format_number(value)
-    else:
-        logging.warning(f"无法更新单元格: 行索引 {row_index} 或列名 {column_name} 不存在")
-
 # 限制字符总长，并返回比例和总宽度
 def calculate_dynamic_width(text, max_width=300, base_width_cn=60):
 
@@ -0,0 +1,73 @@
+import json
+
+
+# 参数表中必须填写的参数
+REQUIRED_PARAMETERS = ["截面宽度(mm)", "截面高度(mm)", "板材厚度(mm)", "焊缝高度(mm)", "方管宽度(mm)", "方管厚度(mm)"]
+
+
+# 读取设计文件，格式与 DesignForm.save_design 保存的JSON相同
+def load_project(file_path):
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+# 检查设计数据，按界面的检查顺序返回全部错误信息，无错误时返回空列表
+def validate_project(data):
+    errors = []
+    if not data.get("project_name"):
+        errors.append("请输入项目名称")
+    if not data.get("param_tables"):
+        errors.append("请至少添加一个参数表")
+    for table in data.get("param_tables", []):
+        table_number = table.get("table_number")
+        # 验证参数表是否填写了设计力
+        if not table.get("design_force"):
+            errors.append(f"请为参数表 {table_number} 输入设计力")
+        # 验证参数表是否有长度-数量数据
+        if not table.get("length_quantity"):
+            errors.append(f"请为参数表 {table_number} 添加至少一组长度-数量数据")
+        # 验证参数表中的必填参数
+        for param_label in REQUIRED_PARAMETERS:
+            if not str(table.get("parameters", {}).get(param_label, "")).strip():
+                errors.append(f"请为参数表 {table_number} 填写 {param_label}")
+    return errors
+
+
+# 转换为 brb_drawing 使用的数据表格，每个参数表对应一个数据项
+def drawing_data_table(data):
+    data_table = []
+    for table in data["param_tables"]:
+        data_table.append({
+            "template": table["template"],
+            "project_name": data["project_name"],
+            "width": table["parameters"]["截面宽度(mm)"],  # 截面宽度
+            "height": table["parameters"]["截面高度(mm)"],  # 截面高度
+            "thickness": table["parameters"]["板材厚度(mm)"],  # 板厚
+            "force": table["design_force"],  # 设计力
+            "tube_width": table["parameters"]["方管宽度(mm)"],  # 方管宽度
+            "tube_thickness": table["parameters"]["方管厚度(mm)"],  # 方管厚度
+            "weld": table["parameters"]["焊缝高度(mm)"],  # 焊缝
+            "core_material": table["parameters"].get("芯板材料", "Q235"),  # 芯板材料，默认值Q235
+            "length_quantity": table["length_quantity"]  # 此参数表的长度-数量数据
+        })
+    return data_table
+
+
+# 转换为 brb_materials.generate_materials_excel 使用的参数表格式
+def material_param_tables(data):
+    param_tables = []
+    for table in data["param_tables"]:
+        # 转换长度-数量数据格式
+        length_quantity = [
+            {"length": lq[0], "quantity": lq[1]}
+            for lq in table["length_quantity"]
+        ]
+        param_tables.append({
+            "table_number": table["table_number"],
+            "design_force": table["design_force"],
+            "template_type": table["template"],
+            "params": table["parameters"],
+            "core_material": table["parameters"].get("芯板材料", "Q235"),  # 将芯板材料单独提取到顶层
+            "length_quantity": length_quantity
+        })
+    return param_tables
@@ -0,0 +1,229 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# 各模块之间使用顶层导入，作为安装后的命令运行时需要将本目录加入Python路径
+design_dir = os.path.dirname(os.path.abspath(__file__))
+if design_dir not in sys.path:
+    sys.path.insert(0, design_dir)
+
+import brb_drawing
+import brb_project
+import csv_to_dxf
+import dxf_output
+import output_cache
+import vfd_drawing
+from brb_drawing import brb_drawing_parallel
+from brb_materials import generate_materials_excel
+
+
+# 构建报告文件名
+REPORT_FILE = "build_report.json"
+
+# VFD批量生成报告文件名
+VFD_REPORT_FILE = "vfd_report.json"
+
+
+# 生成材料单（在后台线程中执行），异常转换为结果中的错误信息
+def build_materials(data, output_dir):
+    result = {
+        "output": "",
+        "seconds": 0.0,
+        "error": "",
+    }
+    start = time.perf_counter()
+    try:
+        result["output"] = generate_materials_excel(data["project_name"], brb_project.material_param_tables(data),
+                                                    project_folder=output_dir)
+        logging.info(f"材料单生成成功: {result['output']}")
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {str(e)}"
+        logging.error(f"材料单生成失败: {result['error']}")
+    result["seconds"] = round(time.perf_counter() - start, 3)
+    return result
+
+
+# 根据设计文件生成全部图纸和材料单，不弹出任何对话框，返回构建报告
+def build_project(project_file, output_dir=None, jobs=None, drawings=True, materials=True):
+    start = time.perf_counter()
+    output_dir = output_dir or os.path.dirname(os.path.abspath(project_file))
+    report = {
+        "project_file": project_file,
+        "project_name": "",
+        "output_dir": output_dir,
+        "errors": [],
+        "drawings": None,
+        "materials": None,
+        "succeeded": False,
+        "seconds": 0.0,
+    }
+    try:
+        data = brb_project.load_project(project_file)
+    except (OSError, ValueError) as e:
+        report["errors"].append(f"读取设计文件失败: {str(e)}")
+        return report
+    report["project_name"] = data.get("project_name", "")
+    report["errors"] = brb_project.validate_project(data)
+    if report["errors"]:
+        return report
+
+    os.makedirs(output_dir, exist_ok=True)
+    # 材料单在后台线程中生成，同时图纸在进程池中并行生成
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        materials_future = executor.submit(build_materials, data, output_dir) if materials else None
+        if drawings:
+            report["drawings"] = brb_drawing_parallel(brb_project.drawing_data_table(data), output_dir, jobs)
+        if materials_future is not None:
+            report["materials"] = materials_future.result()
+
+    report["succeeded"] = (
+        (report["drawings"] is None or report["drawings"]["failed"] == 0)
+        and (report["materials"] is None or not report["materials"]["error"])
+    )
+    report["seconds"] = round(time.perf_counter() - start, 3)
+    return report
+
+
+# 应用图纸输出选项：缓存、格式和尺寸图形块，通过环境变量传递给工作进程
+def apply_output_options(args):
+    if args.no_cache:
+        os.environ["CAD_CHANGE_OUTPUT_CACHE"] = "0"
+        output_cache.enabled = False
+    if args.format:
+        os.environ["CAD_CHANGE_DXF_FORMAT"] = args.format
+        dxf_output.output_format = args.format
+    if args.no_render_dimensions:
+        os.environ["CAD_CHANGE_RENDER_DIMENSIONS"] = "0"
+        csv_to_dxf.render_dimensions = False
+
+
+# 添加图纸输出选项
+def add_output_options(parser):
+    parser.add_argument("--no-cache", action="store_true", help="不使用图纸缓存，全部重新生成")
+    parser.add_argument("--format", choices=dxf_output.FORMATS, default=None,
+                        help="图纸格式：asc 文本DXF（默认），bin 二进制DXF，zip 压缩的文本DXF")
+    parser.add_argument("--no-render-dimensions", action="store_true",
+                        help="不生成尺寸标注的图形块，由CAD软件打开图纸时重新生成")
+
+
+# build 子命令
+def command_build(args):
+    apply_output_options(args)
+    report = build_project(args.project, args.out, args.jobs, not args.no_drawings, not args.no_materials)
+
+    report_file = args.report or os.path.join(report["output_dir"], REPORT_FILE)
+    report_dir = os.path.dirname(os.path.abspath(report_file))
+    os.makedirs(report_dir, exist_ok=True)
+    with open(report_file, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=4)
+
+    for error in report["errors"]:
+        print(f"错误: {error}")
+    if report["drawings"] is not None:
+        drawings = report["drawings"]
+        print(f"图纸: 共 {drawings['tables']} 个，成功 {drawings['succeeded']} 个，失败 {drawings['failed']} 个，"
+              f"缓存 {drawings['cached']} 个，警告 {drawings['warnings']} 条，用时 {drawings['seconds']}s")
+        for result in drawings["results"]:
+            if result["error"]:
+                print(f"失败: 参数表 {result['index'] + 1}: {result['error']}")
+            for warning in result["warnings"]:
+                print(f"警告: 参数表 {result['index'] + 1}: {warning['reason']}")
+    if report["materials"] is not None:
+        materials = report["materials"]
+        if materials["error"]:
+            print(f"材料单失败: {materials['error']}")
+        else:
+            print(f"材料单: {materials['output']}")
+    print(f"报告已写入: {report_file}")
+    return 0 if report["succeeded"] else 1
+
+
+# 读取VFD数据表：JSON 文件中为数据行列表，或单个数据行
+def load_vfd_table(table_file):
+    with open(table_file, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    rows = data if isinstance(data, list) else [data]
+    if not all(isinstance(row, dict) for row in rows):
+        raise ValueError("数据表的每一项都应为参数对象")
+    return rows
+
+
+# vfd 子命令：数据表中每行生成一个VFD图纸，各行并行生成
+def command_vfd(args):
+    apply_output_options(args)
+    try:
+        rows = load_vfd_table(args.table)
+    except (OSError, ValueError) as e:
+        print(f"错误: 读取数据表失败: {str(e)}")
+        return 1
+    output_dir = args.out or os.path.dirname(os.path.abspath(args.table))
+    summary = vfd_drawing.vfd_drawing_parallel(rows, output_dir, args.jobs)
+
+    report_file = args.report or os.path.join(output_dir, VFD_REPORT_FILE)
+    report_dir = os.path.dirname(os.path.abspath(report_file))
+    os.makedirs(report_dir, exist_ok=True)
+    with open(report_file, "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=4)
+
+    print(f"图纸: 共 {summary['rows']} 个，成功 {summary['succeeded']} 个，失败 {summary['failed']} 个，"
+          f"缓存 {summary['cached']} 个，警告 {summary['warnings']} 条，用时 {summary['seconds']}s")
+    for result in summary["results"]:
+        if result["error"]:
+            print(f"失败: 数据行 {result['index'] + 1}: {result['error']}")
+        for warning in result["warnings"]:
+            print(f"警告: 数据行 {result['index'] + 1}: {warning['reason']}")
+    print(f"报告已写入: {report_file}")
+    return 1 if summary["failed"] else 0
+
+
+# check 子命令：检查BRB模板和VFD产品结构图的锚点，不生成图纸
+def command_check(args):
+    # 型号表和模板路径相对于本目录
+    os.chdir(design_dir)
+    results = {}
+    results.update((f"BRB {name}", problems) for name, problems in brb_drawing.check_anchors().items())
+    results.update((f"VFD {name}", problems) for name, problems in vfd_drawing.check_anchors().items())
+    failed = 0
+    for name, problems in results.items():
+        print(f"{name}: {'正常' if not problems else f'{len(problems)} 个问题'}")
+        for problem in problems:
+            print(f"    {problem}")
+        failed += bool(problems)
+    return 1 if failed else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="cad-change", description="无界面生成BRB、VFD图纸和材料单")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="根据设计文件生成全部图纸和材料单")
+    build_parser.add_argument("project", help="设计文件，即设计界面保存的 *_design.json")
+    build_parser.add_argument("-o", "--out", help="输出目录，默认为设计文件所在目录")
+    build_parser.add_argument("-j", "--jobs", type=int, default=None, help="并行进程数，默认为CPU核数")
+    build_parser.add_argument("--report", help=f"构建报告路径，默认为输出目录下的 {REPORT_FILE}")
+    build_parser.add_argument("--no-drawings", action="store_true", help="不生成图纸")
+    build_parser.add_argument("--no-materials", action="store_true", help="不生成材料单")
+    add_output_options(build_parser)
+    build_parser.set_defaults(func=command_build)
+
+    vfd_parser = subparsers.add_parser("vfd", help="根据数据表批量生成VFD图纸，每行一个图纸")
+    vfd_parser.add_argument("table", help="数据表JSON文件，内容为数据行列表，每行的参数与VFD设计界面相同")
+    vfd_parser.add_argument("-o", "--out", help="输出目录，默认为数据表所在目录")
+    vfd_parser.add_argument("-j", "--jobs", type=int, default=None, help="并行进程数，默认为CPU核数")
+    vfd_parser.add_argument("--report", help=f"生成报告路径，默认为输出目录下的 {VFD_REPORT_FILE}")
+    add_output_options(vfd_parser)
+    vfd_parser.set_defaults(func=command_vfd)
+
+    check_parser = subparsers.add_parser("check", help="检查模板的锚点是否都能找到")
+    check_parser.set_defaults(func=command_check)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
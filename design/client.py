@@ -1,7 +1,12 @@
 import tkinter as tk
 import os
 import json
+import logging
+import time
+import diagnostics
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from tkinter import filedialog, messagebox, ttk
+from brb_project import validate_project, drawing_data_table, material_param_tables
 
 
 class CADApp:
@@ -107,8 +112,9 @@ class CADApp:
             )
             if output_file:
                 try:
-                    csv_to_dxf.csv_to_dxf(input_file, output_file)
-                    messagebox.showinfo("成功", "CSV转DXF成功！")
+                    # 转换问题由 csv_to_dxf 汇总提示，没有错误时才提示成功
+                    if not csv_to_dxf.csv_to_dxf(input_file, output_file)["errors"]:
+                        messagebox.showinfo("成功", "CSV转DXF成功！")
                 except Exception as e:
                     messagebox.showerror("错误", f"转换失败: {str(e)}")
 
@@ -162,9 +168,20 @@ class CADApp:
 class DesignForm:
     """BRB产品设计表单类"""
 
+    # 后台任务状态轮询间隔（毫秒）
+    POLL_INTERVAL = 100
+
     def __init__(self, parent):
         self.parent = parent
 
+        # 后台执行器：图纸在子进程中生成，材料单在后台线程中生成，界面保持响应
+        self.drawing_executor = None
+        self.materials_executor = None
+        self.drawing_futures = []  # 当前批次各参数表的任务
+        self.drawing_tables = []  # 当前批次的参数表编号，与任务一一对应
+        self.drawing_start = 0.0
+        self.parent.bind("<Destroy>", self._on_destroy, add="+")
+
         # 创建主菜单
         self.create_menu()
 
@@ -358,20 +375,33 @@ class DesignForm:
 
 
         # 创建生成图纸按钮，点击时调用generate_drawing方法开始生成图纸
-        generate_btn = tk.Button(btn_frame, text="生成图纸",
+        self.generate_btn = tk.Button(btn_frame, text="生成图纸",
                                  command=self.generate_drawing,
                                  font=("SimHei", 12,),
                                  bg="#4CAF50", fg="black",
                                  height=2, width=18, bd=0, highlightthickness=0, relief="flat", borderwidth=0)
-        generate_btn.pack(side=tk.RIGHT, padx=10)
+        self.generate_btn.pack(side=tk.RIGHT, padx=10)
         
         # 创建生成材料单按钮
-        materials_btn = tk.Button(btn_frame, text="生成材料单",
+        self.materials_btn = tk.Button(btn_frame, text="生成材料单",
                                  command=self.generate_materials,
                                  font=("SimHei", 12,),
                                  bg="#FF9800", fg="black",
                                  height=2, width=18, bd=0, highlightthickness=0, relief="flat", borderwidth=0)
-        materials_btn.pack(side=tk.RIGHT, padx=10)
+        self.materials_btn.pack(side=tk.RIGHT, padx=10)
+
+        # 生成进度区域：进度条、各参数表状态和取消按钮
+        progress_frame = tk.Frame(self.content_frame, bg="cornsilk")
+        progress_frame.pack(fill=tk.X, pady=5)
+        self.progress_bar = ttk.Progressbar(progress_frame, mode="determinate", length=300)
+        self.progress_bar.pack(side=tk.LEFT, padx=10)
+        self.cancel_btn = tk.Button(progress_frame, text="取消生成", command=self.cancel_drawing,
+                                    font=("SimHei", 10), state=tk.DISABLED,
+                                    bd=0, highlightthickness=0, relief="flat", borderwidth=0)
+        self.cancel_btn.pack(side=tk.RIGHT, padx=10)
+        self.progress_label = tk.Label(progress_frame, text="", font=("SimHei", 10), bg="cornsilk",
+                                       anchor=tk.W, justify=tk.LEFT, wraplength=600)
+        self.progress_label.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
         
         # 创建提示信息标签区域
         self.message_frame = tk.Frame(self.content_frame, bg="cornsilk")
@@ -447,8 +477,9 @@ class DesignForm:
         template_var = tk.StringVar()
         template_combo = ttk.Combobox(template_frame, textvariable=template_var,
                                       width=8, font=('SimHei', 12),)
-        # 设置截面选项并默认选择第一个
-        template_combo['values'] = ('王一', '十一', '王工')
+        # 设置截面选项（data 目录中有规则文件的模板）并默认选择第一个
+        from update_rules import discover_templates
+        template_combo['values'] = tuple(discover_templates(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')))
         template_combo.current(0)
         template_combo.pack(side=tk.LEFT, padx=5)
         # 为下拉框绑定鼠标滚轮事件
@@ -1042,66 +1073,125 @@ class DesignForm:
         """生成图纸"""
         data = self.get_form_data()
 
-        # 验证必要字段
-        if not data["project_name"]:
-            messagebox.showerror("错误", "请输入项目名称")
-            return 
-        
-        # 验证是否有参数表
-        if not data["param_tables"]:
-            messagebox.showerror("错误", "请至少添加一个参数表")
+        # 验证必要字段，只提示第一个错误
+        errors = validate_project(data)
+        if errors:
+            messagebox.showerror("错误", errors[0])
             return
         
         # 准备数据表格，每个参数表对应一个数据项
-        data_table = []
-        
-        # 处理每个参数表
-        for table in data["param_tables"]:
-            # 验证参数表是否填写了设计力
-            if not table["design_force"]:
-                messagebox.showerror("错误", f"请为参数表 {table['table_number']} 输入设计力")
-                return
-            
-            # 验证参数表是否有长度-数量数据
-            if not table["length_quantity"]:
-                messagebox.showerror("错误", f"请为参数表 {table['table_number']} 添加至少一组长度-数量数据")
-                return
-            
-            # 验证参数表中的必填参数
-            for param_label in ["截面宽度(mm)", "截面高度(mm)", "板材厚度(mm)", "焊缝高度(mm)", "方管宽度(mm)", "方管厚度(mm)"]:
-                if not table["parameters"].get(param_label, "").strip():
-                    messagebox.showerror("错误", f"请为参数表 {table['table_number']} 填写 {param_label}")
-                    return
-            
-            # 为每个参数表准备数据项
-            table_item = {
-                "template": table["template"],
-                "project_name": data["project_name"],
-                "width": table["parameters"]["截面宽度(mm)"],  # 截面宽度
-                "height": table["parameters"]["截面高度(mm)"],  # 截面高度
-                "thickness": table["parameters"]["板材厚度(mm)"],  # 板厚
-                "force": table["design_force"],  # 设计力
-                "tube_width": table["parameters"]["方管宽度(mm)"],  # 方管宽度
-                "tube_thickness": table["parameters"]["方管厚度(mm)"],  # 方管厚度
-                "weld": table["parameters"]["焊缝高度(mm)"],  # 焊缝
-                "core_material": table["parameters"].get("芯板材料", "Q235"),  # 芯板材料，默认值Q235
-                "length_quantity": table["length_quantity"]  # 此参数表的长度-数量数据
-            }
-            
-            data_table.append(table_item)
+        data_table = drawing_data_table(data)
         
-        print(data_table)
+        logging.debug(f"图纸数据表: {data_table}")
         
         # 获取项目文件夹路径
         project_folder = self.project_folder_var.get()
-        # 调用brb_drawing函数生成图纸
-        from brb_drawing import brb_drawing
-        brb_drawing(data_table, project_folder)
-        # 更新图纸生成提示标签
-        self.drawing_message_label.config(text="图纸生成成功")
-        # 添加定时器，3秒后清空提示
-        self.parent.after(3000, lambda: self.drawing_message_label.config(text=""))
+        # 在后台子进程中逐表生成图纸，界面通过定时轮询更新进度
+        from brb_drawing import generate_table, init_worker
+        if self.drawing_executor is None:
+            self.drawing_executor = ProcessPoolExecutor(initializer=init_worker)
+        self.drawing_futures = [self.drawing_executor.submit(generate_table, index, row, project_folder)
+                                for index, row in enumerate(data_table)]
+        self.drawing_tables = [table["table_number"] for table in data["param_tables"]]
+        self.drawing_start = time.perf_counter()
+
+        self.generate_btn.config(state=tk.DISABLED)
+        self.cancel_btn.config(state=tk.NORMAL)
+        self.progress_bar.config(maximum=len(self.drawing_futures), value=0)
+        self.drawing_message_label.config(text="正在生成图纸...", fg="green")
+        self.parent.after(self.POLL_INTERVAL, self._poll_drawing)
+
+    def _drawing_status(self, future):
+        """返回单个参数表任务的状态文字"""
+        if future.cancelled():
+            return "已取消"
+        if not future.done():
+            return "生成中" if future.running() else "等待"
+        try:
+            result = future.result()
+        except Exception:
+            return "失败"
+        return "失败" if result["error"] else "完成"
+
+    def _poll_drawing(self):
+        """定时检查后台生成进度，在主线程中更新界面"""
+        if not self.drawing_futures or not self.parent.winfo_exists():
+            return
+        done = sum(1 for future in self.drawing_futures if future.done())
+        self.progress_bar.config(value=done)
+        statuses = [f"参数表{number}: {self._drawing_status(future)}"
+                    for number, future in zip(self.drawing_tables, self.drawing_futures)]
+        self.progress_label.config(text=f"{done}/{len(self.drawing_futures)}  " + "，".join(statuses))
+        if done < len(self.drawing_futures):
+            self.parent.after(self.POLL_INTERVAL, self._poll_drawing)
+        else:
+            self._finish_drawing()
+
+    def _finish_drawing(self):
+        """全部参数表结束后汇总结果"""
+        errors = []
+        warnings = []
+        succeeded = cancelled = 0
+        for number, future in zip(self.drawing_tables, self.drawing_futures):
+            if future.cancelled():
+                cancelled += 1
+                continue
+            try:
+                result = future.result()
+            except Exception as e:
+                # 子进程异常退出等情况
+                result = {"error": str(e), "warnings": []}
+            warnings += [f"参数表 {number}: {warning['reason']}" for warning in result["warnings"]]
+            if result["error"]:
+                errors.append(f"参数表 {number}: {result['error']}")
+            else:
+                succeeded += 1
+        seconds = time.perf_counter() - self.drawing_start
+        self.drawing_futures = []
+        self.generate_btn.config(state=tk.NORMAL)
+        self.cancel_btn.config(state=tk.DISABLED)
+
+        if errors or cancelled:
+            self.drawing_message_label.config(
+                text=f"图纸生成完成：成功 {succeeded} 个，失败 {len(errors)} 个，取消 {cancelled} 个，用时 {seconds:.1f}s",
+                fg="red" if errors else "green")
+        else:
+            # 更新图纸生成提示标签
+            self.drawing_message_label.config(text=f"图纸生成成功，用时 {seconds:.1f}s", fg="green")
+            # 添加定时器，3秒后清空提示
+            self.parent.after(3000, lambda: self.drawing_message_label.config(text=""))
+        # 失败和转换警告合并为一个汇总对话框
+        if errors or warnings:
+            lines = []
+            if errors:
+                lines += ["以下参数表生成失败："] + errors
+            if warnings:
+                lines.append(f"转换警告 {len(warnings)} 条：")
+                lines += warnings[:diagnostics.SUMMARY_LIMIT]
+                if len(warnings) > diagnostics.SUMMARY_LIMIT:
+                    lines.append(f"……其余 {len(warnings) - diagnostics.SUMMARY_LIMIT} 条请查看日志")
+            show = messagebox.showerror if errors else messagebox.showwarning
+            show("错误" if errors else "警告", "\n".join(lines), parent=self.parent)
+
+    def cancel_drawing(self):
+        """取消尚未开始的参数表，正在生成的参数表会继续完成"""
+        for future in self.drawing_futures:
+            future.cancel()
+        self.cancel_btn.config(state=tk.DISABLED)
+        self.drawing_message_label.config(text="正在取消，等待进行中的参数表完成...", fg="green")
+
+    def _on_destroy(self, event):
+        """窗口关闭时取消未开始的任务并释放后台执行器"""
+        if event.widget is not self.parent:
+            return
+        for future in self.drawing_futures:
+            future.cancel()
+        self.drawing_futures = []
+        for executor in (self.drawing_executor, self.materials_executor):
+            if executor is not None:
+                executor.shutdown(wait=False)
         
+
     def generate_materials(self):
         """
         生成材料单
@@ -1120,30 +1210,33 @@ class DesignForm:
                 return
             
             # 转换参数表格式以适应brb_materials.py的要求
-            param_tables = []
-            for table in data["param_tables"]:
-                # 转换长度-数量数据格式
-                length_quantity = [
-                    {"length": lq[0], "quantity": lq[1]} 
-                    for lq in table["length_quantity"]
-                ]
-                
-                param_table = {
-                    "table_number": table["table_number"],
-                    "design_force": table["design_force"],
-                    "template_type": table["template"],
-                    "params": table["parameters"],
-                    "core_material": table["parameters"].get("芯板材料", "Q235"),  # 将芯板材料单独提取到顶层
-                    "length_quantity": length_quantity
-                }
-                param_tables.append(param_table)
-                print(param_table)
+            param_tables = material_param_tables(data)
+            logging.debug(f"材料单参数表: {param_tables}")
             
-            # 调用brb_materials函数生成材料单
+            # 调用brb_materials函数生成材料单，在后台线程中执行
             from brb_materials import generate_materials_excel
             # 使用设定的项目文件夹作为保存路径
             project_folder = self.project_folder_var.get()
-            excel_path = generate_materials_excel(data["project_name"], param_tables, project_folder=project_folder)
+            if self.materials_executor is None:
+                self.materials_executor = ThreadPoolExecutor(max_workers=1)
+            future = self.materials_executor.submit(generate_materials_excel, data["project_name"], param_tables,
+                                                    project_folder=project_folder)
+            self.materials_btn.config(state=tk.DISABLED)
+            self.materials_message_label.config(text="正在生成材料单...", fg="green")
+            self.parent.after(self.POLL_INTERVAL, lambda: self._poll_materials(future))
+        except Exception as e:
+            messagebox.showerror("错误", f"材料单生成过程中发生错误：{str(e)}")
+
+    def _poll_materials(self, future):
+        """定时检查材料单是否生成完成，在主线程中更新界面"""
+        if not self.parent.winfo_exists():
+            return
+        if not future.done():
+            self.parent.after(self.POLL_INTERVAL, lambda: self._poll_materials(future))
+            return
+        self.materials_btn.config(state=tk.NORMAL)
+        try:
+            excel_path = future.result()
             
             if excel_path:
                 # 更新材料单提示标签
@@ -0,0 +1,706 @@
+import ast
+import copy
+import csv
+import hashlib
+import io
+import json
+import logging
+import os
+import pickle
+
+from ezdxf.entities.dimstyle import DimStyle
+from ezdxf.lldxf.types import TYPE_TABLE
+
+
+# 磁盘缓存目录，编译结果按模板路径和文件内容的哈希保存，每个模板路径只保留最新内容的编译结果
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.template_cache')
+# 编译格式版本，记录结构变化时递增，使旧的磁盘缓存失效
+CACHE_VERSION = 4
+
+# 内存缓存：模板绝对路径 -> (修改时间, 文件大小, 编译后的模板)
+_memory_cache = {}
+
+# 线性尺寸类型
+LINEAR_DIM_TYPES = ["LINEAR", "ALIGNED", "LINEAR_HORIZONTAL", "LINEAR_VERTICAL", "LINEAR_ROTATED"]
+
+# 锚点列：需要按参数修改的行填写固定的名称，数据更新时按名称查找行，模板增删行或重新导出后行号变化也不受影响
+ANCHOR_COLUMN = "锚点"
+# 绘制到DXF时锚点保存在实体的扩展数据中，DXF转CSV时读回锚点列
+ANCHOR_APPID = "CAD_CHANGE"
+
+
+# 模板行数据无效时抛出的异常，异常信息即为提示给用户的警告，field 为出错的字段
+class TemplateRowError(ValueError):
+    def __init__(self, message, field=""):
+        super().__init__(message)
+        self.field = field
+
+
+# 模板中找不到锚点时抛出的异常，与行号超出范围相同
+class AnchorError(IndexError):
+    pass
+
+
+# 定义默认颜色
+def handle_color(color):
+    if color == 'BYLAYER':
+        return 256
+    try:
+        return int(color) if color is not None else 256
+    except (ValueError, TypeError):
+        return 256
+
+
+# 安全转换数值函数
+def safe_float(value, default=0.0):
+    try:
+        return float(value) if value is not None else default
+    except (ValueError, TypeError):
+        return default
+
+
+# 读取线宽，空值或无效值使用 -1 (BYLAYER)
+def handle_lineweight(lineweight):
+    try:
+        return int(lineweight) if lineweight else -1
+    except (ValueError, TypeError):
+        return -1
+
+
+# 读取块引用行引用的块名，兼容只在块名列中记录 "块名: xxx" 的旧格式
+def insert_block_name(row):
+    if row.get("类型/名称"):
+        return row["类型/名称"]
+    return row["块名"].split(": ", 1)[1]
+
+
+# 读取块引用的缩放比例，格式为 "比例" 或 "X比例;Y比例"，缺省为1
+def handle_insert_scale(scale_str):
+    if not scale_str:
+        return 1.0, 1.0
+    parts = scale_str.split(";")
+    xscale = safe_float(parts[0], 1.0)
+    yscale = safe_float(parts[1], xscale) if len(parts) > 1 else xscale
+    return xscale, yscale
+
+
+# 一次遍历CSV数据，按实体类型和所属块分组，返回各组的行下标
+def index_rows(data):
+    index = {
+        "layers": [],     # 图层行
+        "dimstyles": [],  # 标注样式行
+        "entities": [],   # 模型空间实体及块引用行，保持文件顺序
+        "blocks": {},     # 块名 -> 块内实体行
+    }
+    for i, row in enumerate(data):
+        entity_type = row["实体类型"]
+        block_ref = row["块名"]
+        if entity_type == "图层":
+            index["layers"].append(i)
+        elif entity_type.lower() == "dimstyle":
+            index["dimstyles"].append(i)
+        elif block_ref.startswith("引用于: "):
+            index["blocks"].setdefault(block_ref.split(": ", 1)[1], []).append(i)
+        elif not block_ref or (entity_type == 'INSERT' and block_ref.startswith("块名: ")):
+            index["entities"].append(i)
+    return index
+
+
+# 建立锚点索引，anchors 为各行锚点列的值：返回 (锚点名称 -> 行下标, 重复的锚点名称)，重复时使用第一行
+def anchor_index(anchors):
+    index = {}
+    duplicates = []
+    for i, anchor in enumerate(anchors):
+        if not anchor:
+            continue
+        if anchor in index:
+            duplicates.append(anchor)
+        else:
+            index[anchor] = i
+    return index, duplicates
+
+
+# csv.reader 格式的表格（首行为表头）的锚点索引：返回 (锚点名称 -> 行号, 重复的锚点名称)，没有锚点列时为空
+def table_anchors(table):
+    if ANCHOR_COLUMN not in table[0]:
+        return {}, []
+    column = table[0].index(ANCHOR_COLUMN)
+    index, duplicates = anchor_index(row[column] if len(row) > column else "" for row in table[1:])
+    return {anchor: i + 1 for anchor, i in index.items()}, duplicates
+
+
+# 检查锚点：返回找不到的锚点名称和重复的锚点名称对应的问题说明，全部正常时为空列表
+def verify_anchors(anchors, names, duplicates=(), source=""):
+    problems = [f"模板 {source} 中找不到锚点 {name}" for name in names if name not in anchors]
+    problems += [f"模板 {source} 中锚点 {name} 重复，将使用第一个" for name in sorted(set(duplicates))]
+    return problems
+
+
+# 解析线型图案，无效数据时记录警告并使用空列表
+def parse_linetype_pattern(linetype_pattern_str, linetype, input_file, layer, warnings):
+    linetype_pattern = []
+    if linetype_pattern_str:
+        parts = linetype_pattern_str.split(";")
+        for part in parts:
+            try:
+                value = float(part.strip())
+                linetype_pattern.append(value)
+            except ValueError:
+                if linetype != "Continuous":
+                    warnings.append(("线型图案",
+                                     f"文件 {input_file} 中图层 {layer} 的线型图案字段 '{linetype_pattern_str}' 包含无效数据，将使用空列表代替。"))
+                linetype_pattern = []
+                break
+    return linetype_pattern
+
+
+# 解析图层行
+def parse_layer(row, input_file, warnings):
+    layer = row["图层"]
+    linetype = row["线型"]
+    return {
+        "name": layer,
+        "color": handle_color(row["颜色"]),
+        "linetype": linetype,
+        "lineweight": int(row["线宽"]),
+        "description": row["线型描述"],
+        "pattern": parse_linetype_pattern(row["线型图案"], linetype, input_file, layer, warnings),
+    }
+
+
+# 计算标注样式中的数值表达式，结果为 (系数, 常数)，表示 系数 * scale_factor + 常数
+# 只支持数字、scale_factor 以及加减法和乘除常数，其他写法抛出 ValueError
+def scale_expression(node):
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        return 0, node.value
+    if isinstance(node, ast.Name) and node.id == "scale_factor":
+        return 1, 0
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.UAdd, ast.USub)):
+        coef, const = scale_expression(node.operand)
+        return (-coef, -const) if isinstance(node.op, ast.USub) else (coef, const)
+    if isinstance(node, ast.BinOp):
+        left = scale_expression(node.left)
+        right = scale_expression(node.right)
+        if isinstance(node.op, ast.Add):
+            return left[0] + right[0], left[1] + right[1]
+        if isinstance(node.op, ast.Sub):
+            return left[0] - right[0], left[1] - right[1]
+        if isinstance(node.op, ast.Mult) and (left[0] == 0 or right[0] == 0):
+            return left[0] * right[1] + right[0] * left[1], left[1] * right[1]
+        if isinstance(node.op, ast.Div) and right[0] == 0 and right[1] != 0:
+            return left[0] / right[1], left[1] / right[1]
+    raise ValueError(f"不支持的表达式 {ast.unparse(node)}")
+
+
+# 读取标注样式行的属性文本，返回 {属性名: 值或 (系数, 常数)}
+# 通常为 dxf_to_csv.write_dimstyle_info 写入的JSON，也支持手工填写的 scale_factor 表达式
+def read_dimstyle_attribs(text):
+    try:
+        attribs = json.loads(text)
+        if isinstance(attribs, dict):
+            return attribs
+    except ValueError:
+        pass
+    node = ast.parse(text.strip(), mode="eval").body
+    if not isinstance(node, ast.Dict) or None in node.keys:
+        raise ValueError("属性必须为字典")
+    attribs = {}
+    for key, value in zip(node.keys, node.values):
+        if not isinstance(key, ast.Constant) or not isinstance(key.value, str):
+            raise ValueError(f"属性名 {ast.unparse(key)} 不是字符串")
+        if isinstance(value, ast.Constant) and isinstance(value.value, str):
+            attribs[key.value] = value.value
+        else:
+            coef, const = scale_expression(value)
+            attribs[key.value] = const if coef == 0 else (coef, const)
+    return attribs
+
+
+# 解析标注样式行，属性按 ezdxf 的标注样式定义检查类型
+# 记录中 attribs 为固定值，scaled 为与缩放比例相关的值 {属性名: (系数, 常数, 类型)}，由 resolve_dimstyle 计算
+def parse_dimstyle(row, input_file, line_num, warnings):
+    name = row["类型/名称"]
+    try:
+        attribs = read_dimstyle_attribs(row["值"])
+    except (ValueError, SyntaxError) as e:
+        raise TemplateRowError(f"文件 {input_file} 第 {line_num} 行的标注样式 '{name}' 属性无法解析: {str(e)}，将略过此标注样式。", "值")
+    record = {"name": name, "attribs": {}, "scaled": {}}
+    for key, value in attribs.items():
+        dxfattrib = DimStyle.DXFATTRIBS.get(key)
+        if dxfattrib is None or key in ("handle", "owner", "name"):
+            warnings.append(("值", f"文件 {input_file} 第 {line_num} 行的标注样式 '{name}' 包含未知属性 '{key}'，将忽略此属性。"))
+            continue
+        value_type = TYPE_TABLE.get(dxfattrib.code, str)
+        if isinstance(value, tuple) and value_type is not str:
+            record["scaled"][key] = (value[0], value[1], value_type)
+        elif value_type is str and isinstance(value, str):
+            record["attribs"][key] = value
+        elif value_type is not str and isinstance(value, (int, float)) and not isinstance(value, bool) \
+                and (value_type is float or float(value).is_integer()):
+            record["attribs"][key] = value_type(value)
+        else:
+            warnings.append(("值", f"文件 {input_file} 第 {line_num} 行的标注样式 '{name}' 属性 '{key}' 的值 {value!r} 无效，将忽略此属性。"))
+    return record
+
+
+# 计算标注样式在指定缩放比例下的属性
+def resolve_dimstyle(record, scale_factor):
+    attribs = dict(record["attribs"])
+    for key, (coef, const, value_type) in record["scaled"].items():
+        value = coef * scale_factor + const
+        attribs[key] = value_type(round(value)) if value_type is int else value_type(value)
+    return attribs
+
+
+# 解析直线
+def parse_line(row, input_file, line_num):
+    try:
+        return {
+            "start": (float(row["起点 X"]), float(row["起点 Y"])),
+            "end": (float(row["终点 X"]), float(row["终点 Y"])),
+        }
+    except (ValueError, TypeError):
+        raise TemplateRowError(f"文件 {input_file} 第 {line_num} 行的 LINE 实体坐标字段包含无效数据，将略过此数据。",
+                               "起点 X, 起点 Y, 终点 X, 终点 Y")
+
+
+# 解析圆
+def parse_circle(row, input_file, line_num):
+    try:
+        return {
+            "center": (float(row["圆心 X"]), float(row["圆心 Y"])),
+            "radius": float(row["半径"]),
+        }
+    except (ValueError, TypeError):
+        raise TemplateRowError(f"文件 {input_file} 第 {line_num} 行的 CIRCLE 实体坐标或半径字段包含无效数据，将略过此数据。",
+                               "圆心 X, 圆心 Y, 半径")
+
+
+# 解析圆弧
+def parse_arc(row, input_file, line_num):
+    try:
+        return {
+            "center": (float(row["圆心 X"]), float(row["圆心 Y"])),
+            "radius": float(row["半径"]),
+            "start_angle": float(row["起始角度"]),
+            "end_angle": float(row["终止角度"]),
+        }
+    except (ValueError, TypeError):
+        raise TemplateRowError(f"文件 {input_file} 第 {line_num} 行的 ARC 实体坐标、半径或角度字段包含无效数据，将略过此数据。",
+                               "圆心 X, 圆心 Y, 半径, 起始角度, 终止角度")
+
+
+# 解析多段线，顶点格式为 (x, y, 起始宽度, 终止宽度, 凸度)
+def parse_lwpolyline(row, input_file, line_num):
+    vertices = []
+    for point in row["顶点数据"].split("; "):
+        try:
+            x, y, start_width, end_width, bulge = point.strip("()").split(", ")
+            vertices.append((float(x), float(y), float(start_width), float(end_width), float(bulge)))
+        except ValueError:
+            raise TemplateRowError(f"文件 {input_file} 第 {line_num} 行的 LWPOLYLINE 实体顶点数据包含无效数据，将略过此数据。", "顶点数据")
+    return {
+        "vertices": vertices,
+        "closed": row["闭合"] == "是",
+    }
+
+
+# 解析文本
+def parse_text(row, input_file, line_num):
+    try:
+        return {
+            "text": row["值"],
+            "insert": (float(row["位置 X"]), float(row["位置 Y"])),
+            "height": float(row["高度"]),
+            "rotation": float(row["角度"]),
+        }
+    except (ValueError, TypeError):
+        raise TemplateRowError(f"文件 {input_file} 第 {line_num} 行的 {row['实体类型']} 实体文本相关字段包含无效数据，将略过此数据。",
+                               "位置 X, 位置 Y, 高度, 角度")
+
+
+# 解析剖面线，边界顶点格式为 (x, y) 或 (x, y, 凸度)
+def parse_hatch(row, input_file, line_num):
+    pattern_name = row["类型/名称"]
+    if pattern_name == "AR-CONC":
+        scale = 0.1
+    else:
+        scale = safe_float(row.get("缩放比例", "1.0"))
+    boundary_vertices = []
+    boundary_vertices_str = row["顶点数据"]
+    if boundary_vertices_str:
+        for vertex_str in boundary_vertices_str.split("; "):
+            try:
+                parts = vertex_str.strip("()").split(", ")
+                if len(parts) == 2:
+                    x, y = parts
+                    bulge = 0
+                elif len(parts) == 3:
+                    x, y, bulge = parts
+                else:
+                    raise ValueError
+                boundary_vertices.append((float(x), float(y), float(bulge)))
+            except ValueError:
+                raise TemplateRowError(f"文件 {input_file} 第 {line_num} 行的 HATCH 实体边界顶点数据包含无效数据，将略过此数据。", "顶点数据")
+    return {
+        "pattern": pattern_name,
+        "scale": scale,
+        "vertices": boundary_vertices,
+    }
+
+
+# 解析尺寸标注，线性尺寸在此确定起止点顺序和角度
+def parse_dimension(row, input_file, line_num):
+    dim_type = row["类型/名称"]
+    dim_angle = safe_float(row["角度"])
+    # 覆盖测量文本
+    dim_text = row["覆盖值"] if row["覆盖值"] else row["值"]
+    result = {
+        "dim_type": dim_type,
+        # 优先使用CSV中保存的尺寸样式
+        "dimstyle": row.get("尺寸样式", ""),
+    }
+    if dim_type == "UNKNOWN":
+        raise TemplateRowError(f"第 {line_num} 行的尺寸标注类型未知，尺寸编码为 {row['尺寸编码']}，将略过此尺寸。", "尺寸编码")
+    if dim_type in LINEAR_DIM_TYPES:
+        try:
+            start = (float(row["起点 X"]), float(row["起点 Y"]))
+            end = (float(row["终点 X"]), float(row["终点 Y"]))
+            # 通过调整尺寸初始点和角度，来调整尺寸显示位置。
+            if 90 <= dim_angle <= 120 or 270 <= dim_angle <= 300:
+                p1, p2 = (start, end) if end[1] > start[1] else (end, start)
+            else:
+                p1, p2 = (start, end) if end[0] > start[0] else (end, start)
+            if 90 < dim_angle < 180:
+                dim_angle += 180
+            elif 180 <= dim_angle <= 270:
+                dim_angle -= 180
+            result.update({
+                "base": (float(row["位置 X"]), float(row["位置 Y"])),
+                "p1": p1,
+                "p2": p2,
+                "angle": dim_angle,
+                "text": dim_text,
+            })
+        except ValueError:
+            raise TemplateRowError(f"文件 {input_file} 第 {line_num} 行的 DIMENSION 实体线性尺寸坐标字段包含无效数据，将略过此数据。",
+                                   "位置 X, 位置 Y, 起点 X, 起点 Y, 终点 X, 终点 Y, 角度")
+    elif dim_type == 'ANGULAR':
+        try:
+            result.update({
+                "p1": (float(row["起点 X"]), float(row["起点 Y"])),
+                "p2": (float(row["终点 X"]), float(row["终点 Y"])),
+                "p3": (float(row["圆心 X"]), float(row["圆心 Y"])),
+            })
+        except ValueError:
+            raise TemplateRowError(f"文件 {input_file} 第 {line_num} 行的 DIMENSION 实体角度尺寸坐标字段包含无效数据，将略过此数据。",
+                                   "起点 X, 起点 Y, 终点 X, 终点 Y, 圆心 X, 圆心 Y")
+    elif dim_type in ['DIAMETER', 'RADIUS']:
+        try:
+            dim_value = float(row["值"])
+            result.update({
+                "center": (float(row["圆心 X"]), float(row["圆心 Y"])),
+                # 直径尺寸的值为直径，半径尺寸的值为半径
+                "radius": dim_value / 2 if dim_type == 'DIAMETER' else dim_value,
+                "location": (float(row["位置 X"]), float(row["位置 Y"])),
+                "angle": dim_angle,
+                "text": dim_text,
+            })
+        except ValueError:
+            name = "直径" if dim_type == 'DIAMETER' else "半径"
+            raise TemplateRowError(f"文件 {input_file} 第 {line_num} 行的 DIMENSION 实体{name}尺寸坐标或值字段包含无效数据，将略过此数据。",
+                                   "圆心 X, 圆心 Y, 半径, 角度, 值")
+    return result
+
+
+# 解析块引用
+def parse_insert(row, input_file, line_num):
+    try:
+        rotation = float(row["角度"])
+    except ValueError:
+        rotation = 0
+    xscale, yscale = handle_insert_scale(row.get("缩放比例", ""))
+    return {
+        "name": insert_block_name(row),
+        "insert": (float(row["位置 X"]), float(row["位置 Y"])),
+        "rotation": rotation,
+        "xscale": xscale,
+        "yscale": yscale,
+    }
+
+
+# 各实体类型的解析函数
+PARSERS = {
+    'LINE': parse_line,
+    'CIRCLE': parse_circle,
+    'ARC': parse_arc,
+    'LWPOLYLINE': parse_lwpolyline,
+    'TEXT': parse_text,
+    'MTEXT': parse_text,
+    'HATCH': parse_hatch,
+    'DIMENSION': parse_dimension,
+    'INSERT': parse_insert,
+}
+
+
+# 编译单行实体数据，返回类型化记录；不支持的类型返回 None，无效数据记录警告并返回 None
+def compile_row(row, line_num, input_file, warnings):
+    entity_type = row["实体类型"]
+    parser = PARSERS.get(entity_type)
+    if parser is None:
+        return None
+    try:
+        record = parser(row, input_file, line_num)
+        record.update({
+            "type": entity_type,
+            "line_num": line_num,
+            "layer": row["图层"],
+            "color": handle_color(row["颜色"]),
+            "linetype": row["线型"],
+            "lineweight": handle_lineweight(row["线宽"]),
+            "anchor": row.get(ANCHOR_COLUMN) or "",
+        })
+        return record
+    except TemplateRowError as e:
+        warnings.append((e.field, str(e)))
+    except Exception as e:
+        warnings.append(("", f"文件 {input_file} 第 {line_num} 行发生未知错误: {str(e)}，将略过此数据。"))
+    return None
+
+
+# 编译后的模板：保存原始行、逐行的类型化记录以及分组索引，编译后不再修改
+class CompiledTemplate:
+    def __init__(self, source, fieldnames, rows):
+        self.source = source          # 模板来源，用于提示信息
+        self.fieldnames = fieldnames  # CSV表头
+        self.rows = rows              # 原始行数据 (dict)
+        self.records = []             # 与 rows 一一对应的类型化记录，无效行和非实体行为 None
+        self.warnings = {}            # 行下标 -> 编译时产生的警告 [(相关字段, 警告信息)]
+        self.index = index_rows(rows)
+        # 锚点名称 -> 行下标，重复的锚点名称另行记录
+        self.anchors, self.duplicate_anchors = anchor_index(row.get(ANCHOR_COLUMN) for row in rows)
+
+        for i, row in enumerate(rows):
+            self.records.append(self.compile_line(i, row))
+
+    # 编译第 i 行，警告信息记录到 self.warnings
+    def compile_line(self, i, row):
+        row_warnings = []
+        if row["实体类型"] == "图层":
+            record = parse_layer(row, self.source, row_warnings)
+        elif row["实体类型"].lower() == "dimstyle":
+            try:
+                record = parse_dimstyle(row, self.source, i + 1, row_warnings)
+            except TemplateRowError as e:
+                row_warnings.append((e.field, str(e)))
+                record = None
+        else:
+            record = compile_row(row, i + 1, self.source, row_warnings)
+        if row_warnings:
+            self.warnings[i] = row_warnings
+        else:
+            self.warnings.pop(i, None)
+        return record
+
+    # 返回应用单元格修改后的新模板，changes 为 {行号: {列名: 值}}，行号与 csv.reader 结果的下标一致（表头为第0行）
+    # 只重新编译修改过的行，其余行的数据和记录与原模板共享，原模板保持不变
+    def with_changes(self, changes):
+        template = copy.copy(self)
+        template.rows = list(self.rows)
+        template.records = list(self.records)
+        template.warnings = dict(self.warnings)
+        reindex = False
+        reanchor = False
+        for line_num, columns in changes.items():
+            i = line_num - 1
+            row = dict(self.rows[i])
+            row.update(columns)
+            template.rows[i] = row
+            template.records[i] = template.compile_line(i, row)
+            # 修改了实体类型或块名时需要重新分组
+            reindex = reindex or "实体类型" in columns or "块名" in columns
+            reanchor = reanchor or ANCHOR_COLUMN in columns
+        if reindex:
+            template.index = index_rows(template.rows)
+        if reanchor:
+            template.anchors, template.duplicate_anchors = anchor_index(row.get(ANCHOR_COLUMN) for row in template.rows)
+        return template
+
+    # 模型空间实体及块引用的行下标，保持文件顺序
+    @property
+    def entities(self):
+        return self.index["entities"]
+
+    # 块名 -> 块内实体行下标
+    @property
+    def blocks(self):
+        return self.index["blocks"]
+
+    # 图层行下标
+    @property
+    def layers(self):
+        return self.index["layers"]
+
+    # 标注样式行下标
+    @property
+    def dimstyles(self):
+        return self.index["dimstyles"]
+
+
+# 模板覆盖层：以只读的编译模板为基础，记录单个任务的单元格修改，绘制时才生成新模板
+# 支持与 csv.reader 结果相同的下标读写方式 (overlay[行][列下标])，原有的数据更新函数无需改动
+class TemplateOverlay:
+    def __init__(self, base, changes=None):
+        self.base = base                 # 共享的编译模板，不会被修改
+        self.changes = changes or {}     # 行号 -> {列名: 值}
+
+    def __len__(self):
+        return len(self.base.rows) + 1
+
+    def __getitem__(self, line_num):
+        if line_num == 0:
+            # 表头返回副本，修改表头不影响模板
+            return list(self.base.fieldnames)
+        if line_num < 0 or line_num > len(self.base.rows):
+            raise IndexError(f"行号 {line_num} 超出模板范围")
+        return OverlayRow(self, line_num)
+
+    # 锚点所在的行号（与 csv.reader 结果的下标一致），找不到时抛出 AnchorError
+    def line(self, anchor):
+        i = self.base.anchors.get(anchor)
+        if i is None:
+            raise AnchorError(f"模板 {self.base.source} 中找不到锚点 {anchor}")
+        return i + 1
+
+    # 读取单元格，优先返回覆盖值
+    def get(self, line_num, column):
+        columns = self.changes.get(line_num)
+        if columns and column in columns:
+            return columns[column]
+        return self.base.rows[line_num - 1][column]
+
+    # 修改单元格，数值等非字符串按写入CSV后的文本保存
+    def set(self, line_num, column, value):
+        if line_num <= 0 or line_num > len(self.base.rows):
+            raise IndexError(f"行号 {line_num} 超出模板范围")
+        if column not in self.base.fieldnames:
+            raise KeyError(column)
+        value = "" if value is None else value if isinstance(value, str) else str(value)
+        self.changes.setdefault(line_num, {})[column] = value
+
+    # 生成应用修改后的编译模板
+    def compile(self):
+        return self.base.with_changes(self.changes)
+
+
+# 覆盖层中的一行，按列下标读写
+class OverlayRow:
+    def __init__(self, overlay, line_num):
+        self.overlay = overlay
+        self.line_num = line_num
+
+    def __len__(self):
+        return len(self.overlay.base.fieldnames)
+
+    def __getitem__(self, column_index):
+        return self.overlay.get(self.line_num, self.overlay.base.fieldnames[column_index])
+
+    def __setitem__(self, column_index, value):
+        self.overlay.set(self.line_num, self.overlay.base.fieldnames[column_index], value)
+
+    def __iter__(self):
+        return (self[j] for j in range(len(self)))
+
+
+# 从CSV文本编译模板
+def compile_csv_text(text, source):
+    reader = csv.DictReader(io.StringIO(text))
+    rows = list(reader)
+    return CompiledTemplate(source, reader.fieldnames, rows)
+
+
+# 从内存中的行数据编译模板，csv_data 与 csv.reader 的结果格式相同，首行为表头
+def compile_table(csv_data, source):
+    header = list(csv_data[0])
+    rows = []
+    for values in csv_data[1:]:
+        # 与 csv.DictReader 一致，跳过空行
+        if not values:
+            continue
+        # 数值等非字符串单元格按写入CSV后的文本处理
+        values = ["" if value is None else value if isinstance(value, str) else str(value) for value in values]
+        row = dict(zip(header, values))
+        # 缺少的列与 csv.DictReader 一致，值为 None
+        for name in header[len(values):]:
+            row[name] = None
+        rows.append(row)
+    return CompiledTemplate(source, header, rows)
+
+
+# 模板路径的哈希，作为磁盘缓存文件名的前缀
+def path_hash(path):
+    return hashlib.sha1(path.encode('utf-8')).hexdigest()[:16]
+
+
+# 磁盘缓存文件路径：模板路径哈希.内容哈希.版本
+def cache_path(source_hash, content_hash):
+    return os.path.join(CACHE_DIR, f"{source_hash}.{content_hash}.v{CACHE_VERSION}.pickle")
+
+
+# 读取磁盘缓存，不存在或损坏时返回 None
+def load_cached(source_hash, content_hash):
+    path = cache_path(source_hash, content_hash)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    except Exception as e:
+        logging.warning(f"读取模板缓存 {path} 失败: {str(e)}，将重新编译。")
+        return None
+
+
+# 写入磁盘缓存，并删除同一模板路径的旧内容或旧版本的缓存；失败时只记录日志
+def save_cached(source_hash, content_hash, template):
+    path = cache_path(source_hash, content_hash)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            pickle.dump(template, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+    except OSError as e:
+        logging.warning(f"写入模板缓存 {path} 失败: {str(e)}")
+        return
+    for name in os.listdir(CACHE_DIR):
+        if name.startswith(f"{source_hash}.") and name.endswith(".pickle") and name != os.path.basename(path):
+            try:
+                os.remove(os.path.join(CACHE_DIR, name))
+            except FileNotFoundError:
+                pass
+
+
+# 加载模板：先查内存缓存（按修改时间和大小），再查磁盘缓存（按路径和文件内容哈希），都未命中时编译CSV
+def load_template(input_file):
+    path = os.path.abspath(input_file)
+    stat = os.stat(path)
+    cached = _memory_cache.get(path)
+    if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+
+    with open(path, 'rb') as f:
+        content = f.read()
+    # 警告信息中包含文件路径，因此路径也参与哈希
+    content_hash = hashlib.sha1(path.encode('utf-8') + b'\0' + content).hexdigest()
+    source_hash = path_hash(path)
+    template = load_cached(source_hash, content_hash)
+    if template is None:
+        template = compile_csv_text(content.decode('utf-8'), input_file)
+        save_cached(source_hash, content_hash, template)
+    _memory_cache[path] = (stat.st_mtime_ns, stat.st_size, template)
+    return template
+
+
+# 清空内存缓存，用于测试或模板批量更新后
+def clear_memory_cache():
+    _memory_cache.clear()
@@ -1,8 +1,20 @@
 import ezdxf
-import csv
 import tkinter as tk
 from tkinter import filedialog, messagebox
 import logging
+import os
+import pickle
+from datetime import datetime
+
+from ezdxf.entities.dimstyle import DimStyle, EXPORT_MAP_R2007
+from ezdxf.tools import juliandate
+
+import diagnostics
+import dimension_cache
+import dxf_output
+import dxf_writer
+from csv_template import load_template, compile_table, resolve_dimstyle, CompiledTemplate, TemplateOverlay, LINEAR_DIM_TYPES, \
+    ANCHOR_APPID
 
 # 配置日志记录
 logging.basicConfig(filename='dxf_csv_conversion.log', level=logging.INFO,
@@ -11,94 +23,223 @@ logging.basicConfig(filename='dxf_csv_conversion.log', level=logging.INFO,
 # 全局缩放因子，默认为5
 global_scale_factor = 5
 
-# 定义默认颜色
-def handle_color(color):
-    if color == 'BYLAYER':
-        return 256
-    try:
-        return int(color) if color is not None else 256
-    except (ValueError, TypeError):
-        return 256
+# 是否弹出警告对话框，批量/无界面生成时设为 False，仅记录日志
+show_dialogs = True
 
-# 安全转换数值函数
-def safe_float(value, default=0.0):
-    try:
-        return float(value) if value is not None else default
-    except (ValueError, TypeError):
-        return default
+# 是否生成尺寸标注的图形块，设为 False 时只写入标注实体，由CAD软件（如BricsCAD）重新生成标注图形
+# 设置环境变量 CAD_CHANGE_RENDER_DIMENSIONS=0 可关闭，子进程同样生效
+render_dimensions = os.environ.get("CAD_CHANGE_RENDER_DIMENSIONS", "1") != "0"
+
+# 模板只包含直线、圆、圆弧、多段线和单行文字时，直接写出实体的组码，不建立实体对象
+# 只用于 csv_to_dxf 单独转换CSV文件；render_rows 的调用者需要返回的文档对象，BRB、VFD 模板也含有块引用和标注，不使用快速写出
+fast_writer = True
+
+# 标注记录中不属于几何数据和文字的字段，不放入尺寸块缓存键
+DIMENSION_KEY_SKIPPED = {"line_num", "anchor", "layer", "color", "linetype", "lineweight"}
+
+# 文档骨架缓存，图层、线型和标注样式相同的模板共用：骨架键 -> (序列化的文档, 默认标注样式名称)
+_skeletons = {}
+# 缓存的文档骨架数量上限
+MAX_SKELETONS = 32
 
 # csv转dxf主函数，创建新的DXF文档
+# 转换过程中的警告和错误汇总到问题收集器，结束后只弹出一个汇总对话框，返回结构化的问题报告
 def csv_to_dxf(input_file, output_file):
-    try:
-        # 创建一个新的 DXF 文档
-        doc = ezdxf.new("R2018")
-        msp = doc.modelspace()
-        drawing(doc, msp, input_file, output_file)
-
-    except FileNotFoundError:
-        messagebox.showerror("错误", f"文件 {input_file} 未找到")
-        logging.error(f"文件 {input_file} 未找到")
-    except Exception as e:
-        messagebox.showerror("错误", f"发生未知错误: {str(e)}")
-        logging.error(f"发生未知错误: {str(e)}")
+    with diagnostics.collecting() as collector:
+        try:
+            # 从文档骨架创建新的 DXF 文档
+            template = load_template(input_file)
+            doc, dimstyle_name = new_document(template)
+            saved_file = dxf_writer.write_template(doc, template, output_file) if fast_writer else None
+            if saved_file:
+                for i in template.entities:
+                    show_row_warnings(template, i)
+                print(f"DXF 文件已快速写出: {saved_file}")
+                logging.info(f"{input_file} 已成功转换为 {saved_file} (CSV to DXF，快速写出)")
+            else:
+                draw_entities(doc, doc.modelspace(), template, dimstyle_name)
+                save_drawing(doc, input_file, output_file)
+
+        except FileNotFoundError:
+            diagnostics.record(f"文件 {input_file} 未找到", input_file, level="error")
+        except Exception as e:
+            diagnostics.record(f"发生未知错误: {str(e)}", input_file, level="error")
+    if show_dialogs:
+        diagnostics.show_summary(collector)
+    return collector.report()
 
 
-# csv转dxf主函数，添加到已有的DXF文档
+# csv转dxf主函数，添加到已有的DXF文档，返回结构化的问题报告
 def csv_add_dxf(input_file, output_file):
-    try:
-        # 打开一个 DXF 文档
-        doc = ezdxf.readfile(output_file)
-        msp = doc.modelspace()
-        drawing(doc, msp, input_file, output_file)
-
-    except FileNotFoundError:
-        messagebox.showerror("错误", f"文件 {input_file} 未找到")
-        logging.error(f"文件 {input_file} 未找到")
-    except Exception as e:
-        messagebox.showerror("错误", f"发生未知错误: {str(e)}")
-        logging.error(f"发生未知错误: {str(e)}")
+    with diagnostics.collecting() as collector:
+        try:
+            # 打开一个 DXF 文档
+            doc = dxf_output.read_document(output_file)
+            msp = doc.modelspace()
+            drawing(doc, msp, input_file, output_file)
+
+        except FileNotFoundError:
+            diagnostics.record(f"文件 {input_file} 未找到", input_file, level="error")
+        except Exception as e:
+            diagnostics.record(f"发生未知错误: {str(e)}", input_file, level="error")
+    if show_dialogs:
+        diagnostics.show_summary(collector)
+    return collector.report()
+
+# 内存数据转dxf主函数，rows 为首行是表头的行列表、已编译的模板或模板覆盖层，不经过临时CSV文件
+# doc 为已有文档时在其上追加绘制；output_file 为空时只返回文档不保存
+# dimensions 为是否生成尺寸标注的图形块，为 None 时使用 render_dimensions
+def rows_to_dxf(rows, output_file=None, doc=None, source="内存数据", dimensions=None):
+    with diagnostics.collecting() as collector:
+        try:
+            doc = render_rows(rows, output_file, doc, source, dimensions)
+
+        except Exception as e:
+            diagnostics.record(f"发生未知错误: {str(e)}", source, level="error")
+            doc = None
+    if show_dialogs:
+        diagnostics.show_summary(collector)
+    return doc
+
+
+# 与 rows_to_dxf 相同，但不弹出错误对话框，异常直接抛给调用者（用于子进程和批量生成）
+# 返回的文档供调用者追加图形或另行保存，因此总是建立完整的实体对象，不使用快速写出
+def render_rows(rows, output_file=None, doc=None, source="内存数据", dimensions=None):
+    if isinstance(rows, CompiledTemplate):
+        template = rows
+    elif isinstance(rows, TemplateOverlay):
+        template = rows.compile()
+    else:
+        template = compile_table(rows, source)
+    if doc is None:
+        doc, dimstyle_name = new_document(template)
+        draw_entities(doc, doc.modelspace(), template, dimstyle_name, dimensions)
+    else:
+        # 追加到内存中的文档时，标注样式与追加到已保存后重新读取的图纸相同
+        settle_dimstyles(doc)
+        draw_template(doc, doc.modelspace(), template, dimensions)
+    if output_file:
+        save_drawing(doc, template.source, output_file)
+    return doc
+
+
+# 补全标注样式中未设置的必需属性，使用保存DXF时写出的默认值（如 dimgap=0.625）
+# 新建的标注样式只包含创建时指定的属性，保存后重新读取的图纸中这些属性都有值，两者生成的尺寸文字位置不同
+def settle_dimstyles(doc):
+    for dimstyle in doc.dimstyles:
+        for name in EXPORT_MAP_R2007:
+            attrib = DimStyle.DXFATTRIBS.get(name)
+            # 句柄属性在读取时由名称解析，不需要补全
+            if attrib.optional or name.endswith("_handle") or dimstyle.dxf.hasattr(name):
+                continue
+            dimstyle.dxf.set(name, attrib.default)
+
+
+# 记录一个转换警告：写入日志并加入当前的问题收集器，不在收集过程中时直接弹出警告对话框
+def warn(reason, file="", line=None, entity_type="", field=""):
+    if not diagnostics.record(reason, file, line, entity_type, field) and show_dialogs:
+        messagebox.showwarning("警告", reason)
+
+
+# 提示模板中某一行编译时产生的警告
+def show_row_warnings(template, i):
+    for field, message in template.warnings.get(i, []):
+        warn(message, template.source, i + 1, template.rows[i].get("实体类型", ""), field)
+
 
 # 绘制函数，用于绘制实体到DXF文档，根据输入文件类型选择不同的绘制方法
 def drawing(doc, msp, input_file, output_file):
+    # 模板只在首次使用或文件变化后解析，之后直接使用缓存的编译结果
+    template = load_template(input_file)
+    draw_template(doc, msp, template)
+    save_drawing(doc, input_file, output_file)
+
+
+# 保存 DXF 文件，格式由 dxf_output.output_format 决定，返回实际保存的路径（zip 格式扩展名为 .zip）
+def save_drawing(doc, input_file, output_file):
+    print(f"正在保存 DXF 文件: {output_file}")
+    output_file = dxf_output.save_document(doc, output_file)
+    print(f"DXF 文件已成功保存")
+    logging.info(f"{input_file} 已成功转换为 {output_file} (CSV to DXF)")
+    return output_file
+
+
+# 骨架键：模板的图层、标注样式记录和全局缩放因子
+def skeleton_key(template):
+    layers = tuple(
+        (layer["name"], layer["color"], layer["linetype"], layer["lineweight"], layer["description"],
+         tuple(layer["pattern"]))
+        for layer in (template.records[i] for i in template.layers)
+    )
+    dimstyles = tuple(
+        (dimstyle["name"], tuple(sorted(dimstyle["attribs"].items())), tuple(sorted(dimstyle["scaled"].items())))
+        for dimstyle in (template.records[i] for i in template.dimstyles) if dimstyle is not None
+    )
+    return layers, dimstyles, global_scale_factor
+
+
+# 创建绘制模板用的新文档，返回文档和默认标注样式名称
+# 首次使用时新建文档并创建图层、线型和标注样式，保存为骨架；之后资源相同的模板直接复制骨架
+def new_document(template):
+    key = skeleton_key(template)
+    skeleton = _skeletons.get(key)
+    if skeleton is not None:
+        # 骨架中已包含图层和标注样式，只需提示这些行的警告
+        for i in template.layers + template.dimstyles:
+            show_row_warnings(template, i)
+        doc = pickle.loads(skeleton[0])
+        # 复制的文档使用新的标识和创建时间
+        doc.reset_fingerprint_guid()
+        doc.reset_version_guid()
+        doc.header["$TDCREATE"] = juliandate(datetime.now())
+        return doc, skeleton[1]
+
+    doc = ezdxf.new("R2018")
+    dimstyle_name, warned = create_resources(doc, template)
+    # 创建资源时有警告的模板不缓存骨架，保证每次生成都能看到警告
+    if not warned:
+        if len(_skeletons) >= MAX_SKELETONS:
+            _skeletons.pop(next(iter(_skeletons)))
+        _skeletons[key] = (pickle.dumps(doc, protocol=pickle.HIGHEST_PROTOCOL), dimstyle_name)
+    return doc, dimstyle_name
+
+
+# 将编译后的模板绘制到DXF文档
+def draw_template(doc, msp, template, dimensions=None):
+    dimstyle_name, _ = create_resources(doc, template)
+    draw_entities(doc, msp, template, dimstyle_name, dimensions)
+
+
+# 创建模板中的图层、线型和标注样式，返回默认标注样式名称和是否有警告
+def create_resources(doc, template):
     global global_scale_factor  # 声明使用全局变量
-    layer_dict = {}
+    input_file = template.source
+    warned = False
     dimstyles_dict = {}  # 存储所有dimstyle
     scale_factor = global_scale_factor  # 初始化缩放比例为全局默认值
 
-    with open(input_file, 'r', encoding='utf-8') as csvfile:
-        reader = csv.DictReader(csvfile)
-        data = list(reader)
+    # 首先读取图层信息
+    for i in template.layers:
+        show_row_warnings(template, i)
+        layer = template.records[i]
+        # 图层记录为缓存共享数据，线型图案传入副本
+        warned |= create_layer(doc, layer["name"], layer["color"], layer["linetype"], layer["lineweight"],
+                               layer["description"], list(layer["pattern"]), input_file)
 
-    # 第一次遍历整个csv表格，仅处理 dimstyle 与图层信息
+    # 处理标注样式
     dimstyle_name = ""  # 用于存储默认dimstyle名称
-    for line_num, row in enumerate(data, start=2):  # 从第 2 行开始计数
-        line_num -= 1
-       
-        # 首先读取图层信息
-        if row["实体类型"] == "图层":
-            layer = row["图层"]
-            color = handle_color(row["颜色"])
-            linetype = row["线型"]
-            lineweight = int(row["线宽"])
-            linetype_description = row["线型描述"]
-            linetype_pattern_str = row["线型图案"]
-            linetype_pattern = handle_linetype_pattern(linetype_pattern_str, linetype, input_file, layer)
-            create_layer(doc, layer, color, linetype, lineweight, linetype_description, linetype_pattern,
-                         input_file)
-            layer_dict[layer] = (color, linetype, lineweight)
-
-        # 处理标注样式
-        if row["实体类型"] == "dimstyle":
-            current_dimstyle_name = row["类型/名称"]
-            # 解析dimstyle属性并替换scale_factor变量
-            dim_attribs_str = row["值"]
-            dim_attribs_str = dim_attribs_str.replace('scale_factor', str(scale_factor))
-            current_dxf_attribs = eval(dim_attribs_str)
-            # 将dimstyle存储到字典中
-            dimstyles_dict[current_dimstyle_name] = current_dxf_attribs
-            # 将最后一个遇到的dimstyle设置为默认dimstyle
-            dimstyle_name = current_dimstyle_name
-            dxf_attribs = current_dxf_attribs                         
+    for i in template.dimstyles:
+        show_row_warnings(template, i)
+        if template.records[i] is None:
+            continue
+        current_dimstyle_name = template.records[i]["name"]
+        # 模板编译时已解析dimstyle属性，这里按缩放比例计算与scale_factor相关的值
+        current_dxf_attribs = resolve_dimstyle(template.records[i], scale_factor)
+        # 将dimstyle存储到字典中
+        dimstyles_dict[current_dimstyle_name] = current_dxf_attribs
+        # 将最后一个遇到的dimstyle设置为默认dimstyle
+        dimstyle_name = current_dimstyle_name
+        dxf_attribs = current_dxf_attribs
 
     
     # 创建默认的dimstyle    
@@ -132,91 +273,61 @@ def drawing(doc, msp, input_file, output_file):
         else:
             # 如果已存在，可以选择更新属性或跳过
             print(f"dimstyle '{name}' 已存在，将跳过创建")
+    return dimstyle_name, warned
 
 
-    # 第二次遍历，处理实体
-    for line_num, row in enumerate(data, start=2):
-        line_num -= 1
-        # 读取非块元素
-        if not row["块名"]:
-            try:
-                entity_type = row["实体类型"]
-                layer = row["图层"]
-                color = handle_color(row["颜色"])
-                linetype = row["线型"]
-                try:
-                    lineweight = int(row["线宽"]) if row["线宽"] else -1
-                except (ValueError, TypeError):
-                    lineweight = -1
-
-                # 跳过dimstyle定义行
-                if entity_type.lower() == 'dimstyle':
-                    continue
-                
-                if entity_type == 'LINE':
-                    handle_line(row, msp, layer, color, linetype, lineweight, input_file, line_num)
-                elif entity_type == 'CIRCLE':
-                    handle_circle(row, msp, layer, color, linetype, lineweight, input_file, line_num)
-                elif entity_type == 'LWPOLYLINE':
-                    handle_lwpolyline(row, msp, layer, color, linetype, lineweight, input_file, line_num)
-                elif entity_type == 'DIMENSION':
-                    handle_dimension(row, msp, layer, color, linetype, lineweight, input_file, line_num, dimstyle_name)
-                elif entity_type == 'ARC':
-                    handle_arc(row, msp, layer, color, linetype, lineweight, input_file, line_num)
-                elif entity_type in ['TEXT', 'MTEXT']:
-                    handle_text(row, msp, layer, color, input_file, entity_type, line_num)
-                elif entity_type == 'HATCH':
-                    handle_hatch(row, msp, layer, color, input_file, line_num)
-            except Exception as e:
-                messagebox.showwarning("警告", f"文件 {input_file} 第 {line_num} 行发生未知错误: {str(e)}，将略过此数据。")
-                logging.warning(f"文件 {input_file} 第 {line_num} 行发生未知错误: {str(e)}，将略过此数据。")
-        # 读取块元素
-        elif row["实体类型"] == 'INSERT':
-            try:
-                layer = row["图层"]
-                color = handle_color(row["颜色"])
-                linetype = row["线型"]
-                try:
-                    lineweight = int(row["线宽"]) if row["线宽"] else -1
-                except (ValueError, TypeError):
-                    lineweight = -1
-                handle_insert(data, row, msp, doc, layer, color, linetype, lineweight, input_file, dimstyle_name)
-
-            except Exception as e:
-                messagebox.showwarning("警告", f"文件 {input_file} 第 {line_num} 行发生未知错误: {str(e)}，将略过此数据。")
-                logging.warning(f"文件 {input_file} 第 {line_num} 行发生未知错误: {str(e)}，将略过此数据。")
-
-    # 保存 DXF 文件
-    print(f"正在保存 DXF 文件: {output_file}")
-    doc.saveas(output_file)
-    print(f"DXF 文件已成功保存")
-    logging.info(f"{input_file} 已成功转换为 {output_file} (CSV to DXF)")
+# 绘制模板中的实体，图层等资源已在文档中创建；dimensions 为 None 时使用 render_dimensions
+def draw_entities(doc, msp, template, dimstyle_name, dimensions=None):
+    dimensions = render_dimensions if dimensions is None else dimensions
+    # 处理模型空间实体及模型空间中的块引用，块定义段中的嵌套引用由所属块处理
+    for i in template.entities:
+        draw_record(template, i, msp, doc, dimstyle_name, dimensions)
+
+
+# 绘制模板中的一行实体，模型空间和块定义共用
+def draw_record(template, i, msp, doc, dimstyle_name, dimensions=True):
+    show_row_warnings(template, i)
+    record = template.records[i]
+    if record is None:
+        return
+    try:
+        entity_type = record["type"]
+        entity = None
+        if entity_type == 'LINE':
+            entity = handle_line(record, msp)
+        elif entity_type == 'CIRCLE':
+            entity = handle_circle(record, msp)
+        elif entity_type == 'LWPOLYLINE':
+            entity = handle_lwpolyline(record, msp)
+        elif entity_type == 'DIMENSION':
+            entity = handle_dimension(record, msp, dimstyle_name, dimensions)
+        elif entity_type == 'ARC':
+            entity = handle_arc(record, msp)
+        elif entity_type in ['TEXT', 'MTEXT']:
+            entity = handle_text(record, msp)
+        elif entity_type == 'HATCH':
+            entity = handle_hatch(record, msp)
+        elif entity_type == 'INSERT':
+            entity = handle_insert(template, record, msp, doc, dimstyle_name, dimensions)
+        if entity is not None and record["anchor"]:
+            set_anchor(doc, entity, record["anchor"])
+    except Exception as e:
+        warn(f"文件 {template.source} 第 {record['line_num']} 行发生未知错误: {str(e)}，将略过此数据。",
+             template.source, record["line_num"], record["type"])
 
 
 
 
-# 设置线型函数
-def handle_linetype_pattern(linetype_pattern_str, linetype, input_file, layer):
-    linetype_pattern = []
-    if linetype_pattern_str:
-        parts = linetype_pattern_str.split(";")
-        for part in parts:
-            try:
-                value = float(part.strip())
-                linetype_pattern.append(value)
-            except ValueError:
-                if linetype != "Continuous":
-                    messagebox.showwarning("警告",
-                                           f"文件 {input_file} 中图层 {layer} 的线型图案字段 '{linetype_pattern_str}' 包含无效数据，将使用空列表代替。")
-                    logging.warning(
-                        f"文件 {input_file} 中图层 {layer} 的线型图案字段 '{linetype_pattern_str}' 包含无效数据，将使用空列表代替。")
-                linetype_pattern = []
-                break
-    return linetype_pattern
+# 将锚点写入实体的扩展数据，DXF转CSV时读回锚点列
+def set_anchor(doc, entity, anchor):
+    if ANCHOR_APPID not in doc.appids:
+        doc.appids.new(ANCHOR_APPID)
+    entity.set_xdata(ANCHOR_APPID, [(1000, anchor)])
 
 
-# 创建图层函数
+# 创建图层函数，返回是否有警告
 def create_layer(doc, layer, color, linetype, lineweight, linetype_description, linetype_pattern, input_file):
+    warned = False
     if layer not in doc.layers:
         try:
             if linetype not in doc.linetypes:
@@ -229,353 +340,175 @@ def create_layer(doc, layer, color, linetype, lineweight, linetype_description,
                         description=linetype_description
                     )
                 elif linetype != "Continuous":
-                    messagebox.showwarning("警告",
-                                           f"文件 {input_file} 中图层 '{layer}' 使用了未知线型 '{linetype}'，将使用默认实线。")
-                    logging.warning(f"文件 {input_file} 中图层 '{layer}' 使用了未知线型 '{linetype}'，将使用默认实线。")
+                    warn(f"文件 {input_file} 中图层 '{layer}' 使用了未知线型 '{linetype}'，将使用默认实线。",
+                         input_file, entity_type="图层", field="线型")
                     linetype = "CONTINUOUS"
+                    warned = True
             doc.layers.new(name=layer, dxfattribs={
                 "color": color,
                 "linetype": linetype,
                 "lineweight": lineweight
             })
         except ezdxf.DXFValueError:
-            messagebox.showwarning("警告", f"文件 {input_file} 中图层 '{layer}' 无法创建，可能是无效的线型或线宽。将使用默认设置。")
-            logging.warning(f"文件 {input_file} 中图层 '{layer}' 无法创建，可能是无效的线型或线宽。将使用默认设置。")
+            warn(f"文件 {input_file} 中图层 '{layer}' 无法创建，可能是无效的线型或线宽。将使用默认设置。",
+                 input_file, entity_type="图层", field="线型, 线宽")
             if layer not in doc.layers:
                 doc.layers.new(name=layer)
+            warned = True
+    return warned
+
+
+# 实体的通用属性
+def entity_attribs(record):
+    return {"layer": record["layer"], "color": record["color"],
+            "linetype": record["linetype"], "lineweight": record["lineweight"]}
 
 
 # 绘制直线函数
-def handle_line(row, msp, layer, color, linetype, lineweight, input_file, line_num):
-    try:
-        start = (float(row["起点 X"]), float(row["起点 Y"]))
-        end = (float(row["终点 X"]), float(row["终点 Y"]))
-        msp.add_line(start, end,
-                     dxfattribs={"layer": layer, "color": color, "linetype": linetype, "lineweight": lineweight})
-    except (ValueError, TypeError):
-        messagebox.showwarning("警告",
-                               f"文件 {input_file} 第 {line_num} 行的 LINE 实体坐标字段包含无效数据，将略过此数据。")
-        logging.warning(f"文件 {input_file} 第 {line_num} 行的 LINE 实体坐标字段包含无效数据，将略过此数据。")
+def handle_line(record, msp):
+    return msp.add_line(record["start"], record["end"], dxfattribs=entity_attribs(record))
 
 
 # 绘制圆形函数
-def handle_circle(row, msp, layer, color, linetype, lineweight, input_file, line_num):
-    try:
-        center = (float(row["圆心 X"]), float(row["圆心 Y"]))
-        radius = float(row["半径"])
-        msp.add_circle(center, radius,
-                       dxfattribs={"layer": layer, "color": color, "linetype": linetype, "lineweight": lineweight})
-    except (ValueError, TypeError):
-        messagebox.showwarning("警告",
-                               f"文件 {input_file} 第 {line_num} 行的 CIRCLE 实体坐标或半径字段包含无效数据，将略过此数据。")
-        logging.warning(f"文件 {input_file} 第 {line_num} 行的 CIRCLE 实体坐标或半径字段包含无效数据，将略过此数据。")
+def handle_circle(record, msp):
+    return msp.add_circle(record["center"], record["radius"], dxfattribs=entity_attribs(record))
 
 
 # 绘制多段线函数
-def handle_lwpolyline(row, msp, layer, color, linetype, lineweight, input_file, line_num):
-    vertices = []
-    points = row["顶点数据"].split("; ")
-    if row["闭合"] == "是":
-        closed = True
-    else:
-        closed = False
-    for point in points:
-        try:
-            x, y, start_width, end_width, bulge = point.strip("()").split(", ")
-            vertices.append(
-                (float(x), float(y), float(start_width), float(end_width), float(bulge)))
-        except ValueError:
-            messagebox.showwarning("警告",
-                                   f"文件 {input_file} 第 {line_num} 行的 LWPOLYLINE 实体顶点数据包含无效数据，将略过此数据。")
-            logging.warning(
-                f"文件 {input_file} 第 {line_num} 行的 LWPOLYLINE 实体顶点数据包含无效数据，将略过此数据。")
-            vertices = []
-            break
-    if vertices:
-        msp.add_lwpolyline(vertices,
-                           dxfattribs={"layer": layer, "color": color, "linetype": linetype, "lineweight": lineweight,
-                                       "closed": closed})
+def handle_lwpolyline(record, msp):
+    if record["vertices"]:
+        dxfattribs = entity_attribs(record)
+        dxfattribs["closed"] = record["closed"]
+        return msp.add_lwpolyline(record["vertices"], dxfattribs=dxfattribs)
 
 
 # 绘制尺寸函数
-def handle_dimension(row, msp, layer, color, linetype, lineweight, input_file, line_num, dimstyle_name="CUSTOM_DIMSTYLE"):
-    dim_type = row["类型/名称"]
-    dim_code = row["尺寸编码"]
-
+def handle_dimension(record, msp, dimstyle_name="CUSTOM_DIMSTYLE", dimensions=True):
+    dim_type = record["dim_type"]
     # 优先使用CSV中保存的尺寸样式
-    entity_dimstyle = row.get("尺寸样式", "")
-    if entity_dimstyle:
-        dimstyle_name = entity_dimstyle
-
-    dim_angle = safe_float(row["角度"])
-    if dim_type == "UNKNOWN":
-        messagebox.showwarning("警告", f"第 {line_num} 行的尺寸标注类型未知，尺寸编码为 {dim_code}，将略过此尺寸。")
-        logging.warning(f"第 {line_num} 行的尺寸标注类型未知，尺寸编码为 {dim_code}，将略过此尺寸。")
-        return
-    if dim_type in ["LINEAR", "ALIGNED", "LINEAR_HORIZONTAL", "LINEAR_VERTICAL", "LINEAR_ROTATED"]:
-        try:
-            location = (float(row["位置 X"]), float(row["位置 Y"]))
-
-            # 通过调整尺寸初始点和角度，来调整尺寸显示位置。
-            if 90 <= dim_angle <= 120 or 270 <= dim_angle <= 300:
-                if float(row["终点 Y"]) > float(row["起点 Y"]):
-                    p1 = (float(row["起点 X"]), float(row["起点 Y"]))
-                    p2 = (float(row["终点 X"]), float(row["终点 Y"]))
-                else:
-                    p2 = (float(row["起点 X"]), float(row["起点 Y"]))
-                    p1 = (float(row["终点 X"]), float(row["终点 Y"]))
-            elif float(row["终点 X"]) > float(row["起点 X"]):
-                p1 = (float(row["起点 X"]), float(row["起点 Y"]))
-                p2 = (float(row["终点 X"]), float(row["终点 Y"]))
-            else:
-                p2 = (float(row["起点 X"]), float(row["起点 Y"]))
-                p1 = (float(row["终点 X"]), float(row["终点 Y"]))
-            if 90 < dim_angle < 180:
-                dim_angle += 180
-            elif 180 <= dim_angle <= 270:
-                dim_angle -= 180
-            # 覆盖测量文本
-            if row["覆盖值"]:
-                dim_text = row["覆盖值"]
-            else:
-                dim_text = row["值"]
-
-            dim = msp.add_linear_dim(
-                base=location,
-                p1=p1,
-                p2=p2,
-                text=dim_text,
-                dimstyle=dimstyle_name,  
-                dxfattribs={"layer": layer, "color": color, "linetype": linetype, "lineweight": lineweight},
-                angle=dim_angle
-            )
-            dim.render()
-        except ValueError:
-            messagebox.showwarning("警告",
-                                   f"文件 {input_file} 第 {line_num} 行的 DIMENSION 实体线性尺寸坐标字段包含无效数据，将略过此数据。")
-            logging.warning(
-                f"文件 {input_file} 第 {line_num} 行的 DIMENSION 实体线性尺寸坐标字段包含无效数据，将略过此数据。")
+    if record["dimstyle"]:
+        dimstyle_name = record["dimstyle"]
+
+    if dim_type in LINEAR_DIM_TYPES:
+        dim = msp.add_linear_dim(
+            base=record["base"],
+            p1=record["p1"],
+            p2=record["p2"],
+            text=record["text"],
+            dimstyle=dimstyle_name,  
+            dxfattribs=entity_attribs(record),
+            angle=record["angle"]
+        )
+        render_dimension(dim, record, dimensions)
     elif dim_type == 'ANGULAR':
-        try:
-            p1 = (float(row["起点 X"]), float(row["起点 Y"]))
-            p2 = (float(row["终点 X"]), float(row["终点 Y"]))
-            p3 = (float(row["圆心 X"]), float(row["圆心 Y"]))
-            dim = msp.add_angular_dim3p(
-                base=(0, 0),
-                p1=p1,
-                p2=p2,
-                p3=p3,
-                dimstyle=dimstyle_name,
-                dxfattribs={"layer": layer, "color": color, "linetype": linetype, "lineweight": lineweight}
-            )
-            dim.render()
-        except ValueError:
-            messagebox.showwarning("警告",
-                                   f"文件 {input_file} 第 {line_num} 行的 DIMENSION 实体角度尺寸坐标字段包含无效数据，将略过此数据。")
-            logging.warning(
-                f"文件 {input_file} 第 {line_num} 行的 DIMENSION 实体角度尺寸坐标字段包含无效数据，将略过此数据。")
+        dim = msp.add_angular_dim3p(
+            base=(0, 0),
+            p1=record["p1"],
+            p2=record["p2"],
+            p3=record["p3"],
+            dimstyle=dimstyle_name,
+            dxfattribs=entity_attribs(record)
+        )
+        render_dimension(dim, record, dimensions)
     elif dim_type == 'DIAMETER':
-        try:
-            dim_value = float(row["值"])
-            center = (float(row["圆心 X"]), float(row["圆心 Y"]))
-            radius = dim_value / 2
-            location = (float(row["位置 X"]), float(row["位置 Y"]))
-            if row["覆盖值"]:
-                dim_text = row["覆盖值"]
-            else:
-                dim_text = row["值"]
-            dim = msp.add_diameter_dim(
-                center=center,
-                radius=radius,
-                angle=dim_angle,
-                # location=location,
-                text=dim_text,
-                dimstyle=dimstyle_name,
-                dxfattribs={"layer": layer, "color": color, "linetype": linetype, "lineweight": lineweight},
-                override={"dimtoh": 1, "dimtix": 0}
-            )
-            dim.render()
-        except ValueError:
-            messagebox.showwarning("警告",
-                                   f"文件 {input_file} 第 {line_num} 行的 DIMENSION 实体直径尺寸坐标或值字段包含无效数据，将略过此数据。")
-            logging.warning(
-                f"文件 {input_file} 第 {line_num} 行的 DIMENSION 实体直径尺寸坐标或值字段包含无效数据，将略过此数据。")
+        dim = msp.add_diameter_dim(
+            center=record["center"],
+            radius=record["radius"],
+            angle=record["angle"],
+            # location=record["location"],
+            text=record["text"],
+            dimstyle=dimstyle_name,
+            dxfattribs=entity_attribs(record),
+            override={"dimtoh": 1, "dimtix": 0}
+        )
+        render_dimension(dim, record, dimensions)
     elif dim_type == 'RADIUS':
-        try:
-            dim_value = float(row["值"])
-            center = (float(row["圆心 X"]), float(row["圆心 Y"]))
-            radius = dim_value
-            location = (float(row["位置 X"]), float(row["位置 Y"]))
-            if row["覆盖值"]:
-                dim_text = row["覆盖值"]
-            else:
-                dim_text = row["值"]
-            dim = msp.add_radius_dim(
-                center=center,
-                radius=radius,
-                angle=dim_angle,
-                text=dim_text,
-                dimstyle=dimstyle_name,
-                # location=location,
-                dxfattribs={"layer": layer, "color": color, "linetype": linetype, "lineweight": lineweight},
-                override={"dimtoh": 1, "dimtix": 0}
-            )
-            dim.render()
-        except ValueError:
-            messagebox.showwarning("警告",
-                                   f"文件 {input_file} 第 {line_num} 行的 DIMENSION 实体半径尺寸坐标或值字段包含无效数据，将略过此数据。")
-            logging.warning(
-                f"文件 {input_file} 第 {line_num} 行的 DIMENSION 实体半径尺寸坐标或值字段包含无效数据，将略过此数据。")
+        dim = msp.add_radius_dim(
+            center=record["center"],
+            radius=record["radius"],
+            angle=record["angle"],
+            text=record["text"],
+            dimstyle=dimstyle_name,
+            # location=record["location"],
+            dxfattribs=entity_attribs(record),
+            override={"dimtoh": 1, "dimtix": 0}
+        )
+        render_dimension(dim, record, dimensions)
+    else:
+        return None
+    return dim.dimension
+
+
+# 渲染尺寸标注：相同的标注复用缓存的尺寸块；不生成图形块时仍写入标注样式覆盖
+def render_dimension(dim, record, dimensions=True):
+    if not dimensions:
+        dim.render(discard=True)
+        return
+    # 编译后的标注记录去掉行号、锚点和实体属性即为标注的几何数据和文字，图层和颜色在复用缓存时替换
+    key = tuple(sorted((name, value) for name, value in record.items() if name not in DIMENSION_KEY_SKIPPED))
+    dimension_cache.render(dim, key)
 
 
 # 绘制圆弧函数
-def handle_arc(row, msp, layer, color, linetype, lineweight, input_file, line_num):
-    try:
-        center = (float(row["圆心 X"]), float(row["圆心 Y"]))
-        radius = float(row["半径"])
-        start_angle = float(row["起始角度"])
-        end_angle = float(row["终止角度"])
-        msp.add_arc(center, radius, start_angle, end_angle,
-                    dxfattribs={"layer": layer, "color": color, "linetype": linetype, "lineweight": lineweight})
-    except (ValueError, TypeError):
-        messagebox.showwarning("警告",
-                               f"文件 {input_file} 第 {line_num} 行的 ARC 实体坐标、半径或角度字段包含无效数据，将略过此数据。")
-        logging.warning(f"文件 {input_file} 第 {line_num} 行的 ARC 实体坐标、半径或角度字段包含无效数据，将略过此数据。")
+def handle_arc(record, msp):
+    return msp.add_arc(record["center"], record["radius"], record["start_angle"], record["end_angle"],
+                dxfattribs=entity_attribs(record))
 
 
 # 绘制文本函数
-def handle_text(row, msp, layer, color, input_file, entity_type, line_num):
-    try:
-        text_content = row["值"]
-        text_location = (float(row["位置 X"]), float(row["位置 Y"]))
-        text_height = float(row["高度"])
-        text_rotation = float(row["角度"])
-        if entity_type == 'TEXT':
-            msp.add_text(
-                text_content,
-                dxfattribs={
-                    "layer": layer,
-                    "height": text_height,
-                    "rotation": text_rotation,
-                    "color": color,
-                }
-            ).set_pos(text_location)
-        else:  # MTEXT
-            msp.add_mtext(
-                text_content,
-                dxfattribs={
-                    "layer": layer,
-                    "char_height": text_height,
-                    "rotation": text_rotation,
-                    "color": color,
-                    'style': 'CUSTOM_TEXTSTYLE'
-                }
-            ).set_location(text_location)
-    except (ValueError, TypeError):
-        messagebox.showwarning("警告",
-                               f"文件 {input_file} 第 {line_num} 行的 {entity_type} 实体文本相关字段包含无效数据，将略过此数据。")
-        logging.warning(
-            f"文件 {input_file} 第 {line_num} 行的 {entity_type} 实体文本相关字段包含无效数据，将略过此数据。")
+def handle_text(record, msp):
+    if record["type"] == 'TEXT':
+        return msp.add_text(
+            record["text"],
+            dxfattribs={
+                "layer": record["layer"],
+                "height": record["height"],
+                "rotation": record["rotation"],
+                "color": record["color"],
+            }
+        ).set_placement(record["insert"])
+    else:  # MTEXT
+        return msp.add_mtext(
+            record["text"],
+            dxfattribs={
+                "layer": record["layer"],
+                "char_height": record["height"],
+                "rotation": record["rotation"],
+                "color": record["color"],
+                'style': 'CUSTOM_TEXTSTYLE'
+            }
+        ).set_location(record["insert"])
 
 
 # 绘制剖面线函数
-def handle_hatch(row, msp, layer, color, input_file, line_num):
-    pattern_name = row["类型/名称"]
-    boundary_vertices_str = row["顶点数据"]
-    scale_str = row.get("缩放比例", "1.0")
-    try:
-        if pattern_name == "AR-CONC":
-            scale = 0.1
-        else:
-            scale = safe_float(scale_str)
-    except ValueError:
-        messagebox.showwarning("警告",
-                               f"文件 {input_file} 第 {line_num} 行的 HATCH 实体缩放比例字段 '{scale_str}' 不是有效的数字，将使用默认值 1.0。")
-        logging.warning(
-            f"文件 {input_file} 第 {line_num} 行的 HATCH 实体缩放比例字段 '{scale_str}' 不是有效的数字，将使用默认值 1.0。")
-        scale = 1.0
-    if not boundary_vertices_str:
-        return
-    boundary_vertices = []
-    vertex_strs = boundary_vertices_str.split("; ")
-    for vertex_str in vertex_strs:
-        try:
-            # 处理三元数组数据，假设格式为 (x, y, bulge)
-            parts = vertex_str.strip("()").split(", ")
-            if len(parts) == 2:
-                x, y = parts
-                bulge = 0
-            elif len(parts) == 3:
-                x, y, bulge = parts
-            else:
-                raise ValueError
-            vertex = (float(x), float(y), float(bulge))
-            boundary_vertices.append(vertex)
-        except ValueError:
-            messagebox.showwarning("警告",
-                                   f"文件 {input_file} 第 {line_num} 行的 HATCH 实体边界顶点数据包含无效数据，将略过此数据。")
-            logging.warning(
-                f"文件 {input_file} 第 {line_num} 行的 HATCH 实体边界顶点数据包含无效数据，将略过此数据。")
-            boundary_vertices = []
-            break
-    if boundary_vertices:
-        hatch = msp.add_hatch(dxfattribs={"layer": layer})
+def handle_hatch(record, msp):
+    if record["vertices"]:
+        hatch = msp.add_hatch(dxfattribs={"layer": record["layer"]})
         # 这里假设 ezdxf 支持带 bulge 值的路径
-        hatch.paths.add_polyline_path(boundary_vertices, is_closed=True)
-        hatch.set_pattern_fill(pattern_name, scale=scale, color=color)
-
-
-# 块添加实体函数
-def block_add_virtual_entities(data, block, block_name, input_file, dimstyle_name):
-    # 将模型空间设为块
-    msp = block
-    for line_num, row in enumerate(data, start=2):  # 从第 2 行开始计数
-        line_num -= 1
-        # 读取块内元素
-        if row["块名"] and row["实体类型"] != 'INSERT':
-            if row["块名"].split(": ")[1] == block_name:
-                try:
-                    entity_type = row["实体类型"]
-                    layer = row["图层"]
-                    color = handle_color(row["颜色"])
-                    linetype = row["线型"]
-                    lineweight = int(row["线宽"])
-                    if entity_type == 'LINE':
-                        handle_line(row, msp, layer, color, linetype, lineweight, input_file, line_num)
-                    elif entity_type == 'CIRCLE':
-                        handle_circle(row, msp, layer, color, linetype, lineweight, input_file, line_num)
-                    elif entity_type == 'LWPOLYLINE':
-                        handle_lwpolyline(row, msp, layer, color, linetype, lineweight, input_file, line_num)
-                    elif entity_type == 'DIMENSION':
-                        handle_dimension(row, msp, layer, color, linetype, lineweight, input_file, line_num, dimstyle_name)
-                    elif entity_type == 'ARC':
-                        handle_arc(row, msp, layer, color, linetype, lineweight, input_file, line_num)
-                    elif entity_type in ['TEXT', 'MTEXT']:
-                        handle_text(row, msp, layer, color, input_file, entity_type, line_num)
-                    elif entity_type == 'HATCH':
-                        handle_hatch(row, msp, layer, color, input_file, line_num)
-                except Exception as e:
-                    messagebox.showwarning("警告", f"文件 {input_file} 第 {line_num} 行发生未知错误: {str(e)}，将略过此数据。")
-                    logging.warning(f"文件 {input_file} 第 {line_num} 行发生未知错误: {str(e)}，将略过此数据。")
+        hatch.paths.add_polyline_path(record["vertices"], is_closed=True)
+        hatch.set_pattern_fill(record["pattern"], scale=record["scale"], color=record["color"])
+        return hatch
+
+
+# 块添加实体函数，只遍历本块的实体行
+def block_add_virtual_entities(template, block, block_name, dimstyle_name, dimensions=True):
+    for i in template.blocks.get(block_name, []):
+        draw_record(template, i, block, block.doc, dimstyle_name, dimensions)
 
 
 # 绘制块函数
-def handle_insert(data, row, msp, doc, layer, color, linetype, lineweight, input_file, dimstyle_name):
+def handle_insert(template, record, msp, doc, dimstyle_name, dimensions=True):
     # 读取块名
-    block_name = row["块名"].split(": ")[1]
-    # 创建块
-    block = doc.blocks.new(name=block_name)
-    # 块添加实体
-    block_add_virtual_entities(data, block, block_name, input_file, dimstyle_name)
+    block_name = record["name"]
+    # 块定义只创建一次，同一块的其他引用直接复用
+    if block_name not in doc.blocks:
+        block = doc.blocks.new(name=block_name)
+        # 块添加实体
+        block_add_virtual_entities(template, block, block_name, dimstyle_name, dimensions)
     # 根据块引用添加块
-    block_location = (float(row["位置 X"]), float(row["位置 Y"]))
-    try:
-        block_rotation = float(row["角度"])
-    except ValueError:
-        block_rotation = 0
-    msp.add_blockref(block_name, block_location, dxfattribs={"layer": layer, "color": color,
-                                                             "linetype": linetype, "lineweight": lineweight,
-                                                             'rotation': block_rotation})
+    dxfattribs = entity_attribs(record)
+    dxfattribs.update({'rotation': record["rotation"], 'xscale': record["xscale"], 'yscale': record["yscale"]})
+    return msp.add_blockref(block_name, record["insert"], dxfattribs=dxfattribs)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,101 @@
+import logging
+import threading
+from contextlib import contextmanager
+from tkinter import messagebox
+
+
+# 汇总对话框中最多列出的问题条数，其余的只写入日志和报告
+SUMMARY_LIMIT = 20
+
+# 每个线程当前的问题收集器
+_local = threading.local()
+
+
+# 问题收集器：记录一次生成过程中的全部问题，生成结束后统一报告，不再逐条弹出对话框
+class Diagnostics:
+    def __init__(self):
+        self.entries = []  # 问题列表，每项为 {"level", "file", "line", "entity_type", "field", "reason"}
+        self.depth = 0     # 嵌套使用的层数，只有最外层结束时才报告
+
+    def add(self, reason, file="", line=None, entity_type="", field="", level="warning"):
+        self.entries.append({
+            "level": level,
+            "file": file,
+            "line": line,
+            "entity_type": entity_type,
+            "field": field,
+            "reason": reason,
+        })
+
+    def __len__(self):
+        return len(self.entries)
+
+    # 错误条数
+    @property
+    def errors(self):
+        return sum(1 for entry in self.entries if entry["level"] == "error")
+
+    # 警告条数
+    @property
+    def warnings(self):
+        return len(self.entries) - self.errors
+
+    # 结构化的报告
+    def report(self):
+        return {
+            "errors": self.errors,
+            "warnings": self.warnings,
+            "entries": list(self.entries),
+        }
+
+    # 汇总文字，最多列出 limit 条问题
+    def summary(self, limit=SUMMARY_LIMIT):
+        lines = [f"共 {self.errors} 个错误，{self.warnings} 个警告："]
+        for entry in self.entries[:limit]:
+            lines.append(("[错误] " if entry["level"] == "error" else "") + entry["reason"])
+        if len(self.entries) > limit:
+            lines.append(f"……其余 {len(self.entries) - limit} 条请查看日志")
+        return "\n".join(lines)
+
+
+# 在 with 语句中收集问题；已有收集器时继续使用外层的收集器，由最外层统一报告
+@contextmanager
+def collecting():
+    outer = getattr(_local, "collector", None)
+    # 收集器定义了 __len__，没有问题时为假值，因此必须与 None 比较
+    collector = outer if outer is not None else Diagnostics()
+    _local.collector = collector
+    collector.depth += 1
+    try:
+        yield collector
+    finally:
+        collector.depth -= 1
+        _local.collector = outer
+
+
+# 当前线程的问题收集器，不在收集过程中时返回 None
+def current():
+    return getattr(_local, "collector", None)
+
+
+# 记录一个问题并写入日志；没有收集器时返回 False，由调用者自行提示
+def record(reason, file="", line=None, entity_type="", field="", level="warning"):
+    if level == "error":
+        logging.error(reason)
+    else:
+        logging.warning(reason)
+    collector = current()
+    if collector is None:
+        return False
+    collector.add(reason, file, line, entity_type, field, level)
+    return True
+
+
+# 生成结束后用一个对话框显示全部问题，嵌套的收集过程不显示
+def show_summary(collector, title="转换问题"):
+    if collector.depth > 0 or not collector.entries:
+        return
+    if collector.errors:
+        messagebox.showerror(title, collector.summary())
+    else:
+        messagebox.showwarning(title, collector.summary())
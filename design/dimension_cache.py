@@ -0,0 +1,154 @@
+import os
+from collections import OrderedDict
+
+from ezdxf.entities import factory
+from ezdxf.math import Vec2, Vec3
+from ezdxf.render.arrows import ARROWS
+
+
+# 缓存的尺寸块数量上限，超过后按最近使用顺序淘汰
+MAX_ENTRIES = 4096
+# 尺寸块中可以直接按属性复制的实体类型，含有其他实体的尺寸块不缓存
+SIMPLE_ENTITY_TYPES = {"LINE", "POINT", "INSERT", "MTEXT", "TEXT", "ARC", "CIRCLE", "SOLID"}
+# 标注实体中由渲染过程以外的因素决定的属性，不从缓存复制
+SKIPPED_ATTRIBS = {"handle", "owner", "geometry"}
+# 尺寸块中的实体从标注实体继承的属性，不放入缓存键，复用时替换为当前标注的值
+INHERITED_ATTRIBS = ("layer", "color")
+# ezdxf 为尺寸块中的实体自行指定的图层和颜色：直线在0层，定义点在 Defpoints 层且颜色随层
+FIXED_VALUES = {"layer": {"0", "Defpoints"}, "color": {256}}
+# 尺寸样式中的尺寸线、尺寸界线和文字颜色，设置后对应的实体不再继承标注实体的颜色
+COLOR_VARS = ("dimclrd", "dimclre", "dimclrt")
+
+# 设置环境变量 CAD_CHANGE_DIMENSION_CACHE=0 可关闭缓存，子进程同样生效
+enabled = os.environ.get("CAD_CHANGE_DIMENSION_CACHE", "1") != "0"
+
+# 本进程的命中统计
+stats = {"hits": 0, "misses": 0, "uncacheable": 0}
+
+# 缓存键 -> {"attribs": 渲染时修改的标注实体属性, "entities": [(实体原型, 继承的属性名)]}
+_blocks = OrderedDict()
+
+
+# 点坐标转换为元组，便于比较
+def plain_value(value):
+    if isinstance(value, (Vec2, Vec3)):
+        return tuple(value)
+    return value
+
+
+# 计算尺寸样式或文字样式的签名，样式定义变化后缓存键随之变化
+def style_signature(table, name):
+    if not table.has_entry(name):
+        return None
+    attribs = table.get(name).dxfattribs(drop=SKIPPED_ATTRIBS)
+    return tuple(sorted((key, plain_value(value)) for key, value in attribs.items()))
+
+
+# 标注实体的图层和颜色中无法判断尺寸块实体是否继承的部分：与 ezdxf 自行指定的值或尺寸样式中设置的颜色相同
+def ambiguous_attribs(dim):
+    attribs = dim.dimension.dxf
+    fixed_colors = FIXED_VALUES["color"] | {dim.get(name) for name in COLOR_VARS}
+    ambiguous = []
+    if attribs.layer in FIXED_VALUES["layer"]:
+        ambiguous.append(("layer", attribs.layer))
+    if attribs.color in fixed_colors:
+        ambiguous.append(("color", attribs.color))
+    return tuple(ambiguous)
+
+
+# 计算缓存键：标注的几何数据和文字、尺寸样式、文字样式和样式覆盖，
+# 图层和颜色只在无法判断继承关系时放入缓存键，线型和线宽不影响尺寸块
+def block_key(dim, key):
+    doc = dim.doc
+    dimstyle_name = dim.dimension.dxf.dimstyle
+    return (
+        key,
+        dimstyle_name,
+        style_signature(doc.dimstyles, dimstyle_name),
+        style_signature(doc.styles, dim.get("dimtxsty", "Standard")),
+        tuple(sorted((name, plain_value(value)) for name, value in dim.dimstyle_attribs.items())),
+        ambiguous_attribs(dim),
+    )
+
+
+# 标注实体的属性，用于找出渲染时修改的属性
+def dimension_attribs(dim):
+    return {name: plain_value(value)
+            for name, value in dim.dimension.dxfattribs(drop=SKIPPED_ATTRIBS).items()}
+
+
+# 记录渲染结果：渲染时修改的标注实体属性和尺寸块中实体的原型，块中有无法复制的实体时返回 None
+def capture(dim, before):
+    block = dim.doc.blocks.get(dim.dimension.dxf.geometry)
+    skipped = {name for name, _ in ambiguous_attribs(dim)}
+    entities = []
+    for entity in block:
+        dxftype = entity.dxftype()
+        if dxftype not in SIMPLE_ENTITY_TYPES:
+            return None
+        attribs = entity.dxfattribs(drop=SKIPPED_ATTRIBS)
+        inherited = tuple(name for name in INHERITED_ATTRIBS
+                          if name not in skipped and attribs.get(name) == dim.dimension.dxf.get(name))
+        prototype = factory.new(dxftype, attribs)
+        if dxftype == "MTEXT":
+            prototype.text = entity.text
+        entities.append((prototype, inherited))
+    after = dimension_attribs(dim)
+    attribs = {name: value for name, value in after.items() if before.get(name) != value}
+    return {"attribs": attribs, "entities": entities}
+
+
+# 使用缓存的渲染结果创建尺寸块，效果与 dim.render() 相同
+def replay(dim, entry):
+    doc = dim.doc
+    block = doc.blocks.new_anonymous_block(type_char="D")
+    for prototype, inherited in entry["entities"]:
+        # 箭头块在渲染时按需创建，新文档中需要重新创建
+        if prototype.dxftype() == "INSERT" and prototype.dxf.name not in doc.blocks:
+            doc.acquire_arrow(ARROWS.arrow_name(prototype.dxf.name))
+        entity = prototype.copy()
+        for name in inherited:
+            entity.dxf.set(name, dim.dimension.dxf.get(name))
+        factory.bind(entity, doc)
+        block.add_entity(entity)
+    dim.dimension.update_dxf_attribs(entry["attribs"])
+    dim.dimension.dxf.geometry = block.name
+    if len(dim.dimstyle_attribs):
+        dim.commit()
+
+
+# 渲染尺寸标注，key 为标注的几何数据和文字，相同的标注直接复用缓存的尺寸块
+def render(dim, key):
+    if not enabled:
+        dim.render()
+        return
+    full_key = block_key(dim, key)
+    entry = _blocks.get(full_key)
+    if entry is not None:
+        stats["hits"] += 1
+        _blocks.move_to_end(full_key)
+        replay(dim, entry)
+        return
+
+    stats["misses"] += 1
+    before = dimension_attribs(dim)
+    dim.render()
+    entry = capture(dim, before)
+    if entry is None:
+        stats["uncacheable"] += 1
+        return
+    _blocks[full_key] = entry
+    while len(_blocks) > MAX_ENTRIES:
+        _blocks.popitem(last=False)
+
+
+# 缓存状态：本进程的命中统计以及缓存中的尺寸块数量
+def cache_info():
+    info = dict(stats)
+    info["entries"] = len(_blocks)
+    return info
+
+
+# 清空缓存
+def clear():
+    _blocks.clear()
@@ -0,0 +1,92 @@
+import io
+import os
+import zipfile
+
+import ezdxf
+
+
+# 图纸输出格式：asc 为文本DXF，bin 为二进制DXF，zip 为压缩的文本DXF（zip 中只有一个DXF文件）
+FORMATS = ("asc", "bin", "zip")
+
+# 设置环境变量 CAD_CHANGE_DXF_FORMAT 可选择输出格式，子进程同样生效
+output_format = os.environ.get("CAD_CHANGE_DXF_FORMAT", "asc")
+
+
+# 检查输出格式，未指定时使用 output_format
+def check_format(fmt=None):
+    fmt = fmt or output_format
+    if fmt not in FORMATS:
+        raise ValueError(f"未知的DXF输出格式: {fmt}，可选 {', '.join(FORMATS)}")
+    return fmt
+
+
+# 指定格式的输出文件路径：zip 格式将扩展名改为 .zip，其他格式保持不变
+def output_path(output_file, fmt=None):
+    if check_format(fmt) == "zip" and not output_file.lower().endswith(".zip"):
+        return os.path.splitext(output_file)[0] + ".zip"
+    return output_file
+
+
+# zip 中的DXF文件名
+def zip_member(output_file):
+    return os.path.splitext(os.path.basename(output_file))[0] + ".dxf"
+
+
+# 是否为文本输出，快速写出只能生成文本DXF
+def text_output(fmt=None):
+    return check_format(fmt) != "bin"
+
+
+# 按格式保存文档，返回实际保存的路径
+def save_document(doc, output_file, fmt=None):
+    fmt = check_format(fmt)
+    output_file = output_path(output_file, fmt)
+    if fmt == "zip":
+        stream = io.StringIO()
+        doc.write(stream)
+        save_text(stream.getvalue(), doc.output_encoding, output_file, fmt)
+    else:
+        doc.saveas(output_file, fmt=fmt)
+    doc.filename = output_file
+    return output_file
+
+
+# 保存已生成的DXF文本（文本或 zip 格式），返回实际保存的路径
+def save_text(text, encoding, output_file, fmt=None):
+    fmt = check_format(fmt)
+    output_file = output_path(output_file, fmt)
+    if fmt == "zip":
+        with zipfile.ZipFile(output_file, "w", zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr(zip_member(output_file), text.encode(encoding, errors="dxfreplace"))
+    elif fmt == "asc":
+        with io.open(output_file, mode="wt", encoding=encoding, errors="dxfreplace") as f:
+            f.write(text)
+    else:
+        raise ValueError("二进制DXF不能由文本保存")
+    return output_file
+
+
+# 按格式将文档转换为字节数据，用于网络传输
+def document_bytes(doc, fmt=None, filename="drawing.dxf"):
+    fmt = check_format(fmt)
+    if fmt == "bin":
+        stream = io.BytesIO()
+        doc.write(stream, fmt="bin")
+        return stream.getvalue()
+    stream = io.StringIO()
+    doc.write(stream)
+    data = stream.getvalue().encode(doc.output_encoding, errors="dxfreplace")
+    if fmt == "asc":
+        return data
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr(zip_member(filename), data)
+    return archive.getvalue()
+
+
+# 读取任意格式保存的图纸
+def read_document(path):
+    if zipfile.is_zipfile(path):
+        return ezdxf.readzip(path)
+    # readfile 可以识别文本和二进制DXF
+    return ezdxf.readfile(path)
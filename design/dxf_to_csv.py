@@ -1,8 +1,14 @@
 import ezdxf
 import csv
+import io
+import os
 from tkinter import messagebox
 import logging
 import math
+from ezdxf.addons import iterdxf
+from ezdxf.filemanagement import dxf_file_info
+
+from csv_template import ANCHOR_APPID, ANCHOR_COLUMN
 
 # 配置日志记录
 logging.basicConfig(filename='dxf_csv_conversion.log', level=logging.INFO,
@@ -36,6 +42,20 @@ COMMON_LINETYPE_PATTERNS = {
     "虚线": [2.0*9, 1.0*9, 1.0*9]  # 示例图案，可根据实际调整
 }
 
+# CSV表头字段
+FIELDNAMES = [
+    '实体类型', '图层', '颜色', '线型', '线宽', '线型描述', '线型图案',
+    '类型/名称', '块名', '值', '覆盖值', '位置 X', '位置 Y', '起点 X', '起点 Y', '终点 X', '终点 Y',
+    '圆心 X', '圆心 Y', '半径', '顶点数据', '闭合', '高度', '角度', '尺寸编码',
+    '起始角度', '终止角度', '缩放比例', '尺寸样式', ANCHOR_COLUMN
+]
+
+# 超过此大小(字节)的DXF文件默认使用流式转换
+STREAMING_SIZE_THRESHOLD = 50 * 1024 * 1024
+
+# 是否弹出警告对话框，批量/无界面转换时设为 False，仅记录日志
+show_dialogs = True
+
 # 数字格式化，保留三位小数，去除末尾0
 def format_number(num):
     formatted = "{:.3f}".format(num).rstrip('0').rstrip('.') if isinstance(num, (int, float)) else str(num)
@@ -54,7 +74,8 @@ def get_linetype_pattern(doc, linetype):
             elif linetype == "Continuous":
                 pattern = []
             else:
-                messagebox.showwarning("警告", f"无法获取线型 {linetype} 的图案信息，将使用空列表代替。")
+                if show_dialogs:
+                    messagebox.showwarning("警告", f"无法获取线型 {linetype} 的图案信息，将使用空列表代替。")
                 logging.warning(f"无法获取线型 {linetype} 的图案信息，将使用空列表代替。")
     return pattern
 
@@ -357,98 +378,162 @@ def process_hatch(entity, row):
     except AttributeError:
         logging.warning(f"HATCH 实体缺少必要属性，跳过此实体")
 
-# 块
-def process_insert(entity, row, writer):
-    insert_location = entity.dxf.insert
-    row.update({
-        '块名': f"块名: {entity.dxf.name}",
-        '位置 X': format_number(insert_location[0]),
-        '位置 Y': format_number(insert_location[1]),
-    })
+# 块引用：只记录引用的块名、位置、旋转和缩放，块内实体在块定义段中只写入一次
+def process_insert(entity, row, referenced_blocks=None):
+    try:
+        block_name = entity.dxf.name
+        insert_location = entity.dxf.insert
+        xscale = entity.dxf.xscale
+        yscale = entity.dxf.yscale
+        if xscale == yscale:
+            scale = format_number(xscale)
+        else:
+            scale = f"{format_number(xscale)};{format_number(yscale)}"
+        row.update({
+            '类型/名称': block_name,
+            '位置 X': format_number(insert_location[0]),
+            '位置 Y': format_number(insert_location[1]),
+            '角度': format_number(entity.dxf.rotation),
+            '缩放比例': scale
+        })
+        # 记录被引用的块，按首次引用的顺序写入块定义段
+        if referenced_blocks is not None and block_name not in referenced_blocks:
+            referenced_blocks[block_name] = True
+    except AttributeError:
+        logging.warning(f"INSERT 实体缺少必要属性，跳过此实体")
+
+# 读取实体扩展数据中的锚点，没有时返回空字符串
+def entity_anchor(entity):
+    if not entity.has_xdata(ANCHOR_APPID):
+        return ""
+    for code, value in entity.get_xdata(ANCHOR_APPID):
+        if code == 1000:
+            return value
+    return ""
+
+# 写入单个实体，owner 为所属块名（模型空间实体为 None），返回是否写入
+def write_entity(entity, writer, owner=None, referenced_blocks=None):
+    row = {
+        '实体类型': entity.dxftype(),
+        '图层': entity.dxf.layer,
+        '颜色': entity.dxf.color,
+        '线型': entity.dxf.linetype,
+        '线宽': entity.dxf.lineweight,
+    }
+    if owner is not None:
+        row['块名'] = f"引用于: {owner}"
+    anchor = entity_anchor(entity)
+    if anchor:
+        row[ANCHOR_COLUMN] = anchor
+    if entity.dxftype() == 'LINE':
+        process_line(entity, row)
+    elif entity.dxftype() == 'CIRCLE':
+        process_circle(entity, row)
+    elif entity.dxftype() == 'LWPOLYLINE':
+        process_lwpolyline(entity, row)
+    elif entity.dxftype() == 'DIMENSION':
+        process_dimension(entity, row)
+    elif entity.dxftype() == 'ARC':
+        process_arc(entity, row)
+    elif entity.dxftype() in ['TEXT', 'MTEXT']:
+        process_text(entity, row)
+    elif entity.dxftype() == 'HATCH':
+        process_hatch(entity, row)
+    elif entity.dxftype() == 'INSERT':
+        if owner is None:
+            row['块名'] = f"块名: {entity.dxf.name}"
+        process_insert(entity, row, referenced_blocks)
+    else:
+        return False
     writer.writerow(row)
+    return True
 
-    block_def = entity.block()  # 调用 block 方法获取块定义对象
-    for nested_entity in block_def:
-        nested_row = {
-            '实体类型': nested_entity.dxftype(),
-            '图层': nested_entity.dxf.layer,
-            '颜色': nested_entity.dxf.color,
-            '线型': nested_entity.dxf.linetype,
-            '线宽': nested_entity.dxf.lineweight,
-            '块名': f"引用于: {entity.dxf.name}"
-        }
-        if nested_entity.dxftype() == 'LINE':
-            process_line(nested_entity, nested_row)
-        elif nested_entity.dxftype() == 'CIRCLE':
-            process_circle(nested_entity, nested_row)
-        elif nested_entity.dxftype() == 'LWPOLYLINE':
-            process_lwpolyline(nested_entity, nested_row)
-        elif nested_entity.dxftype() == 'DIMENSION':
-            process_dimension(nested_entity, nested_row)
-        elif nested_entity.dxftype() == 'ARC':
-            process_arc(nested_entity, nested_row)
-        elif nested_entity.dxftype() in ['TEXT', 'MTEXT']:
-            process_text(nested_entity, nested_row)
-        elif nested_entity.dxftype() == 'HATCH':
-            process_hatch(nested_entity, nested_row)
-        elif nested_entity.dxftype() == 'INSERT':
-            process_insert(nested_entity, nested_row, writer)
-        writer.writerow(nested_row)
-
-# dxf转csv主函数
-def dxf_to_csv(input_file, output_file):
-    print(f"开始转换: {input_file} -> {output_file}")
-    try:
+# 写入块定义段：每个被引用的块只写入一次，块内嵌套引用的块依次追加
+def write_block_definitions(blocks, referenced_blocks, writer):
+    written_blocks = set()
+    pending_blocks = list(referenced_blocks)
+    while pending_blocks:
+        block_name = pending_blocks.pop(0)
+        if block_name in written_blocks:
+            continue
+        written_blocks.add(block_name)
+        block_def = blocks.get(block_name)
+        if block_def is None:
+            logging.warning(f"未找到块 {block_name} 的定义，跳过块内实体")
+            continue
+        nested_blocks = {}
+        for nested_entity in block_def:
+            write_entity(nested_entity, writer, block_name, nested_blocks)
+        pending_blocks.extend(nested_blocks)
+
+# 读取资源文档：只加载 ENTITIES 段之前的 HEADER/CLASSES/TABLES/BLOCKS，
+# 模型空间实体由 iterdxf 逐个读取，内存占用与实体数量无关
+def read_resource_doc(input_file):
+    encoding = dxf_file_info(input_file).encoding
+    chunks = []
+    prev_value = b''
+    with open(input_file, 'rb') as dxf_file:
+        while True:
+            code = dxf_file.readline()
+            value = dxf_file.readline()
+            if not value:
+                break
+            code_str = code.strip()
+            value_str = value.strip()
+            # (0, SECTION) (2, ENTITIES) 之后的内容不再读取
+            if code_str == b'2' and value_str == b'ENTITIES' and prev_value == b'SECTION':
+                del chunks[-2:]
+                break
+            chunks.append(code)
+            chunks.append(value)
+            prev_value = value_str if code_str == b'0' else b''
+    chunks.append(b'  0\nEOF\n')
+    text = b''.join(chunks).decode(encoding, errors='surrogateescape')
+    return ezdxf.read(io.StringIO(text, newline=None))
+
+# 导出CSV，不弹出对话框，返回写入的模型空间实体数量
+def export_csv(input_file, output_file, streaming=False):
+    if streaming:
+        doc = read_resource_doc(input_file)
+        print(f"流式读取DXF文件: {input_file}")
+    else:
         doc = ezdxf.readfile(input_file)
         msp = doc.modelspace()
         print(f"成功打开DXF文件，模型空间有 {len(msp)} 个实体")
-        fieldnames = [
-            '实体类型', '图层', '颜色', '线型', '线宽', '线型描述', '线型图案',
-            '类型/名称', '块名', '值', '覆盖值', '位置 X', '位置 Y', '起点 X', '起点 Y', '终点 X', '终点 Y',
-            '圆心 X', '圆心 Y', '半径', '顶点数据', '闭合', '高度', '角度', '尺寸编码',
-            '起始角度', '终止角度', '缩放比例', '尺寸样式'
-        ]
-        with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-            # 写入图层信息
-            write_layer_info(doc, writer)
 
+    entity_count = 0
+    referenced_blocks = {}
+    with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES)
+        writer.writeheader()
+        # 写入图层信息
+        write_layer_info(doc, writer)
+
+        if streaming:
+            with open(input_file, 'rb') as stream:
+                for entity in iterdxf.single_pass_modelspace(stream):
+                    if write_entity(entity, writer, referenced_blocks=referenced_blocks):
+                        entity_count += 1
+        else:
             for entity in msp:
-                row = {
-                    '实体类型': entity.dxftype(),
-                    '图层': entity.dxf.layer,
-                    '颜色': entity.dxf.color,
-                    '线型': entity.dxf.linetype,
-                    '线宽': entity.dxf.lineweight,
-                }
-                if entity.dxftype() == 'LINE':
-                    process_line(entity, row)
-                    writer.writerow(row)
-                elif entity.dxftype() == 'CIRCLE':
-                    process_circle(entity, row)
-                    writer.writerow(row)
-                elif entity.dxftype() == 'LWPOLYLINE':
-                    process_lwpolyline(entity, row)
-                    writer.writerow(row)
-                elif entity.dxftype() == 'DIMENSION':
-                    process_dimension(entity, row)
-                    writer.writerow(row)
-                elif entity.dxftype() == 'ARC':
-                    process_arc(entity, row)
-                    writer.writerow(row)
-                elif entity.dxftype() in ['TEXT', 'MTEXT']:
-                    process_text(entity, row)
-                    writer.writerow(row)
-                elif entity.dxftype() == 'HATCH':
-                    process_hatch(entity, row)
-                    writer.writerow(row)
-                elif entity.dxftype() == 'INSERT':
-                    process_insert(entity, row, writer)
-
-            # 写入dimstyle信息
-            write_dimstyle_info(doc, writer)
+                if write_entity(entity, writer, referenced_blocks=referenced_blocks):
+                    entity_count += 1
+
+        # 写入块定义信息，流式模式下块定义来自资源文档
+        write_block_definitions(doc.blocks, referenced_blocks, writer)
+
+        # 写入dimstyle信息
+        write_dimstyle_info(doc, writer)
 
+    return entity_count
+
+# dxf转csv主函数，streaming 为 None 时根据文件大小自动选择流式模式
+def dxf_to_csv(input_file, output_file, streaming=None):
+    print(f"开始转换: {input_file} -> {output_file}")
+    try:
+        if streaming is None:
+            streaming = os.path.getsize(input_file) > STREAMING_SIZE_THRESHOLD
+        export_csv(input_file, output_file, streaming)
 
         messagebox.showinfo("成功", f"转换完成！已保存到 {output_file}")
         logging.info(f"{input_file} 已成功转换为 {output_file} (DXF to CSV)")
@@ -457,4 +542,4 @@ def dxf_to_csv(input_file, output_file):
         logging.error(f"文件 {input_file} 未找到或不是有效的 DXF 文件")
     except ezdxf.DXFStructureError:
         messagebox.showerror("错误", f"文件 {input_file} 是无效或损坏的 DXF 文件")
-        logging.error(f"文件 {input_file} 是无效或损坏的 DXF 文件")
\ No newline at end of file
+        logging.error(f"文件 {input_file} 是无效或损坏的 DXF 文件")
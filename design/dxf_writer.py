@@ -0,0 +1,159 @@
+import io
+
+import dxf_output
+from csv_template import ANCHOR_APPID
+from ezdxf.entities import Arc, Circle, Line, LWPolyline, Text
+
+
+# 快速写出：模板只包含简单图元时，不建立 ezdxf 实体对象，直接将实体的组码写入文件
+# 写出的组码与 ezdxf 保存同样实体时的结果相同
+# 只由 csv_to_dxf.csv_to_dxf 单独转换CSV文件时使用，文档骨架（文件头、图层和标注样式）仍由 ezdxf 创建并缓存
+
+
+# 按 ezdxf 的属性定义检查属性值，无效时使用 ezdxf 的修正值，无法修正时抛出 ValueError
+def checked(entity_class, name, value):
+    dxfattrib = entity_class.DXFATTRIBS.get(name)
+    if dxfattrib.is_valid_value(value):
+        return value
+    if dxfattrib.fixer is not None:
+        return dxfattrib.fixer(value)
+    raise ValueError(f"{entity_class.DXFTYPE} 实体的属性 {name} 的值 {value!r} 无效")
+
+
+# 组码和值转换为 DXF 文本
+def tag(code, value):
+    return f"{code:>3}\n{value}\n"
+
+
+# 坐标点的组码，z 坐标为 0
+def point_tags(code, point):
+    return f"{code:>3}\n{float(point[0])}\n{code + 10:>3}\n{float(point[1])}\n{code + 20:>3}\n0.0\n"
+
+
+# 实体开头的组码：类型、句柄、所属块以及图层、线型、颜色和线宽，默认值不写出
+def entity_tags(entity_class, record, handle, owner):
+    tags = [tag(0, entity_class.DXFTYPE), tag(5, handle), tag(330, owner), tag(100, "AcDbEntity"),
+            tag(8, checked(entity_class, "layer", record["layer"]))]
+    linetype = checked(entity_class, "linetype", record["linetype"])
+    if linetype != "BYLAYER":
+        tags.append(tag(6, linetype))
+    color = checked(entity_class, "color", record["color"])
+    if color != 256:
+        tags.append(tag(62, color))
+    lineweight = checked(entity_class, "lineweight", record["lineweight"])
+    if lineweight != -1:
+        tags.append(tag(370, lineweight))
+    return tags
+
+
+def line_tags(record, handle, owner):
+    tags = entity_tags(Line, record, handle, owner)
+    tags += [tag(100, "AcDbLine"), point_tags(10, record["start"]), point_tags(11, record["end"])]
+    return tags
+
+
+def circle_tags(record, handle, owner):
+    tags = entity_tags(Circle, record, handle, owner)
+    tags += [tag(100, "AcDbCircle"), point_tags(10, record["center"]),
+             tag(40, float(checked(Circle, "radius", record["radius"])))]
+    return tags
+
+
+def arc_tags(record, handle, owner):
+    tags = entity_tags(Arc, record, handle, owner)
+    tags += [tag(100, "AcDbCircle"), point_tags(10, record["center"]),
+             tag(40, float(checked(Arc, "radius", record["radius"]))),
+             tag(100, "AcDbArc"), tag(50, float(record["start_angle"])), tag(51, float(record["end_angle"]))]
+    return tags
+
+
+# 多段线顶点格式为 (x, y, 起始宽度, 终止宽度, 凸度)，宽度和凸度为 0 时不写出
+def lwpolyline_tags(record, handle, owner):
+    if not record["vertices"]:
+        return []
+    tags = entity_tags(LWPolyline, record, handle, owner)
+    tags += [tag(100, "AcDbPolyline"), tag(90, len(record["vertices"])), tag(70, 1 if record["closed"] else 0)]
+    for x, y, start_width, end_width, bulge in record["vertices"]:
+        tags.append(f" 10\n{float(x)}\n 20\n{float(y)}\n")
+        if start_width or end_width:
+            tags.append(f" 40\n{float(start_width)}\n 41\n{float(end_width)}\n")
+        if bulge:
+            tags.append(tag(42, float(bulge)))
+    return tags
+
+
+# 单行文字，插入点和对齐点相同（左对齐）；与 csv_to_dxf.handle_text 相同，不使用记录中的线型和线宽
+def text_tags(record, handle, owner):
+    tags = entity_tags(Text, dict(record, linetype="BYLAYER", lineweight=-1), handle, owner)
+    tags += [tag(100, "AcDbText"), point_tags(10, record["insert"]),
+             tag(40, float(checked(Text, "height", record["height"]))),
+             tag(1, checked(Text, "text", record["text"]))]
+    if record["rotation"]:
+        tags.append(tag(50, float(record["rotation"])))
+    tags += [point_tags(11, record["insert"]), tag(100, "AcDbText")]
+    return tags
+
+
+# 锚点的扩展数据，与 csv_to_dxf.set_anchor 写入的相同
+def anchor_tags(record):
+    return [tag(1001, ANCHOR_APPID), tag(1000, record["anchor"])]
+
+
+# 支持快速写出的实体类型
+WRITERS = {
+    "LINE": line_tags,
+    "CIRCLE": circle_tags,
+    "ARC": arc_tags,
+    "LWPOLYLINE": lwpolyline_tags,
+    "TEXT": text_tags,
+}
+
+
+# 模板是否只包含可以快速写出的实体
+def supports(template):
+    for i in template.entities:
+        record = template.records[i]
+        if record is not None and record["type"] not in WRITERS:
+            return False
+    return True
+
+
+# 将模板中的实体写入 doc 的模型空间并保存到 output_file，doc 为已建好图层等资源的空文档，返回实际保存的路径
+# 模板包含其他实体、有无法修正的属性值或输出格式为二进制DXF时不写出，返回 None，由调用者使用完整的文档对象绘制
+def write_template(doc, template, output_file):
+    if not dxf_output.text_output() or not supports(template):
+        return None
+    # 有锚点时注册扩展数据的应用程序名称
+    if any(template.records[i] and template.records[i]["anchor"] for i in template.entities) \
+            and ANCHOR_APPID not in doc.appids:
+        doc.appids.new(ANCHOR_APPID)
+    handles = doc.entitydb.handles
+    start = int(str(handles), 16)
+    owner = doc.modelspace().layout_key
+    chunks = []
+    count = 0
+    try:
+        for i in template.entities:
+            record = template.records[i]
+            if record is None:
+                continue
+            tags = WRITERS[record["type"]](record, f"{start + count:X}", owner)
+            if tags and record["anchor"]:
+                tags += anchor_tags(record)
+            if tags:
+                chunks.append("".join(tags))
+                count += 1
+    except ValueError:
+        return None
+    # 预留写出实体使用的句柄，文档头中的 $HANDSEED 随之更新
+    handles.reset(f"{start + count:X}")
+
+    stream = io.StringIO()
+    doc.write(stream)
+    text = stream.getvalue()
+    marker = "  0\nSECTION\n  2\nENTITIES\n"
+    position = text.index(marker) + len(marker)
+    output_file = dxf_output.save_text("".join([text[:position]] + chunks + [text[position:]]), doc.output_encoding,
+                                       output_file)
+    doc.filename = output_file
+    return output_file
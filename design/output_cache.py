@@ -0,0 +1,156 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+
+import csv_to_dxf
+import dxf_output
+
+# 缓存目录，保存已生成的图纸，文件名为缓存键
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.output_cache')
+# 缓存总大小上限，超过后按最近使用时间淘汰
+MAX_CACHE_BYTES = 256 * 1024 * 1024
+# 参与代码版本计算的源文件，修改绘图代码后旧的缓存自动失效
+CODE_FILES = ['csv_to_dxf.py', 'csv_template.py', 'brb_drawing.py', 'vfd_drawing.py', 'output_cache.py',
+              'dimension_cache.py', 'dxf_output.py', 'dxf_writer.py', 'transform.py', 'update_rules.py']
+
+# 设置环境变量 CAD_CHANGE_OUTPUT_CACHE=0 可关闭缓存，子进程同样生效
+enabled = os.environ.get("CAD_CHANGE_OUTPUT_CACHE", "1") != "0"
+
+# 本进程的命中统计
+stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+# 文件哈希缓存：绝对路径 -> (修改时间, 文件大小, 哈希)
+_file_hashes = {}
+_code_version = None
+
+
+# 计算文件内容的哈希，文件未变化时直接使用上次的结果
+def file_hash(path):
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    cached = _file_hashes.get(path)
+    if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+    with open(path, 'rb') as f:
+        digest = hashlib.sha1(f.read()).hexdigest()
+    _file_hashes[path] = (stat.st_mtime_ns, stat.st_size, digest)
+    return digest
+
+
+# 绘图代码版本，由相关源文件的哈希组成
+def code_version():
+    global _code_version
+    if _code_version is None:
+        module_dir = os.path.dirname(os.path.abspath(__file__))
+        digest = hashlib.sha1()
+        for name in CODE_FILES:
+            path = os.path.join(module_dir, name)
+            if os.path.exists(path):
+                digest.update(file_hash(path).encode('ascii'))
+        _code_version = digest.hexdigest()
+    return _code_version
+
+
+# 计算缓存键：图纸类型、输出格式、影响图纸内容的绘图设置、模板文件内容、参数和代码版本的哈希
+def cache_key(kind, template_files, params):
+    content = json.dumps({
+        "kind": kind,
+        "format": dxf_output.output_format,
+        "render_dimensions": csv_to_dxf.render_dimensions,
+        "scale_factor": csv_to_dxf.global_scale_factor,
+        "fast_writer": csv_to_dxf.fast_writer,
+        "templates": [file_hash(path) for path in template_files],
+        "params": params,
+        "code": code_version(),
+    }, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+
+# 缓存文件路径
+def cache_path(key):
+    return os.path.join(CACHE_DIR, f"{key}.dxf")
+
+
+# 命中时将缓存的图纸复制到 output_file 并返回 True
+def fetch(key, output_file):
+    if not enabled:
+        return False
+    path = cache_path(key)
+    try:
+        shutil.copyfile(path, output_file)
+        # 更新修改时间，作为最近使用时间
+        os.utime(path)
+    except FileNotFoundError:
+        stats["misses"] += 1
+        return False
+    except OSError as e:
+        logging.warning(f"读取图纸缓存 {path} 失败: {str(e)}")
+        stats["misses"] += 1
+        return False
+    stats["hits"] += 1
+    return True
+
+
+# 保存生成的图纸到缓存，失败时只记录日志
+def store(key, output_file):
+    if not enabled:
+        return
+    path = cache_path(key)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        shutil.copyfile(output_file, temp_path)
+        os.replace(temp_path, path)
+        stats["stores"] += 1
+        evict()
+    except OSError as e:
+        logging.warning(f"写入图纸缓存 {path} 失败: {str(e)}")
+
+
+# 列出缓存中的图纸，按最近使用时间从旧到新排序
+def entries():
+    if not os.path.isdir(CACHE_DIR):
+        return []
+    result = []
+    for name in os.listdir(CACHE_DIR):
+        if not name.endswith(".dxf"):
+            continue
+        try:
+            stat = os.stat(os.path.join(CACHE_DIR, name))
+        except FileNotFoundError:
+            continue
+        result.append((stat.st_mtime, stat.st_size, name))
+    result.sort()
+    return result
+
+
+# 总大小超过上限时，淘汰最久未使用的图纸
+def evict(max_bytes=None):
+    max_bytes = MAX_CACHE_BYTES if max_bytes is None else max_bytes
+    cached = entries()
+    total = sum(size for _, size, _ in cached)
+    for _, size, name in cached:
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(os.path.join(CACHE_DIR, name))
+            stats["evictions"] += 1
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+# 缓存状态：本进程的命中统计以及缓存中的图纸数量和总大小
+def cache_info():
+    cached = entries()
+    info = dict(stats)
+    info["entries"] = len(cached)
+    info["bytes"] = sum(size for _, size, _ in cached)
+    return info
+
+
+# 清空缓存
+def clear():
+    shutil.rmtree(CACHE_DIR, ignore_errors=True)
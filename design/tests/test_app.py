@@ -0,0 +1,61 @@
+import io
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import ezdxf
+
+# 各模块之间使用顶层导入，测试时需要将 design 目录加入Python路径
+design_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if design_dir not in sys.path:
+    sys.path.insert(0, design_dir)
+
+import app
+import csv_to_dxf
+import vfd_drawing
+from test_diagnostics import VFD_ROW, write_bad_model_table
+
+
+# 图纸中尺寸图形块的数量
+def dimension_blocks(data):
+    doc = ezdxf.read(io.StringIO(data.decode("utf-8")))
+    return sum(1 for block in doc.blocks if block.name.startswith("*D"))
+
+
+# 生成选项只作为参数传递，不修改工作进程的全局设置
+def test_render_options_do_not_change_worker_globals(monkeypatch):
+    monkeypatch.setattr(vfd_drawing, "show_dialogs", False)
+    monkeypatch.setattr(csv_to_dxf, "show_dialogs", False)
+    default = csv_to_dxf.render_dimensions
+
+    plain = app.render_vfd(VFD_ROW, "asc", False)
+    assert plain["error"] == ""
+    assert dimension_blocks(plain["data"]) == 0
+    assert csv_to_dxf.render_dimensions == default
+
+    rendered = app.render_vfd(VFD_ROW, "asc", True)
+    assert dimension_blocks(rendered["data"]) > 0
+
+
+# 模板中的无效行作为转换警告随图纸返回
+def test_drawing_response_includes_warnings(tmp_path, monkeypatch):
+    model_table, line_num = write_bad_model_table(tmp_path)
+    monkeypatch.setattr(vfd_drawing, "MODEL_TABLE", model_table)
+    monkeypatch.setattr(vfd_drawing, "_model_cache", None)
+    monkeypatch.setattr(vfd_drawing, "show_dialogs", False)
+    monkeypatch.setattr(csv_to_dxf, "show_dialogs", False)
+
+    # 在本进程的线程中生成，替换的型号表对生成过程有效
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        monkeypatch.setattr(app, "executor", executor)
+        client = app.app.test_client()
+        response = client.post("/vfd", json=VFD_ROW)
+        assert response.status_code == 200
+        warnings = json.loads(response.headers["X-Drawing-Warnings"])
+        assert [(w["line"], w["entity_type"]) for w in warnings[0]["warnings"]] == [(line_num, "CIRCLE")]
+
+        response = client.post("/vfd", json=[VFD_ROW, dict(VFD_ROW, axis_diameter=1)])
+        assert response.status_code == 400
+        assert [error["index"] for error in response.json["errors"]] == [1]
+        assert [item["index"] for item in response.json["warnings"]] == [0]
@@ -0,0 +1,43 @@
+import os
+import sys
+
+# 各模块之间使用顶层导入，测试时需要将 design 目录加入Python路径
+design_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if design_dir not in sys.path:
+    sys.path.insert(0, design_dir)
+
+import csv_template
+
+
+HEADER = "实体类型,图层,颜色,线型,线宽,块名,起点 X,起点 Y,终点 X,终点 Y\n"
+
+
+# 写入只有一条直线的模板
+def write_template(path, end_x):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(HEADER)
+        f.write(f"LINE,0,256,BYLAYER,-1,,0,0,{end_x},0\n")
+
+
+# 模板内容变化后内存缓存和磁盘缓存都失效，磁盘中只保留最新内容的编译结果
+def test_changed_template_invalidates_memory_and_disk_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(csv_template, "CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(csv_template, "_memory_cache", {})
+    template_file = str(tmp_path / "模板.csv")
+
+    write_template(template_file, 10)
+    first = csv_template.load_template(template_file)
+    assert first.records[0]["end"] == (10.0, 0.0)
+    assert csv_template.load_template(template_file) is first
+    assert len(os.listdir(csv_template.CACHE_DIR)) == 1
+
+    write_template(template_file, 2500)
+    second = csv_template.load_template(template_file)
+    assert second.records[0]["end"] == (2500.0, 0.0)
+    assert len(os.listdir(csv_template.CACHE_DIR)) == 1
+
+    # 清空内存缓存后从磁盘读取的也是新内容
+    csv_template.clear_memory_cache()
+    third = csv_template.load_template(template_file)
+    assert third is not second
+    assert third.records[0]["end"] == (2500.0, 0.0)
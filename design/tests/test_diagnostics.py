@@ -0,0 +1,82 @@
+import csv
+import os
+import sys
+
+# 各模块之间使用顶层导入，测试时需要将 design 目录加入Python路径
+design_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if design_dir not in sys.path:
+    sys.path.insert(0, design_dir)
+
+import csv_to_dxf
+import diagnostics
+import output_cache
+import vfd_drawing
+
+
+# VFD 数据行
+VFD_ROW = {"project_name": "测试", "force": 500, "design_displacement": 50, "quantity": 2, "cylinder_diameter": 140,
+           "axis_diameter": 50, "dt1": 200, "dt2": 150, "dt3": 150, "piston_width": 60, "dt4": 100, "dt5": 200}
+
+
+# 嵌套的收集过程使用外层的收集器，外层还没有问题时也一样
+def test_nested_collecting_reuses_outer_collector():
+    with diagnostics.collecting() as outer:
+        assert len(outer) == 0
+        with diagnostics.collecting() as inner:
+            assert inner is outer
+            diagnostics.record("内层问题")
+        assert outer.depth == 1
+    assert [entry["reason"] for entry in outer.entries] == ["内层问题"]
+    assert diagnostics.current() is None
+
+
+# 复制产品结构图并将一个圆的半径改为无效值，返回指向该结构图的型号表
+def write_bad_model_table(tmp_path):
+    model = vfd_drawing.find_vfd_model(140, 50)
+    with open(model["产品结构图数据"], "r", encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    header = rows[0]
+    line = next(i for i, row in enumerate(rows) if row[0] == "CIRCLE")
+    rows[line][header.index("半径")] = "abc"
+    design_file = tmp_path / "产品图.csv"
+    with open(design_file, "w", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerows(rows)
+
+    with open(vfd_drawing.MODEL_TABLE, "r", encoding="utf-8") as f:
+        table = list(csv.DictReader(f))
+    fieldnames = list(table[0])
+    for row in table:
+        if (row["缸径"], row["轴径"]) == ("140", "50"):
+            row["产品结构图数据"] = str(design_file)
+            row["前吊耳"] = model["前吊耳"]
+    model_table = tmp_path / "型号表.csv"
+    with open(model_table, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(table)
+    # 警告中的行号不计表头
+    return str(model_table), line
+
+
+# 模板中的一个无效行出现在每个数据行的结果中，全部问题只弹出一个对话框，有警告的图纸不缓存
+def test_bad_template_row_reported_per_row(tmp_path, monkeypatch):
+    model_table, line_num = write_bad_model_table(tmp_path)
+    monkeypatch.setattr(vfd_drawing, "MODEL_TABLE", model_table)
+    monkeypatch.setattr(vfd_drawing, "_model_cache", None)
+    monkeypatch.setattr(vfd_drawing, "show_dialogs", True)
+    monkeypatch.setattr(csv_to_dxf, "show_dialogs", True)
+    monkeypatch.setattr(output_cache, "enabled", True)
+    monkeypatch.setattr(output_cache, "CACHE_DIR", str(tmp_path / "cache"))
+    dialogs = []
+    monkeypatch.setattr(diagnostics.messagebox, "showwarning", lambda *args: dialogs.append(args))
+    monkeypatch.setattr(diagnostics.messagebox, "showerror", lambda *args: dialogs.append(args))
+
+    results = vfd_drawing.vfd_drawing([VFD_ROW, dict(VFD_ROW, force=600)], str(tmp_path))
+
+    assert len(dialogs) == 1
+    assert [result["error"] for result in results] == ["", ""]
+    for result in results:
+        assert os.path.exists(result["output"])
+        assert [(w["line"], w["entity_type"]) for w in result["warnings"]] == [(line_num, "CIRCLE")]
+        assert "半径" in result["warnings"][0]["field"]
+    assert not os.path.isdir(output_cache.CACHE_DIR) or not os.listdir(output_cache.CACHE_DIR)
@@ -0,0 +1,61 @@
+import os
+import sys
+
+import ezdxf
+import pytest
+
+# 各模块之间使用顶层导入，测试时需要将 design 目录加入Python路径
+design_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if design_dir not in sys.path:
+    sys.path.insert(0, design_dir)
+
+import dimension_cache
+
+
+# 新建文档，尺寸样式 COLORED 设置了尺寸线颜色
+def new_doc():
+    doc = ezdxf.new("R2018")
+    doc.dimstyles.new("COLORED", dxfattribs={"dimclrd": 3, "dimtxt": 2.5})
+    return doc
+
+
+# 添加一个线性标注
+def add_dim(doc, dimstyle, attribs):
+    return doc.modelspace().add_linear_dim(base=(0, 20), p1=(0, 0), p2=(100, 0), text="<>",
+                                           dimstyle=dimstyle, dxfattribs=attribs)
+
+
+# 标注实体和尺寸块中实体的类型、属性和文字，不含句柄和块名
+def block_content(dim):
+    dimension = dim.dimension
+    block = dim.doc.blocks.get(dimension.dxf.geometry)
+    entities = [(entity.dxftype(), entity.dxfattribs(drop={"handle", "owner"}),
+                 entity.text if entity.dxftype() == "MTEXT" else None) for entity in block]
+    return dimension.dxfattribs(drop={"handle", "owner", "geometry"}), entities
+
+
+# 图层、颜色、线型和线宽不同的标注共用一个尺寸块，复用的尺寸块与直接渲染的相同；
+# 图层或颜色与 ezdxf 自行指定的值或尺寸样式中的颜色相同时无法判断继承关系，不复用
+@pytest.mark.parametrize("dimstyle, first, second, hit", [
+    ("Standard", {"layer": "尺寸", "color": 1}, {"layer": "标注", "color": 5, "linetype": "DASHED", "lineweight": 50}, True),
+    ("COLORED", {"layer": "尺寸", "color": 5}, {"layer": "标注", "color": 7}, True),
+    ("Standard", {"layer": "0", "color": 256}, {"layer": "标注", "color": 2}, False),
+    ("Standard", {"layer": "标注", "color": 2}, {"layer": "0", "color": 256}, False),
+    ("COLORED", {"layer": "尺寸", "color": 5}, {"layer": "Defpoints", "color": 3}, False),
+])
+def test_replayed_block_matches_fresh_render(monkeypatch, dimstyle, first, second, hit):
+    monkeypatch.setattr(dimension_cache, "enabled", True)
+    dimension_cache.clear()
+    key = (("p1", (0, 0)), ("p2", (100, 0)))
+
+    doc = new_doc()
+    dimension_cache.render(add_dim(doc, dimstyle, first), key)
+    replayed = add_dim(doc, dimstyle, second)
+    hits = dimension_cache.stats["hits"]
+    dimension_cache.render(replayed, key)
+    assert dimension_cache.stats["hits"] == hits + hit
+
+    fresh = add_dim(new_doc(), dimstyle, second)
+    fresh.render()
+    assert block_content(replayed) == block_content(fresh)
+    dimension_cache.clear()
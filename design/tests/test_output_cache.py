@@ -0,0 +1,70 @@
+import os
+import sys
+
+import pytest
+
+# 各模块之间使用顶层导入，测试时需要将 design 目录加入Python路径
+design_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if design_dir not in sys.path:
+    sys.path.insert(0, design_dir)
+
+import csv_to_dxf
+import dxf_output
+import output_cache
+
+
+@pytest.fixture
+def template_file(tmp_path):
+    path = tmp_path / "模板.csv"
+    path.write_text("实体类型,图层\n", encoding="utf-8")
+    return str(path)
+
+
+# 相同的输入得到相同的缓存键，参数的顺序不影响缓存键
+def test_cache_key_is_stable(template_file):
+    first = output_cache.cache_key("brb", [template_file], {"a": 1, "b": "文字"})
+    second = output_cache.cache_key("brb", [template_file], {"b": "文字", "a": 1})
+    assert first == second
+    assert len(first) == 40
+
+
+# 模板内容、参数和影响图纸内容的绘图设置变化后缓存键都会变化
+@pytest.mark.parametrize("change", [
+    lambda monkeypatch, path: open(path, "a", encoding="utf-8").write("LINE,0\n"),
+    lambda monkeypatch, path: monkeypatch.setattr(dxf_output, "output_format", "zip"),
+    lambda monkeypatch, path: monkeypatch.setattr(csv_to_dxf, "render_dimensions", not csv_to_dxf.render_dimensions),
+    lambda monkeypatch, path: monkeypatch.setattr(csv_to_dxf, "global_scale_factor", csv_to_dxf.global_scale_factor + 1),
+    lambda monkeypatch, path: monkeypatch.setattr(csv_to_dxf, "fast_writer", not csv_to_dxf.fast_writer),
+    lambda monkeypatch, path: monkeypatch.setattr(output_cache, "_code_version", "其他代码版本"),
+], ids=["template", "format", "render_dimensions", "scale_factor", "fast_writer", "code"])
+def test_cache_key_changes(template_file, monkeypatch, change):
+    params = {"a": 1}
+    before = output_cache.cache_key("brb", [template_file], params)
+    change(monkeypatch, template_file)
+    assert output_cache.cache_key("brb", [template_file], params) != before
+
+
+# 参数或图纸类型不同时缓存键不同
+def test_cache_key_depends_on_params_and_kind(template_file):
+    key = output_cache.cache_key("brb", [template_file], {"a": 1})
+    assert output_cache.cache_key("brb", [template_file], {"a": 2}) != key
+    assert output_cache.cache_key("vfd", [template_file], {"a": 1}) != key
+
+
+# 淘汰后缓存总大小不超过上限，保留最近使用的图纸
+def test_evict_keeps_total_size_under_limit(tmp_path, monkeypatch):
+    monkeypatch.setattr(output_cache, "CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(output_cache, "MAX_CACHE_BYTES", 2500)
+    monkeypatch.setattr(output_cache, "enabled", True)
+    drawing = tmp_path / "drawing.dxf"
+    drawing.write_bytes(b"0" * 1000)
+    for index in range(5):
+        key = f"{index:040d}"
+        output_cache.store(key, str(drawing))
+        # 按存入顺序设置最近使用时间
+        os.utime(output_cache.cache_path(key), (index, index))
+        output_cache.evict()
+
+    cached = output_cache.entries()
+    assert sum(size for _, size, _ in cached) <= output_cache.MAX_CACHE_BYTES
+    assert [name for _, _, name in cached] == [f"{index:040d}.dxf" for index in (3, 4)]
@@ -0,0 +1,136 @@
+import os
+import sys
+
+import pytest
+
+# 各模块之间使用顶层导入，测试时需要将 design 目录加入Python路径
+design_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if design_dir not in sys.path:
+    sys.path.insert(0, design_dir)
+
+import diagnostics
+import transform
+
+
+HEADER = ["实体类型", "块名", "位置 X", "位置 Y", "圆心 X", "圆心 Y", "半径", "起始角度", "终止角度",
+          "角度", "缩放比例", "顶点数据"]
+
+
+# 按列名建立一行，未指定的单元格为空
+def make_row(**cells):
+    return [cells.get(name, "") for name in HEADER]
+
+
+# 读取表格中一行的单元格
+def cell(table, i, name):
+    return table[i][HEADER.index(name)]
+
+
+# 一个圆弧、一个块引用和一条多段线
+def make_table():
+    return [
+        HEADER,
+        make_row(实体类型="ARC", **{"圆心 X": "10", "圆心 Y": "0"}, 半径="5", 起始角度="0", 终止角度="90"),
+        make_row(实体类型="INSERT", 块名="块名: 螺栓", **{"位置 X": "3", "位置 Y": "4"}, 角度="0", 缩放比例="2"),
+        make_row(实体类型="LWPOLYLINE", 顶点数据="(1, 0, 0, 0, 0.5); (2, 0, 1, 1, 0)"),
+    ]
+
+
+# 左右镜像：圆弧的起止角度交换，块引用的Y比例取反并转过180度，多段线的凸度取反
+def test_mirror():
+    table = transform.apply(make_table(), transform.Transform().mirror(90))
+
+    assert (cell(table, 1, "圆心 X"), cell(table, 1, "圆心 Y")) == pytest.approx((-10, 0))
+    assert (cell(table, 1, "起始角度"), cell(table, 1, "终止角度")) == pytest.approx((90, 180))
+    assert cell(table, 1, "半径") == "5"
+
+    assert (cell(table, 2, "位置 X"), cell(table, 2, "位置 Y")) == pytest.approx((-3, 4))
+    assert cell(table, 2, "角度") == pytest.approx(180)
+    assert cell(table, 2, "缩放比例") == "2;-2"
+
+    assert cell(table, 3, "顶点数据") == "(-1, 0, 0, 0, -0.5); (-2, 0, 1, 1, 0)"
+
+
+# 旋转：圆弧的起止角度随之转过，不交换；块引用的比例不变；多段线顶点旋转，宽度和凸度不变
+def test_rotate():
+    table = transform.apply(make_table(), transform.Transform().rotate(90))
+
+    assert (cell(table, 1, "圆心 X"), cell(table, 1, "圆心 Y")) == pytest.approx((0, 10))
+    assert (cell(table, 1, "起始角度"), cell(table, 1, "终止角度")) == pytest.approx((90, 180))
+
+    assert (cell(table, 2, "位置 X"), cell(table, 2, "位置 Y")) == pytest.approx((-4, 3))
+    assert cell(table, 2, "角度") == pytest.approx(90)
+    assert cell(table, 2, "缩放比例") == "2"
+
+    assert cell(table, 3, "顶点数据") == "(0, 1, 0, 0, 0.5); (0, 2, 1, 1, 0)"
+
+
+# 缩放后镜像：长度、块引用比例和多段线宽度按比例变化，镜像只改变方向
+def test_scale_then_mirror():
+    table = transform.apply(make_table(), transform.Transform().scale(2).mirror(0))
+
+    assert (cell(table, 1, "圆心 X"), cell(table, 1, "圆心 Y")) == pytest.approx((20, 0))
+    assert cell(table, 1, "半径") == pytest.approx(10)
+    assert (cell(table, 1, "起始角度"), cell(table, 1, "终止角度")) == pytest.approx((270, 0))
+    assert cell(table, 2, "缩放比例") == "4;-4"
+    assert cell(table, 3, "顶点数据") == "(2, 0, 0, 0, -0.5); (4, 0, 2, 2, 0)"
+
+
+# 修改计划：同一单元格的多次修改合并，无效的单元格记录警告并保持原值
+def test_edit_plan_merges_edits():
+    table = [["实体类型", "起点 X", "终点 X"], ["LINE", "0", "10"], ["LINE", "abc", "20"]]
+    plan = transform.EditPlan()
+    plan.add(1, "起点 X", 5)
+    plan.add(1, "起点 X", -2)
+    plan.add(1, "终点 X", 1.5)
+    plan.add(2, "起点 X", 1)
+    plan.add(2, "终点 X", 1)
+    assert len(plan) == 5
+
+    with diagnostics.collecting() as collector:
+        plan.apply(table, "测试.csv")
+    assert table[1][1:] == [3, 11.5]
+    assert table[2][1:] == ["abc", 21]
+    assert [(entry["line"], entry["field"]) for entry in collector.entries] == [(3, "起点 X")]
+
+
+# 拉伸用的表格：跨越窗口的直线、窗口内的直线、窗口外的直线、部分顶点在窗口内的多段线，以及块内的直线
+def make_stretch_table():
+    header = ["实体类型", "块名", "起点 X", "起点 Y", "终点 X", "终点 Y", "顶点数据"]
+    return [
+        header,
+        ["LINE", "", "0", "0", "100", "0", ""],
+        ["LINE", "", "60", "5", "80", "5", ""],
+        ["LINE", "", "0", "50", "20", "50", ""],
+        ["LWPOLYLINE", "", "", "", "", "", "(40, 0, 0, 0, 0); (60, 0, 0, 0, 0); (60, 10, 0, 0, 0)"],
+        ["LINE", "引用于: 块1", "60", "0", "90", "0", ""],
+    ]
+
+
+# 按窗口选择坐标点：只选择模型空间中窗口内（含边界）的点，块内的实体不在模型空间的索引中
+def test_stretch_selects_points_inside_window():
+    table = make_stretch_table()
+    index = transform.SpatialIndex(table)
+    assert len(index) == 9
+    selected = {(index.refs[k][0], index.refs[k][1], index.refs[k][2]) for k in index.query(50, -10, 100, 10)}
+    assert selected == {(1, "终点 X", "终点 Y"), (2, "起点 X", "起点 Y"), (2, "终点 X", "终点 Y"),
+                        (4, None, 1), (4, None, 2)}
+    assert index.stretch(50, -10, 100, 10, 5) == 5
+    assert len(transform.SpatialIndex(table, block="块1").query(50, -10, 100, 10)) == 2
+
+
+# 写回：跨越窗口的直线被拉伸，窗口内的图形整体移动，嵌套窗口的位移累加，未移动的单元格保持原值
+def test_stretch_write():
+    table = make_stretch_table()
+    index = transform.SpatialIndex(table)
+    index.stretch(50, -10, 100, 10, 5)
+    index.stretch(70, -10, 100, 10, 2)
+    assert index.write() == 5
+
+    assert table[1][2:6] == ["0", "0", 107, "0"]
+    assert table[2][2:6] == [65, "5", 87, "5"]
+    assert table[3][2:6] == ["0", "50", "20", "50"]
+    assert table[4][6] == "(40, 0, 0, 0, 0); (65, 0, 0, 0, 0); (65, 10, 0, 0, 0)"
+    assert table[5][2:6] == ["60", "0", "90", "0"]
+    # 写回后以新的位置为起点
+    assert index.stretch(106, -1, 108, 1, 1) == 1
@@ -0,0 +1,66 @@
+import json
+import os
+import sys
+
+import pytest
+
+# 各模块之间使用顶层导入，测试时需要将 design 目录加入Python路径
+design_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if design_dir not in sys.path:
+    sys.path.insert(0, design_dir)
+
+import brb_drawing
+from csv_template import load_template, TemplateOverlay
+from update_rules import Rule, RuleSet, RuleError, parse_expression
+
+
+# 原 update_data1/2/3 对各BRB模板、两组参数修改的单元格：{模板类型: [{"params", "cells": {锚点: {列名: 值}}}]}
+LEGACY_CELLS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "brb_legacy_cells.json")
+
+
+# 表达式中不允许的写法和未定义的名称在编译时拒绝，错误说明包含规则文件和行号
+@pytest.mark.parametrize("text, message", [
+    ("width.real", "不支持的写法 Attribute"),
+    ("width[0]", "不支持的写法 Subscript"),
+    ("width ** 2", "不支持的写法 Pow"),
+    ("[w for w in (width, height)]", "不支持的写法 ListComp"),
+    ("round(width, ndigits=1)", "只能按位置调用函数"),
+    ("depth + 1", "名称 depth 未定义"),
+    ("__import__('os')", "名称 __import__ 未定义"),
+])
+def test_parse_expression_rejects(text, message):
+    rule = Rule("端面.芯板宽度", "覆盖值", "数值", text, 7)
+    with pytest.raises(RuleError, match=message) as error:
+        parse_expression(rule, {"width", "height", "round"}, "规则.csv")
+    assert "规则.csv 第 7 行" in str(error.value)
+
+
+# 计算出错时指出出错规则所在的行
+def test_evaluate_names_failing_line():
+    rules = [Rule("a", "覆盖值", "数值", "width + 1", 2), Rule("b", "覆盖值", "数值", "width / thickness", 3)]
+    rule_set = RuleSet("规则.csv", rules, ("width", "thickness"), {})
+    assert rule_set.evaluate({"width": 10, "thickness": 2}) == (11, 5)
+    with pytest.raises(RuleError, match="规则.csv 第 3 行的表达式 width / thickness 计算出错: ZeroDivisionError"):
+        rule_set.evaluate({"width": 10, "thickness": 0})
+
+
+# 文字规则中的 {表达式} 和 {表达式:格式} 替换为表达式的值，其余文字原样保留
+def test_text_rule_renders_format_spec():
+    rules = [Rule("a", "值", "文字", r"\W0.7;宽{width:.1f}-{double(width):05.1f}件，{name}", 2)]
+    rule_set = RuleSet("规则.csv", rules, ("width", "name"), {"double": lambda value: value * 2})
+    assert rule_set.evaluate({"width": 12.5, "name": "芯板"}) == (r"\W0.7;宽12.5-025.0件，芯板",)
+
+
+# 规则文件生成的单元格与原来手写的 update_data1/2/3 完全相同
+def test_brb_rules_match_legacy_update_functions():
+    with open(LEGACY_CELLS, "r", encoding="utf-8") as f:
+        legacy = json.load(f)
+    assert sorted(legacy) == sorted(brb_drawing.template_configs)
+    for name, cases in legacy.items():
+        config = brb_drawing.template_configs[name]
+        rules = brb_drawing.load_template_rules(config)
+        for case in cases:
+            overlay = TemplateOverlay(load_template(config["csv_file"]))
+            rules.apply(overlay, brb_drawing.rule_variables(case["params"]), brb_drawing.format_number)
+            anchors = {line + 1: anchor for anchor, line in overlay.base.anchors.items()}
+            assert {anchors[line]: cells for line, cells in overlay.changes.items()} == case["cells"], name
@@ -0,0 +1,36 @@
+import os
+import sys
+
+import pytest
+
+# 各模块之间使用顶层导入，测试时需要将 design 目录加入Python路径
+design_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if design_dir not in sys.path:
+    sys.path.insert(0, design_dir)
+
+import vfd_drawing
+from update_rules import RuleError
+
+
+# 型号表中的拉伸窗口表可以读取，位移按尺寸变化计算；型号表中的模板都通过检查
+def test_model_stretch_windows():
+    model = vfd_drawing.find_vfd_model(140, 50)
+    windows, displacements = vfd_drawing.load_stretch_windows(model["拉伸窗口"])
+    variables = {"δpiston_width": 20, "δdt1": 60, "δdt2": 30, "δdt3": 30, "δdt4": -15, "δdt5": 75}
+    moves = dict(zip((rule.anchor for rule in displacements.rules), displacements.evaluate(variables)))
+    assert moves["活塞轮廓右"] == 10
+    assert moves["前盖+前吊耳"] == -40
+    assert ("防尘罩_1", (-200, -100, -100, 100)) in windows
+    assert all(not problems for problems in vfd_drawing.check_anchors().values())
+
+
+# 拉伸窗口表中的无效表达式和坐标在读取时报告所在行
+@pytest.mark.parametrize("row, message", [
+    ("活塞,,-140,-100,-20,100,δpiston_width + width,", "第 2 行"),
+    ("活塞,,-140,-100,左,100,δpiston_width,", "第 2 行的窗口坐标无效"),
+])
+def test_invalid_stretch_windows(tmp_path, row, message):
+    stretch_file = tmp_path / "拉伸窗口.csv"
+    stretch_file.write_text("名称,块名,X最小,Y最小,X最大,Y最大,X位移,说明\n" + row + "\n", encoding="utf-8")
+    with pytest.raises(RuleError, match=message):
+        vfd_drawing.load_stretch_windows(str(stretch_file))
@@ -0,0 +1,428 @@
+import math
+
+import numpy as np
+
+import diagnostics
+from csv_template import PARSERS
+
+
+# 图形变换：对CSV实体表（首行为表头的行列表，或模板覆盖层）中模型空间的实体整体平移、缩放、旋转和镜像
+# 所有坐标列和顶点数据先读入 NumPy 数组，按组合后的变换矩阵一次计算，再写回表格
+# 块定义中的实体使用块内坐标，不做变换，由块引用的插入点、角度和比例带动
+# 目前由 vfd_drawing.offset 整体平移结构图和前吊耳图；BRB 模板只按数据更新规则修改单元格，不整体变换
+
+# 写回表格的小数位数
+PRECISION = 6
+
+# 坐标点列：(X 列, Y 列)
+POINT_COLUMNS = [("位置 X", "位置 Y"), ("起点 X", "起点 Y"), ("终点 X", "终点 Y"), ("圆心 X", "圆心 Y")]
+
+# "角度" 列为方向角的实体类型
+DIRECTION_TYPES = {"TEXT", "MTEXT", "INSERT", "DIMENSION"}
+
+# 随缩放比例变化的长度列：实体类型 -> 列名
+LENGTH_COLUMNS = {
+    "CIRCLE": ["半径"],
+    "ARC": ["半径"],
+    "TEXT": ["高度"],
+    "MTEXT": ["高度"],
+    "HATCH": ["缩放比例"],
+}
+
+
+# 仿射变换，矩阵为 3x3 齐次坐标矩阵；各方法返回新的变换，先调用的先执行
+# 只支持平移、等比缩放、旋转和镜像，圆、圆弧和文字变换后形状不变
+class Transform:
+    def __init__(self, matrix=None):
+        self.matrix = np.identity(3) if matrix is None else np.array(matrix, dtype=float)
+
+    # 在当前变换之后执行 matrix
+    def then(self, matrix):
+        return Transform(np.asarray(matrix, dtype=float) @ self.matrix)
+
+    def translate(self, dx, dy):
+        return self.then([[1, 0, float(dx)], [0, 1, float(dy)], [0, 0, 1]])
+
+    # 以 center 为中心等比缩放
+    def scale(self, factor, center=(0, 0)):
+        factor = float(factor)
+        if factor <= 0:
+            raise ValueError(f"缩放比例必须大于0: {factor}")
+        cx, cy = center
+        return self.then([[factor, 0, cx - factor * cx], [0, factor, cy - factor * cy], [0, 0, 1]])
+
+    # 以 center 为中心逆时针旋转 angle 度
+    def rotate(self, angle, center=(0, 0)):
+        radians = math.radians(float(angle))
+        cos, sin = math.cos(radians), math.sin(radians)
+        cx, cy = center
+        return self.then([[cos, -sin, cx - cos * cx + sin * cy], [sin, cos, cy - sin * cx - cos * cy], [0, 0, 1]])
+
+    # 以过 point、方向角为 angle 度的直线为轴镜像；angle 为 0 时上下翻转，为 90 时左右翻转
+    def mirror(self, angle=0, point=(0, 0)):
+        radians = math.radians(2 * float(angle))
+        cos, sin = math.cos(radians), math.sin(radians)
+        px, py = point
+        return self.then([[cos, sin, px - cos * px - sin * py], [sin, -cos, py - sin * px + cos * py], [0, 0, 1]])
+
+    # 线性部分 (2x2)
+    @property
+    def linear(self):
+        return self.matrix[:2, :2]
+
+    # 长度的缩放比例
+    @property
+    def scale_factor(self):
+        return math.sqrt(abs(np.linalg.det(self.linear)))
+
+    # 是否包含镜像（改变图形的方向）
+    @property
+    def mirrored(self):
+        return np.linalg.det(self.linear) < 0
+
+    # 是否只有平移，角度和长度不变
+    @property
+    def is_translation(self):
+        return np.allclose(self.linear, np.identity(2))
+
+    # 变换坐标点，points 为 (N, 2) 数组
+    def points(self, points):
+        return points @ self.linear.T + self.matrix[:2, 2]
+
+    # 变换方向角（度），返回 [0, 360) 内的角度
+    def angles(self, angles):
+        radians = np.radians(angles)
+        directions = np.stack([np.cos(radians), np.sin(radians)], axis=-1) @ self.linear.T
+        return np.degrees(np.arctan2(directions[:, 1], directions[:, 0])) % 360
+
+
+# 数值写回表格前舍去计算误差；单元格写回浮点数，绘制时按文本处理（与 compile_table 一致）
+def rounded(values):
+    return (np.round(values, PRECISION) + 0.0).tolist()
+
+
+# 顶点数据等组合字段中的数值文本，去除多余的零和小数点
+def format_value(value):
+    text = f"{value:.{PRECISION}f}".rstrip("0").rstrip(".")
+    return "0" if text == "-0" else text
+
+
+# 模型空间实体及块引用（与 index_rows 的分组规则相同），只包含可绘制的实体类型，返回 [(行号, 行)]
+def model_rows(table, col):
+    type_index = col["实体类型"]
+    block_index = col.get("块名")
+    records = []
+    for i in range(1, len(table)):
+        row = table[i]
+        entity_type = row[type_index]
+        if entity_type not in PARSERS:
+            continue
+        block_ref = row[block_index] if block_index is not None else ""
+        if not block_ref or (entity_type == "INSERT" and block_ref.startswith("块名: ")):
+            records.append((i, row))
+    return records
+
+
+# 块定义中的实体行，返回 [(行号, 行)]
+def block_rows(table, col, block):
+    type_index = col["实体类型"]
+    block_index = col["块名"]
+    block_ref = f"引用于: {block}"
+    return [(i, row) for i, row in ((i, table[i]) for i in range(1, len(table)))
+            if row[block_index] == block_ref and row[type_index] in PARSERS]
+
+
+# 读取一组行中某一列的数值，空单元格为 default（为 None 时空单元格按无效数据处理）
+# 整列一次转换为数组；有无效数据时逐个检查，无效的单元格记录警告并以 NaN 表示，写回时跳过
+def read_numbers(records, column, col, types, source, default=np.nan):
+    j = col[column]
+    texts = [default if row[j] == "" else row[j] for _, row in records]
+    try:
+        return np.array(texts, dtype=float)
+    except (ValueError, TypeError):
+        pass
+    values = []
+    for (i, row), text in zip(records, texts):
+        try:
+            values.append(float(text))
+        except (ValueError, TypeError):
+            diagnostics.record(f"第 {i + 1} 行的 {types[i]} 实体 {column} 字段包含无效数据 {row[j]!r}，将不做变换。",
+                               source, i + 1, types[i], column)
+            values.append(np.nan)
+    return np.array(values, dtype=float)
+
+
+# 将数组写回一组行中的某一列，NaN 对应的无效单元格保持原值
+def write_numbers(records, column, values, col):
+    j = col[column]
+    for (_, row), value in zip(records, rounded(values)):
+        if value == value:
+            row[j] = value
+
+
+# 对表格中模型空间的实体应用变换，直接修改 table 并返回；rows 为需要变换的行号，缺省为全部模型空间实体
+def apply(table, transform, rows=None, source=""):
+    col = {name: j for j, name in enumerate(table[0])}
+    records = model_rows(table, col) if rows is None else [(i, table[i]) for i in rows]
+    types = {i: row[col["实体类型"]] for i, row in records}
+    scale = transform.scale_factor
+    mirrored = transform.mirrored
+
+    # 坐标点：所有行的所有坐标列合并为一个数组，一次变换
+    groups = []
+    for x_column, y_column in POINT_COLUMNS:
+        if x_column in col and y_column in col:
+            x_index, y_index = col[x_column], col[y_column]
+            group = [(i, row) for i, row in records if row[x_index] != "" and row[y_index] != ""]
+            if group:
+                groups.append((x_column, y_column, group))
+    if groups:
+        points = np.concatenate([
+            np.column_stack([read_numbers(group, x_column, col, types, source),
+                             read_numbers(group, y_column, col, types, source)])
+            for x_column, y_column, group in groups
+        ])
+        points = transform.points(points)
+        # x 或 y 无效的坐标点整体保持原值
+        points[np.isnan(points).any(axis=1)] = np.nan
+        start = 0
+        for x_column, y_column, group in groups:
+            end = start + len(group)
+            write_numbers(group, x_column, points[start:end, 0], col)
+            write_numbers(group, y_column, points[start:end, 1], col)
+            start = end
+
+    # 多段线和剖面线的顶点数据：所有顶点一次变换
+    if "顶点数据" in col:
+        transform_vertices(transform, [(i, row) for i, row in records if types[i] in ("LWPOLYLINE", "HATCH")],
+                           col, types, source)
+
+    # 长度：半径、文字高度和剖面线图案比例
+    if not math.isclose(scale, 1):
+        for entity_type, columns in LENGTH_COLUMNS.items():
+            for column in columns:
+                if column in col:
+                    group = [(i, row) for i, row in records if types[i] == entity_type and row[col[column]] != ""]
+                    write_numbers(group, column, read_numbers(group, column, col, types, source) * scale, col)
+        # 半径和直径尺寸的值决定标注的圆，缩放后显示的文字仍为原尺寸
+        if "值" in col and "覆盖值" in col and "类型/名称" in col:
+            group = [(i, row) for i, row in records
+                     if types[i] == "DIMENSION" and row[col["类型/名称"]] in ("RADIUS", "DIAMETER")]
+            for _, row in group:
+                if row[col["覆盖值"]] == "":
+                    row[col["覆盖值"]] = row[col["值"]]
+            write_numbers(group, "值", read_numbers(group, "值", col, types, source) * scale, col)
+    # 块引用的比例随缩放和镜像变化
+    if not math.isclose(scale, 1) or mirrored:
+        transform_insert_scales(scale, mirrored, [(i, row) for i, row in records if types[i] == "INSERT"], col, source)
+
+    # 方向角：文字、块引用和尺寸标注的角度以及圆弧的起止角度，空单元格按0度处理
+    if not transform.is_translation:
+        angle_columns = [("角度", [(i, row) for i, row in records if types[i] in DIRECTION_TYPES])]
+        arcs = [(i, row) for i, row in records if types[i] == "ARC"]
+        angle_columns += [("起始角度", arcs), ("终止角度", arcs)]
+        for column, group in angle_columns:
+            if column not in col or not group:
+                continue
+            angles = transform.angles(read_numbers(group, column, col, types, source, default=0.0))
+            # 镜像后的文字转过180度，保持从左向右阅读
+            if mirrored:
+                angles += [180 if types[i] in ("TEXT", "MTEXT") else 0 for i, _ in group]
+            write_numbers(group, column, np.round(angles, PRECISION) % 360, col)
+
+    # 镜像后图形方向相反：圆弧交换起止角度，角度尺寸交换两条边
+    if mirrored:
+        for i, row in records:
+            if types[i] == "ARC":
+                swap_columns(row, col, "起始角度", "终止角度")
+            elif types[i] == "DIMENSION" and "类型/名称" in col and row[col["类型/名称"]] == "ANGULAR":
+                swap_columns(row, col, "起点 X", "终点 X")
+                swap_columns(row, col, "起点 Y", "终点 Y")
+    return table
+
+
+# 交换同一行的两个单元格
+def swap_columns(row, col, first, second):
+    if first in col and second in col:
+        row[col[first]], row[col[second]] = row[col[second]], row[col[first]]
+
+
+# 读取多段线和剖面线的顶点数据，返回 [(行号, 行, 顶点列表)]，每个顶点为数值列表
+# 多段线顶点为 (x, y, 起始宽度, 终止宽度, 凸度)，剖面线边界顶点为 (x, y) 或 (x, y, 凸度)；无效的行记录警告并跳过
+def read_vertices(records, col, types, source):
+    parsed = []
+    for i, row in records:
+        text = row[col["顶点数据"]]
+        if not text:
+            continue
+        try:
+            vertices = [[float(value) for value in vertex.strip("()").split(", ")] for vertex in text.split("; ")]
+            if any(len(vertex) < 2 for vertex in vertices):
+                raise ValueError
+        except ValueError:
+            diagnostics.record(f"第 {i + 1} 行的 {types[i]} 实体顶点数据包含无效数据，将不做变换。",
+                               source, i + 1, types[i], "顶点数据")
+            continue
+        parsed.append((i, row, vertices))
+    return parsed
+
+
+# 顶点列表写回顶点数据的文本
+def format_vertices(vertices):
+    return "; ".join("(" + ", ".join(format_value(value) for value in vertex) + ")" for vertex in vertices)
+
+
+# 变换顶点数据，宽度随缩放比例变化，镜像后多段线方向相反，凸度取反
+def transform_vertices(transform, records, col, types, source):
+    scale = transform.scale_factor
+    bulge_sign = -1 if transform.mirrored else 1
+    parsed = read_vertices(records, col, types, source)
+    if not parsed:
+        return
+    points = rounded(transform.points(np.array([vertex[:2] for _, _, vertices in parsed for vertex in vertices])))
+    k = 0
+    for i, row, vertices in parsed:
+        for vertex in vertices:
+            if types[i] == "LWPOLYLINE" and len(vertex) == 5:
+                vertex[2:] = [vertex[2] * scale, vertex[3] * scale, vertex[4] * bulge_sign]
+            elif len(vertex) > 2:
+                vertex[2:] = [value * bulge_sign for value in vertex[2:]]
+            vertex[:2] = points[k]
+            k += 1
+        row[col["顶点数据"]] = format_vertices(vertices)
+
+
+# 块引用的缩放比例，格式为 "比例" 或 "X比例;Y比例"；镜像时Y比例取反
+def transform_insert_scales(scale, mirrored, records, col, source):
+    if "缩放比例" not in col:
+        return
+    for i, row in records:
+        text = row[col["缩放比例"]]
+        parts = text.split(";") if text else ["1"]
+        try:
+            xscale = float(parts[0])
+            yscale = float(parts[1]) if len(parts) > 1 else xscale
+        except ValueError:
+            diagnostics.record(f"第 {i + 1} 行的 INSERT 实体缩放比例 {text!r} 无效，将不做变换。",
+                               source, i + 1, "INSERT", "缩放比例")
+            continue
+        xscale, yscale = (format_value(value) for value in (xscale * scale, yscale * scale * (-1 if mirrored else 1)))
+        row[col["缩放比例"]] = xscale if xscale == yscale else f"{xscale};{yscale}"
+
+
+# 坐标修改计划：收集对单元格的增量修改 (行号, 列名, 增量)，最后按列一次读入数组、累加增量并写回
+# 同一单元格的多次修改合并为一次，修改的单元格必须为数值，无效时记录警告并保持原值
+class EditPlan:
+    def __init__(self):
+        self.edits = {}  # 列名 -> ([行号], [增量])
+
+    def __len__(self):
+        return sum(len(lines) for lines, _ in self.edits.values())
+
+    def add(self, line, column, delta):
+        lines, deltas = self.edits.setdefault(column, ([], []))
+        lines.append(line)
+        deltas.append(float(delta))
+
+    # 将所有修改应用到表格，直接修改 table 并返回；行号超出范围时抛出 IndexError，列不存在时抛出 KeyError
+    def apply(self, table, source=""):
+        col = {name: j for j, name in enumerate(table[0])}
+        for column, (lines, deltas) in self.edits.items():
+            if column not in col:
+                raise KeyError(column)
+            lines, inverse = np.unique(lines, return_inverse=True)
+            totals = np.bincount(inverse, weights=deltas)
+            records = [(i, table[i]) for i in lines.tolist()]
+            types = {i: row[col["实体类型"]] for i, row in records}
+            write_numbers(records, column, read_numbers(records, column, col, types, source, None) + totals, col)
+        return table
+
+
+# 空间索引：将模型空间（或指定块内）实体的坐标点按 X 坐标排序，用于按窗口拉伸图形（与CAD的 STRETCH 命令相同）
+# 坐标点包括各坐标列以及多段线、剖面线的每个顶点；窗口内的坐标点移动，图形的点全部在窗口内时整体移动，跨越窗口时被拉伸
+# 窗口始终按建立索引时的位置选择，多次拉伸的位移累加，结果与执行顺序无关；最后由 write 一次写回表格
+# 拉伸窗口通常是跨越整个图形高度的竖条，按 X 坐标二分查找即可排除窗口以外的绝大部分坐标点
+class SpatialIndex:
+    def __init__(self, table, block=None, source=""):
+        self.table = table
+        self.source = source
+        self.col = {name: j for j, name in enumerate(table[0])}
+        records = model_rows(table, self.col) if block is None else block_rows(table, self.col, block)
+        types = {i: row[self.col["实体类型"]] for i, row in records}
+
+        # 坐标点对应的单元格：(行号, X 列, Y 列)，顶点为 (行号, None, 顶点序号)
+        self.refs = []
+        coordinates = []
+        for x_column, y_column in POINT_COLUMNS:
+            if x_column not in self.col or y_column not in self.col:
+                continue
+            x_index, y_index = self.col[x_column], self.col[y_column]
+            group = [(i, row) for i, row in records if row[x_index] != "" and row[y_index] != ""]
+            if not group:
+                continue
+            points = np.column_stack([read_numbers(group, x_column, self.col, types, source),
+                                      read_numbers(group, y_column, self.col, types, source)])
+            valid = ~np.isnan(points).any(axis=1)
+            self.refs += [(i, x_column, y_column) for (i, _), ok in zip(group, valid.tolist()) if ok]
+            coordinates.append(points[valid])
+        # 顶点数据：行号 -> (行, 顶点列表)
+        self.vertices = {}
+        if "顶点数据" in self.col:
+            for i, row, vertices in read_vertices([(i, row) for i, row in records
+                                                   if types[i] in ("LWPOLYLINE", "HATCH")], self.col, types, source):
+                self.vertices[i] = (row, vertices)
+                self.refs += [(i, None, k) for k in range(len(vertices))]
+                coordinates.append(np.array([vertex[:2] for vertex in vertices]))
+
+        self.points = np.concatenate(coordinates) if coordinates else np.empty((0, 2))
+        self.offsets = np.zeros_like(self.points)
+        self.sort()
+
+    def __len__(self):
+        return len(self.points)
+
+    # 按 X 坐标排序坐标点序号
+    def sort(self):
+        self.order = np.argsort(self.points[:, 0], kind="stable")
+        self.xs = self.points[self.order, 0]
+
+    # 窗口内（含边界）坐标点的序号，按 X 坐标二分查找窗口的 X 范围，只检查其中坐标点的 Y 坐标
+    def query(self, xmin, ymin, xmax, ymax):
+        start = np.searchsorted(self.xs, xmin, side="left")
+        end = np.searchsorted(self.xs, xmax, side="right")
+        ids = self.order[start:end]
+        ys = self.points[ids, 1]
+        return ids[(ys >= ymin) & (ys <= ymax)]
+
+    # 拉伸：窗口内的坐标点移动 (dx, dy)，返回移动的坐标点数量
+    def stretch(self, xmin, ymin, xmax, ymax, dx, dy=0):
+        ids = self.query(xmin, ymin, xmax, ymax)
+        self.offsets[ids] += (float(dx), float(dy))
+        return len(ids)
+
+    # 将移动过的坐标点写回表格，返回修改的坐标点数量
+    # 坐标列的位移汇总为一个 EditPlan 按列一次写回，顶点数据按行重新生成
+    def write(self):
+        moved = np.flatnonzero(self.offsets.any(axis=1))
+        points = rounded(self.points[moved] + self.offsets[moved])
+        plan = EditPlan()
+        changed_vertices = set()
+        for k, (x, y), (dx, dy) in zip(moved.tolist(), points, self.offsets[moved].tolist()):
+            i, x_column, y_column = self.refs[k]
+            if x_column is None:
+                self.vertices[i][1][y_column][:2] = [x, y]
+                changed_vertices.add(i)
+                continue
+            if dx:
+                plan.add(i, x_column, dx)
+            if dy:
+                plan.add(i, y_column, dy)
+        plan.apply(self.table, self.source)
+        for i in changed_vertices:
+            row, vertices = self.vertices[i]
+            row[self.col["顶点数据"]] = format_vertices(vertices)
+        # 写回后以新的位置为起点
+        self.points[moved] += self.offsets[moved]
+        self.offsets[:] = 0
+        self.sort()
+        return len(moved)
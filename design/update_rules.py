@@ -0,0 +1,170 @@
+import ast
+import csv
+import logging
+import os
+
+from csv_template import verify_anchors
+
+
+# 数据更新规则：模板的每个参数修改写成规则文件中的一行 (锚点, 列, 类型, 表达式)，新增模板只需添加模板和规则文件
+# 规则文件中的全部表达式编译为一个代码对象，生成图纸时只需执行一次即可得到所有单元格的值
+
+# 规则文件名后缀："<模板>.csv" 的规则文件为 "<模板>-规则.csv"
+RULES_SUFFIX = "-规则.csv"
+
+# 规则类型：数值为算术表达式，结果按数字格式化；文字为文本模板，{表达式} 和 {表达式:格式} 替换为表达式的值
+RULE_TYPES = ("数值", "文字")
+
+# 表达式中允许的语法，其他语法（属性访问、下标、乘方、推导式等）在编译时拒绝
+ALLOWED_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.BoolOp, ast.Compare, ast.IfExp, ast.Call, ast.Name, ast.Load,
+    ast.Constant, ast.JoinedStr, ast.FormattedValue,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.UAdd, ast.USub, ast.Not, ast.And, ast.Or,
+    ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE,
+)
+
+# 表达式中始终可以使用的函数
+BUILTIN_FUNCTIONS = {"min": min, "max": max, "abs": abs, "round": round}
+
+# 内存缓存：规则文件绝对路径 -> (修改时间, 文件大小, 编译后的规则)
+_memory_cache = {}
+
+
+# 规则文件中的规则无效时抛出的异常
+class RuleError(ValueError):
+    pass
+
+
+# 单条规则
+class Rule:
+    def __init__(self, anchor, column, rule_type, text, line_num):
+        self.anchor = anchor
+        self.column = column
+        self.rule_type = rule_type
+        self.text = text
+        self.line_num = line_num
+        self.node = None  # 编译后的表达式语法树
+
+
+# 解析并检查一条规则的表达式，返回表达式的语法树；names 为可以使用的变量和函数名称
+def parse_expression(rule, names, source):
+    try:
+        if rule.rule_type == "文字":
+            # 文本模板按 f-string 解析，字面文字原样保留
+            tree = ast.parse("f" + repr(rule.text), mode="eval")
+        else:
+            tree = ast.parse(rule.text.strip(), mode="eval")
+    except SyntaxError as e:
+        raise RuleError(f"规则文件 {source} 第 {rule.line_num} 行的表达式 {rule.text} 有语法错误: {e.msg}")
+    for node in ast.walk(tree):
+        if not isinstance(node, ALLOWED_NODES):
+            raise RuleError(f"规则文件 {source} 第 {rule.line_num} 行的表达式 {rule.text} "
+                            f"使用了不支持的写法 {type(node).__name__}")
+        if isinstance(node, ast.Constant) and not isinstance(node.value, (int, float, str)):
+            raise RuleError(f"规则文件 {source} 第 {rule.line_num} 行的表达式 {rule.text} 包含不支持的常量 {node.value!r}")
+        if isinstance(node, ast.Name) and node.id not in names:
+            raise RuleError(f"规则文件 {source} 第 {rule.line_num} 行的表达式 {rule.text} 中的名称 {node.id} 未定义")
+        if isinstance(node, ast.Call) and (node.keywords or not isinstance(node.func, ast.Name)):
+            raise RuleError(f"规则文件 {source} 第 {rule.line_num} 行的表达式 {rule.text} 只能按位置调用函数")
+    return tree.body
+
+
+# 编译后的规则集：全部表达式组成一个元组表达式并编译为一个代码对象
+class RuleSet:
+    def __init__(self, source, rules, variables, functions):
+        self.source = source
+        self.rules = rules
+        self.functions = dict(BUILTIN_FUNCTIONS, **functions)
+        names = set(variables) | set(self.functions)
+        for rule in rules:
+            rule.node = parse_expression(rule, names, source)
+        tree = ast.Expression(ast.Tuple([rule.node for rule in rules], ast.Load()))
+        self.code = compile(ast.fix_missing_locations(tree), source, "eval")
+        self._targets = (None, None)  # (模板, [(行号, 列名)])，同一模板重复使用时不再查找锚点
+
+    # 规则使用的锚点，保持规则顺序
+    @property
+    def anchors(self):
+        return list(dict.fromkeys(rule.anchor for rule in self.rules))
+
+    # 检查模板中是否能找到全部锚点和列，返回问题说明
+    def verify(self, template):
+        problems = verify_anchors(template.anchors, self.anchors, source=template.source)
+        problems += [f"规则文件 {self.source} 第 {rule.line_num} 行的列 {rule.column} 在模板 {template.source} 中不存在"
+                     for rule in self.rules if rule.column not in template.fieldnames]
+        return problems
+
+    # 各规则修改的单元格 (行号, 列名)，行号与 csv.reader 结果的下标一致
+    def targets(self, template):
+        cached_template, targets = self._targets
+        if cached_template is not template:
+            targets = [(template.anchors[rule.anchor] + 1, rule.column) for rule in self.rules]
+            self._targets = (template, targets)
+        return targets
+
+    # 计算全部规则的值，variables 为 {变量名: 值}
+    def evaluate(self, variables):
+        namespace = dict(self.functions, **variables)
+        try:
+            return eval(self.code, {"__builtins__": {}}, namespace)
+        except Exception:
+            # 逐条计算，找出出错的规则
+            for rule in self.rules:
+                try:
+                    eval(compile(ast.Expression(rule.node), self.source, "eval"), {"__builtins__": {}}, namespace)
+                except Exception as e:
+                    raise RuleError(f"规则文件 {self.source} 第 {rule.line_num} 行的表达式 {rule.text} 计算出错: "
+                                    f"{type(e).__name__}: {str(e)}") from e
+            raise
+
+    # 将规则的值写入模板覆盖层，数值用 format_number 格式化；调用前应先用 verify 检查模板
+    def apply(self, overlay, variables, format_number=str):
+        values = self.evaluate(variables)
+        for (line_num, column), value in zip(self.targets(overlay.base), values):
+            overlay.set(line_num, column, value if isinstance(value, str) else format_number(value))
+        return overlay
+
+
+# 读取规则文件，返回规则列表
+def read_rules(rules_file):
+    rules = []
+    with open(rules_file, 'r', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        missing = [name for name in ("锚点", "列", "类型", "表达式") if name not in (reader.fieldnames or [])]
+        if missing:
+            raise RuleError(f"规则文件 {rules_file} 缺少列: {', '.join(missing)}")
+        for line_num, row in enumerate(reader, start=2):
+            if not row["锚点"]:
+                continue
+            if row["类型"] not in RULE_TYPES:
+                raise RuleError(f"规则文件 {rules_file} 第 {line_num} 行的类型 {row['类型']} 无效，可选 {'、'.join(RULE_TYPES)}")
+            rules.append(Rule(row["锚点"], row["列"], row["类型"], row["表达式"], line_num))
+    return rules
+
+
+# 加载并编译规则文件，文件未变化时返回缓存的编译结果
+def load_rules(rules_file, variables, functions):
+    path = os.path.abspath(rules_file)
+    stat = os.stat(path)
+    cached = _memory_cache.get(path)
+    if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+    rule_set = RuleSet(rules_file, read_rules(path), variables, functions)
+    _memory_cache[path] = (stat.st_mtime_ns, stat.st_size, rule_set)
+    logging.info(f"已编译规则文件 {rules_file}，共 {len(rule_set.rules)} 条规则")
+    return rule_set
+
+
+# 查找目录中的模板：每个规则文件与同名的模板CSV组成一个模板类型，返回 {模板类型: {"csv_file", "rules_file"}}
+def discover_templates(template_dir):
+    templates = {}
+    for filename in sorted(os.listdir(template_dir)):
+        if not filename.endswith(RULES_SUFFIX):
+            continue
+        name = filename[:-len(RULES_SUFFIX)]
+        csv_file = os.path.join(template_dir, f"{name}.csv")
+        if not os.path.exists(csv_file):
+            logging.warning(f"规则文件 {filename} 没有对应的模板 {name}.csv，已忽略")
+            continue
+        templates[name] = {"csv_file": csv_file, "rules_file": os.path.join(template_dir, filename)}
+    return templates
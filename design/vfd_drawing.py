@@ -3,8 +3,47 @@ import tkinter as tk
 from tkinter import messagebox
 import logging
 import os
-from csv_to_dxf import csv_to_dxf
-from csv_to_dxf import csv_add_dxf
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import csv_to_dxf
+import diagnostics
+import dxf_output
+import output_cache
+import transform
+from csv_to_dxf import rows_to_dxf
+from csv_template import compile_table, table_anchors, verify_anchors, AnchorError
+from update_rules import Rule, RuleSet, RuleError
+
+
+# 是否弹出对话框，无界面生成和并行生成的子进程中设为 False，错误只写入日志和结果
+show_dialogs = True
+
+# 产品结构图中按参数修改的锚点
+DESIGN_ANCHORS = ('标题.项目名称', '标题.产品型号', '标题.数量')
+
+# 数据文件所在目录，与工作目录无关
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# VFD型号表
+MODEL_TABLE = os.path.join(DATA_DIR, 'data', 'vfd', 'VFD-型号表.csv')
+
+# 型号表中的模板路径列，读取时转换为本机的绝对路径
+MODEL_PATH_COLUMNS = ('产品结构图数据', '前吊耳', '后吊耳', '拉伸窗口')
+
+# 型号表中的模板基准尺寸列，读取时转换为整数
+MODEL_OFFSET_COLUMNS = ('ex_dt1', 'ex_dt2', 'ex_dt3', 'ex_dt4', 'ex_dt5', 'ex_piston_width')
+
+# 拉伸窗口表的列：窗口为模板中的原始坐标，块名为空时作用于模型空间，否则作用于该块内的图形（块内坐标）
+STRETCH_COLUMNS = ('名称', '块名', 'X最小', 'Y最小', 'X最大', 'Y最大', 'X位移')
+
+# 拉伸窗口表中X位移表达式可以使用的变量：各尺寸相对模板基准尺寸（型号表中的 ex_ 列）的变化
+STRETCH_VARIABLES = ('δpiston_width', 'δdt1', 'δdt2', 'δdt3', 'δdt4', 'δdt5')
+
+# 型号表缓存：(修改时间, 文件大小, {(缸径, 轴径): 型号数据})，型号表变化后重新读取
+_model_cache = None
+
+# 模板缓存：(模板绝对路径, 用途) -> (修改时间, 文件大小, 数据)，批量生成时各数据行共用，模板变化后重新读取
+_template_cache = {}
 
 
 # 数字格式化，去除末尾0
@@ -13,214 +52,43 @@ def format_number(num):
     return formatted
 
 
-# 结构图 移动
-def x_move(line, x, csv_data_vfd_design):
-    # 获取列名
-    header = csv_data_vfd_design[0]
-    # 生成列名和索引的映射字典
-    column_index_map = {col_name: header.index(col_name) for col_name in header}
-
-    if csv_data_vfd_design[line][column_index_map['起点 X']]:  # 如果有起点 x
-        start_x = float(csv_data_vfd_design[line][column_index_map['起点 X']])
-        end_x = float(csv_data_vfd_design[line][column_index_map['终点 X']])
-        # 先计算新值，再格式化
-        new_start_x = start_x + x
-        new_end_x = end_x + x
-        csv_data_vfd_design[line][column_index_map['起点 X']] = format_number(new_start_x)
-        csv_data_vfd_design[line][column_index_map['终点 X']] = format_number(new_end_x)
-    if csv_data_vfd_design[line][column_index_map['圆心 X']]:  # 如果没有起点 x，但有圆心 x
-        circle_x = float(csv_data_vfd_design[line][column_index_map['圆心 X']])
-        new_circle_x = circle_x + x
-        csv_data_vfd_design[line][column_index_map['圆心 X']] = format_number(new_circle_x)
-    if csv_data_vfd_design[line][column_index_map['类型/名称']] == 'LINEAR':
-        location_x = float(csv_data_vfd_design[line][column_index_map['位置 X']])
-        new_location_x = location_x + x
-        csv_data_vfd_design[line][column_index_map['位置 X']] = format_number(new_location_x)
-    if csv_data_vfd_design[line][column_index_map['实体类型']] == 'INSERT':
-        location_x = float(csv_data_vfd_design[line][column_index_map['位置 X']])
-        new_location_x = location_x + x
-        csv_data_vfd_design[line][column_index_map['位置 X']] = format_number(new_location_x)
-
-
-# 结构图 延长
-def x_extend(line, point, x, csv_data_vfd_design):
-    # 获取列名
-    header = csv_data_vfd_design[0]
-    # 生成列名和索引的映射字典
-    column_index_map = {col_name: header.index(col_name) for col_name in header}
-
-    point_x = float(csv_data_vfd_design[line][column_index_map[point]])
-    new_point_x = point_x + x
-    csv_data_vfd_design[line][column_index_map[point]] = format_number(new_point_x)
-
 # 结构图数据并绘制
-def draw_vfd_design(csv_vfd_design, output_dxf_file, project_name, force, design_displacement, quantity, δpiston_width,
-                                                 δdt1, δdt2, δdt3, δdt4, δdt5, offset_x, offset_y):
+def draw_vfd_design(csv_vfd_design, stretch_file, output_dxf_file, project_name, force, design_displacement, quantity, δpiston_width,
+                                                 δdt1, δdt2, δdt3, δdt4, δdt5, offset_x, offset_y, dimensions=None):
     try:
-        # 读取产品图数据
-        with open(csv_vfd_design, 'r', encoding='utf-8') as vfd_design:
-            csv_reader = csv.reader(vfd_design)
-            csv_data_vfd_design = list(csv_reader)
-        # 以活塞中心为原点
-
-        # 活塞轮廓移动距离
-        x1 = δpiston_width / 2
-        # 前盖移动距离  -（活塞/2 + 前腔变化）
-        x2 = -(δpiston_width / 2 + δdt2)
-        # 前吊耳移动距离  -（活塞/2 + 前腔变化 + 前吊耳距离变化）
-        x3 = -(δpiston_width / 2 + δdt2 + δdt1)
-        # 导向套处+后缸筒 移动距离  活塞/2 + 后腔变化
-        x4 = δpiston_width / 2 + δdt3
-        # 轴后端移动距离  活塞/2 + 后腔变化 + 轴后端变化
-        x5 = δpiston_width / 2 + δdt3 + δdt4
-        # 后盖+后吊耳 移动距离  活塞/2 + 后腔变化 + 轴后端变化 + 轴到后吊耳距离
-        x6 = δpiston_width / 2 + δdt3 + δdt4 + δdt5
-
-
-        # 移动
-    # 活塞轮廓移动距离
-        for i in [19, 20, 91, 92]:
-            x_move(i, -x1, csv_data_vfd_design)
-        for i in [21, 22, 101]:
-            x_move(i, x1, csv_data_vfd_design)
-
-        for i in [23, 24, 25, 26, 27, 28, 29, 30,  # 直线
-            90,  # 尺寸
-            183]:
-            x_move(i, x2, csv_data_vfd_design)
-
-        for i in [
-            31, 32, 33, 34, 35, 36, 37, 38, 39, 40, 41, 42, 43, 44,  # 直线
-            84,  # 中心线
-            86, 88, 89,   # 尺寸
-            102, 108,
-        ]:
-            x_move(i, x3, csv_data_vfd_design)
-
-        for i in [
-            45, 46, 47, 48, 49, 50, 51, 52, 53, 54  # 直线
-        ]:
-            x_move(i, x4, csv_data_vfd_design)  # 线条移动
-
-        for i in [
-            55, 56, 57, 58   # 直线
-        ]:
-            x_move(i, x5, csv_data_vfd_design)
-
-        for i in [
-            59, 60, 61, 62, 63, 64, 65, 66, 67, 68,   # 直线
-            85,  # 中心线
-            87, 93,   # 尺寸
-            114, 120
-            ]:
-            x_move(i, x6, csv_data_vfd_design)
-
-        for i in [192, 193, 194, 195, 196]:
-            x_move(i, -δdt1  , csv_data_vfd_design)
-
-
-        END_POINTS = [
-            81, 82,
-            94,
-        ]
-        START_POINTS = [
-             69, 70, 71, 72, 73, 74,   # 直线
-             95,
-        ]
-        all_points = END_POINTS + START_POINTS
-        for j in all_points:  # 直接遍历有效数字，无需连续范围
-            if j in END_POINTS:
-                point = '终点 X'
-            else:
-                point = '起点 X'
-            x_extend(j, point, x2, csv_data_vfd_design) # 端点延伸
-
-        # 延伸
-        END_POINTS = []
-        START_POINTS = [
-            81, 82,
-            83,  # 中心线
-            94, 99, 100  # 尺寸线
-             ]
-        all_points = END_POINTS + START_POINTS
-        for j in all_points:  # 直接遍历有效数字，无需连续范围
-            if j in END_POINTS:
-                point = '终点 X'
-            else:
-                point = '起点 X'
-            x_extend(j, point, x3, csv_data_vfd_design)  # 端点延伸
-
-        END_POINTS = [
-            69, 70, 71, 72, 73, 74,   # 直线
-            95,
-        ]
-        START_POINTS = [
-            75, 76, 77, 78, 79, 80,  # 直线
-            96, 97
-        ]
-        all_points = END_POINTS + START_POINTS
-        for j in all_points:  # 直接遍历有效数字，无需连续范围
-            if j in END_POINTS:
-                point = '终点 X'
-            else:
-                point = '起点 X'
-            x_extend(j, point, x4, csv_data_vfd_design)  # 端点延伸
-
-        END_POINTS = [
-            75, 76,   # 直线
-            97, 99
-        ]
-        START_POINTS = [
-            98,
-        ]
-        all_points = END_POINTS + START_POINTS
-        for j in all_points:  # 直接遍历有效数字，无需连续范围
-            if j in END_POINTS:
-                point = '终点 X'
-            else:
-                point = '起点 X'
-            x_extend(j, point, x5, csv_data_vfd_design)  # 端点延伸
-
-        END_POINTS = [
-            77, 78, 79, 80,   # 直线
-            83,   # 中心线
-            96, 98, 100
-        ]
-        START_POINTS = []
-        all_points = END_POINTS + START_POINTS
-        for j in all_points:  # 直接遍历有效数字，无需连续范围
-            if j in END_POINTS:
-                point = '终点 X'
-            else:
-                point = '起点 X'
-            x_extend(j, point, x6, csv_data_vfd_design)  # 端点延伸
-
-        END_POINTS = []
-        START_POINTS = [188, 189, 190, 191]
-        all_points = END_POINTS + START_POINTS
-        for j in all_points:  # 直接遍历有效数字，无需连续范围
-            if j in END_POINTS:
-                point = '终点 X'
-            else:
-                point = '起点 X'
-            x_extend(j, point, -δdt1, csv_data_vfd_design)  # 端点延伸
-
-
-        # 标题栏更改
-        # 获取列名
-        header = csv_data_vfd_design[0]
+        # 读取产品图数据（缓存数据的副本，修改不影响其他数据行）
+        csv_data_vfd_design = read_design_rows(csv_vfd_design)
         # 生成列名和索引的映射字典
-        column_index_map = {col_name: header.index(col_name) for col_name in header}
+        column_index_map = {col_name: index for index, col_name in enumerate(csv_data_vfd_design[0])}
+        # 锚点名称 -> 行号，锚点缺失时不生成图纸
+        anchors, _ = table_anchors(csv_data_vfd_design)
+        problems = verify_anchors(anchors, DESIGN_ANCHORS, source=csv_vfd_design)
+        if problems:
+            raise AnchorError("；".join(problems))
+        # 按窗口拉伸（与CAD的 STRETCH 命令相同）：窗口内的端点移动，跨越窗口的直线、尺寸被拉长或缩短
+        # 窗口和移动距离由型号的拉伸窗口表给出，窗口按模板中的原始位置选择，嵌套窗口的移动距离累加
+        windows, displacements = load_stretch_windows(stretch_file)
+        moves = displacements.evaluate({'δpiston_width': δpiston_width, 'δdt1': δdt1, 'δdt2': δdt2, 'δdt3': δdt3,
+                                        'δdt4': δdt4, 'δdt5': δdt5})
+        # 模型空间和各块分别建立索引，所有窗口拉伸后一次写回
+        indexes = {}
+        for (block, window), dx in zip(windows, moves):
+            if block not in indexes:
+                indexes[block] = transform.SpatialIndex(csv_data_vfd_design, block=block or None, source=csv_vfd_design)
+            indexes[block].stretch(*window, dx)
+        for index in indexes.values():
+            index.write()
 
-        csv_data_vfd_design[182][column_index_map['值']] = f'\W0.7;\T1.1;{quantity}'
+        # 标题栏更改
+        csv_data_vfd_design[anchors['标题.数量']][column_index_map['值']] = f'\W0.7;\T1.1;{quantity}'
 
-        csv_data_vfd_design[179][column_index_map['值']] = calculate_dynamic_width(
+        csv_data_vfd_design[anchors['标题.项目名称']][column_index_map['值']] = calculate_dynamic_width(
             project_name,
             max_width=160
         )
 
         product_model = f'VFD-{force}-{design_displacement}'
-        csv_data_vfd_design[181][column_index_map['值']] = calculate_dynamic_width(
+        csv_data_vfd_design[anchors['标题.产品型号']][column_index_map['值']] = calculate_dynamic_width(
             product_model,
             max_width=92
         )
@@ -228,46 +96,36 @@ def draw_vfd_design(csv_vfd_design, output_dxf_file, project_name, force, design
         # 结构图数据整体偏移
         csv_data_vfd_design = offset(csv_data_vfd_design, offset_x, offset_y)
 
-        # 调用 csv_to_dxf 函数进行转换，输出 DXF 文件名称为产品型号输入的参数
-        input_file = f'{project_name} VFD-{force}-{design_displacement}.csv'
-        with open(input_file, 'w', newline='', encoding='utf-8') as file:
-            writer = csv.writer(file)
-            writer.writerows(csv_data_vfd_design)
-
-        # 调用 csv_to_dxf，传递文件路径
-        csv_to_dxf(input_file, output_dxf_file)
+        # 直接绘制内存中的数据，output_dxf_file 为空时返回文档供后续图形追加
+        source = f'{project_name} VFD-{force}-{design_displacement}.csv'
+        return rows_to_dxf(csv_data_vfd_design, output_dxf_file, source=source, dimensions=dimensions)
 
 
     except (IndexError, ValueError) as e:
         logging.error(f"修改 CSV 数据时出现错误: {str(e)}")
-        messagebox.showerror("错误", "修改CSV数据时出现错误，请检查数据格式。")
+        if show_dialogs:
+            messagebox.showerror("错误", "修改CSV数据时出现错误，请检查数据格式。")
         raise  # 重新抛出异常，让上层调用者处理
 
 
-def draw_vdf_QDE(csv_vfd_QDE, output_dxf_file, project_name, force, design_displacement, offset_x, offset_y):
+def draw_vdf_QDE(csv_vfd_QDE, output_dxf_file, project_name, force, design_displacement, offset_x, offset_y, doc=None,
+                 dimensions=None):
     try:
-        # 读取产品图数据
-        with open(csv_vfd_QDE, 'r', encoding='utf-8') as vfd_QDE:
-            csv_reader = csv.reader(vfd_QDE)
-            csv_data_vfd_QDE = list(csv_reader)
-
-        # 结构图数据整体偏移
-        csv_data_vfd_QDE = offset(csv_data_vfd_QDE, offset_x, offset_y)
-
-        # 调用 csv_to_dxf 函数进行转换，输出 DXF 文件名称为产品型号输入的参数
-        input_file = f'{project_name} VFD-{force}-{design_displacement}-前吊耳.csv'
-        with open(input_file, 'w', newline='', encoding='utf-8') as file:
-            writer = csv.writer(file)
-            writer.writerows(csv_data_vfd_QDE)
+        # 前吊耳不随参数修改，整体偏移后的编译模板由各数据行共用
+        template_vfd_QDE = load_lug_template(csv_vfd_QDE, offset_x, offset_y)
 
-        # 调用 csv_to_dxf，传递文件路径
-        csv_add_dxf(input_file, output_dxf_file)
+        # 追加到结构图文档中并保存，未传入文档时打开已保存的结构图
+        if doc is None:
+            doc = dxf_output.read_document(output_dxf_file)
+        source = f'{project_name} VFD-{force}-{design_displacement}-前吊耳.csv'
+        return rows_to_dxf(template_vfd_QDE, output_dxf_file, doc=doc, source=source, dimensions=dimensions)
 
 
 
     except (IndexError, ValueError) as e:
         logging.error(f"修改 CSV 数据时出现错误: {str(e)}")
-        messagebox.showerror("错误", "修改CSV数据时出现错误，请检查数据格式。")
+        if show_dialogs:
+            messagebox.showerror("错误", "修改CSV数据时出现错误，请检查数据格式。")
         raise  # 重新抛出异常，让上层调用者处理
 
 
@@ -303,152 +161,335 @@ def calculate_dynamic_width(text, max_width=300, base_width_cn=23.7, base_width_
     return f'\W{dynamic_multiplier:.2f};\T1.1;{text}'
 
 
-# 图偏移函数
+# 图偏移函数，所有实体类型的坐标、顶点数据一次平移
 def offset(csv_data, offset_x, offset_y):
-    # 从第一行获取列名到索引的映射
-    header = csv_data[0]
-    col_index = {col: idx for idx, col in enumerate(header)}
-
-    # 元素偏移处理函数
-    def element_offset(value, offset):
+    return transform.apply(csv_data, transform.Transform().translate(offset_x, offset_y))
+
+
+# 读取模板缓存，模板文件未变化时返回缓存的数据，否则用 build(模板路径) 重新生成
+def cached_template(csv_file, purpose, build):
+    path = os.path.abspath(csv_file)
+    stat = os.stat(path)
+    cached = _template_cache.get((path, purpose))
+    if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+    data = build(path)
+    _template_cache[(path, purpose)] = (stat.st_mtime_ns, stat.st_size, data)
+    return data
+
+
+# 读取产品结构图的CSV数据，返回可以修改的副本
+def read_design_rows(csv_file):
+    def build(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return list(csv.reader(f))
+    return [list(row) for row in cached_template(csv_file, "design", build)]
+
+
+# 读取拉伸窗口表（已缓存），返回 ([(块名, 窗口)], 编译后的X位移表达式)，窗口为 (X最小, Y最小, X最大, Y最大)
+# 表格无效时抛出 RuleError
+def load_stretch_windows(csv_file):
+    def build(path):
+        windows = []
+        rules = []
+        with open(path, 'r', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            missing = [name for name in STRETCH_COLUMNS if name not in (reader.fieldnames or [])]
+            if missing:
+                raise RuleError(f"拉伸窗口表 {csv_file} 缺少列: {', '.join(missing)}")
+            for line_num, row in enumerate(reader, start=2):
+                if not row['名称']:
+                    continue
+                try:
+                    window = tuple(float(row[name]) for name in ('X最小', 'Y最小', 'X最大', 'Y最大'))
+                except ValueError:
+                    raise RuleError(f"拉伸窗口表 {csv_file} 第 {line_num} 行的窗口坐标无效")
+                windows.append((row['块名'], window))
+                rules.append(Rule(row['名称'], 'X位移', '数值', row['X位移'], line_num))
+        return windows, RuleSet(csv_file, rules, STRETCH_VARIABLES, {})
+    return cached_template(csv_file, "stretch", build)
+
+
+# 整体偏移并编译前吊耳模板，返回只读的编译模板
+def load_lug_template(csv_file, offset_x, offset_y):
+    def build(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            rows = list(csv.reader(f))
+        return compile_table(offset(rows, offset_x, offset_y), csv_file)
+    return cached_template(csv_file, ("lug", offset_x, offset_y), build)
+
+
+# 读取数据行中的VFD参数，无效时抛出异常
+def read_vfd_parameters(row):
+    # 从数据行中获取各参数值，使用get方法并设置默认值
+    return {
+        "project_name": row.get("project_name", ""),  # 项目名称
+        "force": int(row.get("force")),  # 阻尼力
+        "design_displacement": int(row.get("design_displacement")),  # 设计位移
+        "quantity": int(row.get("quantity")),  # 数量
+        "cylinder_diameter": int(row.get("cylinder_diameter")),  # 缸筒内径
+        "axis_diameter": int(row.get("axis_diameter")),  # 轴径
+        "dt1": int(row.get("dt1")),  # 前吊耳 到 前盖 距离
+        "dt2": int(row.get("dt2")),  # 前腔距离
+        "dt3": int(row.get("dt3")),  # 后腔距离
+        "piston_width": int(row.get("piston_width")),  # 活塞宽度
+        "dt4": int(row.get("dt4")),  # 轴后端伸出距离
+        "dt5": int(row.get("dt5")),  # 轴 到 后盖 距离
+    }
+
+
+# 型号表中的模板路径：统一路径分隔符，相对路径相对于本目录；不是CSV文件的值（如 none）保持不变
+def resolve_model_path(value):
+    if not value.lower().endswith('.csv'):
+        return value
+    path = value.replace('\\', '/').replace('/', os.sep)
+    return os.path.normpath(os.path.join(DATA_DIR, path))
+
+
+# 读取VFD型号表，返回 {(缸径, 轴径): 型号数据}；缸径和轴径相同的型号只使用第一个
+def read_model_table(model_table):
+    with open(model_table, 'r', encoding='utf-8') as VFD_table:
+        csv_data_VFD_table = list(csv.DictReader(VFD_table))
+
+    models = {}
+    for line_num, row in enumerate(csv_data_VFD_table, start=2):
         try:
-            return float(value) + float(offset)
-        except (ValueError, TypeError):
-            print(f"警告: 无法将 '{value}' 或 '{offset}' 转换为数值")
-            return value
-
-    for line_num, row in enumerate(csv_data[1:], start=2):  # 从第 2 行开始处理
+            # 将CSV中的字符串值转换为整数作为索引
+            key = (int(row["缸径"]), int(row["轴径"]))
+        except (KeyError, ValueError) as e:
+            logging.warning(f"处理第 {line_num} 行时出错: {str(e)}")
+            continue
+        if key in models:
+            continue
+        model = dict(row)
+        for column in MODEL_PATH_COLUMNS:
+            if model.get(column):
+                model[column] = resolve_model_path(model[column])
+        for column in MODEL_OFFSET_COLUMNS:
+            try:
+                model[column] = int(model[column])
+            except (KeyError, TypeError, ValueError):
+                # 保留原值，使用该型号绘图时再报告错误
+                pass
+        models[key] = model
+    return models
+
+
+# 型号表索引（已缓存），型号表的修改时间或大小变化后重新读取；所有图纸共用，调用者不应修改返回的数据
+def load_model_table():
+    global _model_cache
+    stat = os.stat(MODEL_TABLE)
+    cached = _model_cache
+    if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+    models = read_model_table(MODEL_TABLE)
+    _model_cache = (stat.st_mtime_ns, stat.st_size, models)
+    return models
+
+
+# 在VFD-型号表中查找缸径和轴径匹配的型号，返回型号数据的副本，未找到时返回 None
+def find_vfd_model(cylinder_diameter, axis_diameter):
+    model = load_model_table().get((cylinder_diameter, axis_diameter))
+    return dict(model) if model is not None else None
+
+
+# 检查型号表中各产品结构图的锚点和拉伸窗口表，只读取数据不绘制，返回 {产品结构图数据: [问题说明]}
+def check_anchors():
+    problems = {}
+    for model in load_model_table().values():
+        csv_file = model.get('产品结构图数据', '')
+        # 尚未提供结构图的型号不检查
+        if not csv_file.lower().endswith('.csv'):
+            continue
         try:
-            # 读取非块元素
-            if not row[col_index.get("块名", -1)]:  # 使用列索引访问"块名"
-                entity_type = row[col_index.get("实体类型", "")]
-
-                if entity_type == 'LINE':
-                    if "起点 X" in col_index and "起点 Y" in col_index and "终点 X" in col_index and "终点 Y" in col_index:
-                        row[col_index["起点 X"]] = element_offset(row[col_index["起点 X"]], offset_x)
-                        row[col_index["起点 Y"]] = element_offset(row[col_index["起点 Y"]], offset_y)
-                        row[col_index["终点 X"]] = element_offset(row[col_index["终点 X"]], offset_x)
-                        row[col_index["终点 Y"]] = element_offset(row[col_index["终点 Y"]], offset_y)
-
-                elif entity_type == 'CIRCLE':
-                    if "圆心 X" in col_index and "圆心 Y" in col_index:
-                        row[col_index["圆心 X"]] = element_offset(row[col_index["圆心 X"]], offset_x)
-                        row[col_index["圆心 Y"]] = element_offset(row[col_index["圆心 Y"]], offset_y)
-
-                elif entity_type == 'DIMENSION':
-                    if row[col_index.get("类型/名称", "")] == 'LINEAR':
-                        if "位置 X" in col_index and "位置 Y" in col_index and "起点 X" in col_index and "起点 Y" in col_index and "终点 X" in col_index and "终点 Y" in col_index:
-                            row[col_index["位置 X"]] = element_offset(row[col_index["位置 X"]], offset_x)
-                            row[col_index["位置 Y"]] = element_offset(row[col_index["位置 Y"]], offset_y)
-                            row[col_index["起点 X"]] = element_offset(row[col_index["起点 X"]], offset_x)
-                            row[col_index["起点 Y"]] = element_offset(row[col_index["起点 Y"]], offset_y)
-                            row[col_index["终点 X"]] = element_offset(row[col_index["终点 X"]], offset_x)
-                            row[col_index["终点 Y"]] = element_offset(row[col_index["终点 Y"]], offset_y)
-
-                    elif row[col_index.get("类型/名称", "")] == 'RADIUS':
-                        if "位置 X" in col_index and "位置 Y" in col_index and "圆心 X" in col_index and "圆心 Y" in col_index:
-                            row[col_index["位置 X"]] = element_offset(row[col_index["位置 X"]], offset_x)
-                            row[col_index["位置 Y"]] = element_offset(row[col_index["位置 Y"]], offset_y)
-                            row[col_index["圆心 X"]] = element_offset(row[col_index["圆心 X"]], offset_x)
-                            row[col_index["圆心 Y"]] = element_offset(row[col_index["圆心 Y"]], offset_y)
-
-                elif entity_type == 'ARC':
-                    if "圆心 X" in col_index and "圆心 Y" in col_index:
-                        row[col_index["圆心 X"]] = element_offset(row[col_index["圆心 X"]], offset_x)
-                        row[col_index["圆心 Y"]] = element_offset(row[col_index["圆心 Y"]], offset_y)
-
-                elif entity_type in ['TEXT', 'MTEXT']:
-                    if "位置 X" in col_index and "位置 Y" in col_index:
-                        row[col_index["位置 X"]] = element_offset(row[col_index["位置 X"]], offset_x)
-                        row[col_index["位置 Y"]] = element_offset(row[col_index["位置 Y"]], offset_y)
-
-                elif entity_type == 'HATCH':
-                    if "位置 X" in col_index and "位置 Y" in col_index:
-                        row[col_index["位置 X"]] = element_offset(row[col_index["位置 X"]], offset_x)
-                        row[col_index["位置 Y"]] = element_offset(row[col_index["位置 Y"]], offset_y)
-
-            # 读取块元素
-            elif row[col_index.get("实体类型", "")] == 'INSERT':
-                if "位置 X" in col_index and "位置 Y" in col_index:
-                    row[col_index["位置 X"]] = element_offset(row[col_index["位置 X"]], offset_x)
-                    row[col_index["位置 Y"]] = element_offset(row[col_index["位置 Y"]], offset_y)
-
+            with open(csv_file, 'r', encoding='utf-8') as vfd_design:
+                table = list(csv.reader(vfd_design))
+        except OSError as e:
+            problems[csv_file] = [f"无法读取产品结构图数据: {str(e)}"]
+            continue
+        anchors, duplicates = table_anchors(table)
+        problems[csv_file] = verify_anchors(anchors, DESIGN_ANCHORS, duplicates, csv_file)
+        try:
+            load_stretch_windows(model.get('拉伸窗口', ''))
+        except (OSError, RuleError) as e:
+            problems[csv_file].append(f"拉伸窗口表无效: {str(e)}")
+    return problems
+
+
+# 根据型号数据计算各尺寸变化，在同一文档中绘制结构图和前吊耳；output_dxf_file 为空时只返回文档
+# dimensions 为是否生成尺寸图形块，为 None 时使用默认设置
+def draw_vfd_model(model, params, output_dxf_file=None, dimensions=None):
+    δdt1 = params["dt1"] - int(model["ex_dt1"])  # 前吊耳距离变化
+    δdt2 = params["dt2"] - int(model["ex_dt2"])  # 前腔变化
+    δdt3 = params["dt3"] - int(model["ex_dt3"])  # 后腔变化
+    δdt4 = params["dt4"] - int(model["ex_dt4"])  # 活塞杆后端变化
+    δdt5 = params["dt5"] - int(model["ex_dt5"])  # 活塞杆到后吊耳距离变化
+    δpiston_width = params["piston_width"] - int(model["ex_piston_width"])  # 活塞变化
+
+    # 根据参数更改并绘制结构图，暂不保存
+    doc = draw_vfd_design(model['产品结构图数据'], model['拉伸窗口'], None, params["project_name"], params["force"],
+                          params["design_displacement"], params["quantity"], δpiston_width,
+                          δdt1, δdt2, δdt3, δdt4, δdt5, 775, 800, dimensions)
+    # 根据参数更改绘制前吊耳，与结构图绘制在同一文档中后一次保存
+    if doc is not None:
+        doc = draw_vdf_QDE(model['前吊耳'], output_dxf_file, params["project_name"], params["force"],
+                           params["design_displacement"], 160, -500, doc, dimensions)
+    return doc
+
+
+# VFD图纸的默认文件名
+def vfd_filename(params):
+    return f'{params["project_name"]} VFD-{params["force"]}-{params["design_displacement"]}.dxf'
+
+
+# 根据数据行生成VFD图纸文档，返回文档和默认文件名，出错时抛出异常（用于无界面生成）
+def build_vfd_document(row, dimensions=None):
+    params = read_vfd_parameters(row)
+    model = find_vfd_model(params["cylinder_diameter"], params["axis_diameter"])
+    if model is None:
+        raise ValueError(f"未找到匹配的缸径({params['cylinder_diameter']})和轴径({params['axis_diameter']})组合")
+    doc = draw_vfd_model(model, params, dimensions=dimensions)
+    if doc is None:
+        raise RuntimeError("VFD图纸绘制失败，详见日志")
+    return doc, vfd_filename(params)
+
+
+# 各数据行的输出文件路径，同名的图纸依次加序号 (-2, -3, ...)；参数无效的行为 None，生成时再报告错误
+def vfd_output_files(data_table, project_folder=None):
+    files = []
+    used = {}
+    for row in data_table:
+        try:
+            filename = vfd_filename(read_vfd_parameters(row))
+        except (TypeError, ValueError):
+            files.append(None)
+            continue
+        used[filename] = used.get(filename, 0) + 1
+        if used[filename] > 1:
+            base, ext = os.path.splitext(filename)
+            filename = f"{base}-{used[filename]}{ext}"
+        files.append(os.path.join(project_folder, filename) if project_folder else filename)
+    return files
+
+
+# 生成单个数据行的图纸文件，返回 (保存路径, 是否使用缓存)，出错时抛出异常
+def generate_vfd_file(params, output_dxf_file):
+    # 根据缸径和轴径查找型号数据，确定其他零件的尺寸和数据文件
+    model = find_vfd_model(params["cylinder_diameter"], params["axis_diameter"])
+    if model is None:
+        raise ValueError(f"未找到匹配的缸径({params['cylinder_diameter']})和轴径({params['axis_diameter']})组合")
+
+    output_dxf_file = dxf_output.output_path(output_dxf_file)
+    # 模板、型号数据、参数和代码都未变化时直接复制缓存的图纸
+    key = output_cache.cache_key("vfd", [model['产品结构图数据'], model['前吊耳'], model['拉伸窗口']],
+                                 {"params": params, "model": model})
+    if output_cache.fetch(key, output_dxf_file):
+        logging.info(f"使用缓存图纸: {output_dxf_file}")
+        return output_dxf_file, True
+
+    with diagnostics.collecting() as collector:
+        issues = len(collector)
+        doc = draw_vfd_model(model, params, output_dxf_file)
+    if doc is None:
+        raise RuntimeError("VFD图纸绘制失败，详见日志")
+    # 有转换警告的图纸不缓存，保证每次生成都能看到警告
+    if len(collector) == issues:
+        output_cache.store(key, output_dxf_file)
+    return output_dxf_file, False
+
+
+# 子进程初始化：关闭对话框，所有警告只写入日志
+def init_worker():
+    global show_dialogs
+    show_dialogs = False
+    csv_to_dxf.show_dialogs = False
+
+
+# 生成单个数据行的图纸（可在子进程中执行），错误记录在结果中；output_dxf_file 为空时使用默认文件名
+def generate_vfd_row(index, row, output_dxf_file=None):
+    result = {
+        "index": index,
+        "project_name": row.get("project_name", ""),
+        "output": "",
+        "cached": False,
+        "seconds": 0.0,
+        "error": "",
+        "warnings": [],  # 转换警告，每项为 {"level", "file", "line", "entity_type", "field", "reason"}
+    }
+    start = time.perf_counter()
+    with diagnostics.collecting() as collector:
+        issues = len(collector)
+        try:
+            params = read_vfd_parameters(row)
+            result["output"], result["cached"] = generate_vfd_file(params, output_dxf_file or vfd_filename(params))
+            logging.info(f"图纸生成成功: {result['output']}")
         except Exception as e:
-            messagebox.showwarning("警告", f"第 {line_num} 行发生未知错误: {str(e)}，将略过此数据。")
-            logging.warning(f"第 {line_num} 行发生未知错误: {str(e)}，将略过此数据。")
-
-    return csv_data
+            result["error"] = f"{type(e).__name__}: {str(e)}"
+            logging.error(f"第 {index + 1} 行数据生成失败: {result['error']}")
+        result["warnings"] = collector.entries[issues:]
+    result["seconds"] = round(time.perf_counter() - start, 3)
+    return result
 
 
-# 主函数，绘制vfd图纸
-def vfd_drawing(data_table):
+# 并行生成所有数据行的图纸，每行一个DXF文件；每个子进程只读取一次型号表和模板，由分配到的各行共用，返回汇总信息
+def vfd_drawing_parallel(data_table, project_folder=None, workers=None):
+    # 确保数据表格是列表类型
+    if not isinstance(data_table, list):
+        data_table = [data_table]
+    workers = workers or os.cpu_count() or 1
+    if project_folder:
+        os.makedirs(project_folder, exist_ok=True)
+
+    start = time.perf_counter()
+    results = []
+    if data_table:
+        output_files = vfd_output_files(data_table, project_folder)
+        with ProcessPoolExecutor(max_workers=min(workers, len(data_table)), initializer=init_worker) as executor:
+            futures = [executor.submit(generate_vfd_row, index, row, output_file)
+                       for index, (row, output_file) in enumerate(zip(data_table, output_files))]
+            for future in as_completed(futures):
+                result = future.result()
+                status = "失败" if result["error"] else "完成"
+                print(f"[{len(results) + 1}/{len(data_table)}] {status}: {result['project_name']} ({result['seconds']}s)")
+                results.append(result)
+    results.sort(key=lambda r: r["index"])
+
+    failures = [r for r in results if r["error"]]
+    summary = {
+        "rows": len(results),
+        "workers": workers,
+        "succeeded": len(results) - len(failures),
+        "failed": len(failures),
+        "cached": sum(1 for r in results if r["cached"]),  # 使用缓存的数据行数量
+        "warnings": sum(len(r["warnings"]) for r in results),  # 转换警告总数
+        "seconds": round(time.perf_counter() - start, 3),  # 总耗时
+        "slowest": max((r["seconds"] for r in results), default=0.0),  # 最慢的单个数据行耗时
+        "results": results,
+    }
+    logging.info(f"VFD并行生成完成: {summary['succeeded']}/{summary['rows']} 成功，"
+                 f"用时 {summary['seconds']}s，最慢数据行 {summary['slowest']}s")
+    return summary
+
+
+# 主函数，绘制vfd图纸：每个数据行生成一个图纸文件，全部问题生成结束后统一提示，返回各行的结果
+def vfd_drawing(data_table, project_folder=None):
     """根据数据表格生成图纸"""
     # 确保数据表格是列表类型
     if not isinstance(data_table, list):
         data_table = [data_table]
-
-    # 读取数据包
-    for row in data_table:
-        try:
-            # 从数据行中获取各参数值，使用get方法并设置默认值
-            project_name = row.get("project_name", "")  # 项目名称
-            force = int(row.get("force"))  # 阻尼力
-            design_displacement = int(row.get("design_displacement"))  # 设计位移
-            quantity = int(row.get("quantity"))  # 数量
-            cylinder_diameter = int(row.get("cylinder_diameter"))  # 缸筒内径
-            axis_diameter = int(row.get("axis_diameter"))  # 轴径
-            dt1 = int(row.get("dt1"))  # 前吊耳 到 前盖 距离
-            dt2 = int(row.get("dt2"))  # 前腔距离
-            dt3 = int(row.get("dt3"))  # 后腔距离
-            piston_width = int(row.get("piston_width"))  # 活塞宽度
-            dt4 = int(row.get("dt4"))  # 轴后端伸出距离
-            dt5 = int(row.get("dt5"))  # 轴 到 后盖 距离
-        except Exception as e:
-            logging.error(f"处理数据行时出错: {str(e)}")
-            messagebox.showerror("错误", f"错误数据: {str(e)}，请确保为正确的值类型")
-
-    # 打开VFD-型号表，读取数据
-    with open('data/vfd/VFD-型号表.csv', 'r', encoding='utf-8') as VFD_table:
-        csv_reader = csv.DictReader(VFD_table)
-        csv_data_VFD_table = list(csv_reader)
-
-    # 遍历型号表数据，根据缸径和轴径，确定其他零件的尺寸和数据文件
-    found = False
-    for line_num, row in enumerate(csv_data_VFD_table, start=2):
-        try:
-            # 将CSV中的字符串值转换为整数进行比较
-            csv_cylinder_diameter = int(row["缸径"])
-            csv_axis_diameter = int(row["轴径"])
-
-            # 读取产品其他参数
-            if csv_cylinder_diameter == cylinder_diameter and csv_axis_diameter == axis_diameter:
-                found = True
-                δdt1 = dt1 - int(row["ex_dt1"])  # 前吊耳距离变化
-                δdt2 = dt2 - int(row["ex_dt2"])  # 前腔变化
-                δdt3 = dt3 - int(row["ex_dt3"])  # 后腔变化
-                δdt4 = dt4 - int(row["ex_dt4"])  # 活塞杆后端变化
-                δdt5 = dt5 - int(row["ex_dt5"])  # 活塞杆到后吊耳距离变化
-                δpiston_width = piston_width - int(row["ex_piston_width"])  # 活塞变化
-                csv_vfd_design = row['产品结构图数据']
-                csv_vfd_QDE = row['前吊耳']
-
-                # 创建dxf文件
-                output_dxf_file = f'{project_name} VFD-{force}-{design_displacement}.dxf'
-
-                # 根据参数更改并绘制结构图
-                draw_vfd_design(csv_vfd_design, output_dxf_file, project_name, force, design_displacement, quantity, δpiston_width,
-                                                 δdt1, δdt2, δdt3, δdt4, δdt5, 775, 800)
-                # 根据参数更改绘制前吊耳
-                draw_vdf_QDE(csv_vfd_QDE, output_dxf_file, project_name, force, design_displacement, 160, -500)
-
-                break  # 找到匹配项后跳出循环
-
-        except (KeyError, ValueError) as e:
-            logging.warning(f"处理第 {line_num} 行时出错: {str(e)}")
-            continue
-
-    if not found:
-        messagebox.showerror("错误", f"未找到匹配的缸径({cylinder_diameter})和轴径({axis_diameter})组合")
+    if project_folder:
+        os.makedirs(project_folder, exist_ok=True)
+
+    results = []
+    with diagnostics.collecting() as collector:
+        for index, (row, output_file) in enumerate(zip(data_table, vfd_output_files(data_table, project_folder))):
+            result = generate_vfd_row(index, row, output_file)
+            if result["error"]:
+                collector.add(f"第 {index + 1} 行数据生成失败: {result['error']}", level="error")
+            results.append(result)
+    if show_dialogs:
+        diagnostics.show_summary(collector, "图纸生成问题")
+    return results
 
 
 # 测试
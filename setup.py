@@ -5,13 +5,19 @@ setup(
     version="1.0.0",
     packages=find_packages(),
     include_package_data=True,
+    package_data={
+        "design": ["data/**/*.csv"],
+    },
     install_requires=[
         "flask",
         "ezdxf",
+        "openpyxl",
+        "numpy",
         # 其他依赖项...
     ],
     entry_points={
         "console_scripts": [
+            "cad-change = design.cli:main",
             "cad-change-web = design.app:main",
         ],
     },